@@ -0,0 +1,43 @@
+"""Measure enot's command line startup time.
+
+Usage:
+  python benchmarks/startup.py [<project_dir>] [--runs N]
+
+Runs short commands (version, installed) in a fresh interpreter and prints median wall time
+of N runs for each. Version is run in project_dir (current dir by default).
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+COMMANDS = [['version'], ['installed']]
+DEFAULT_RUNS = 10
+
+
+# Median wall time of running python with args
+def measure(args: list, cwd: str, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=cwd,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def main(argv: list):
+    runs = DEFAULT_RUNS
+    if '--runs' in argv:
+        i = argv.index('--runs')
+        runs = int(argv[i + 1])
+        argv = argv[:i] + argv[i + 2:]
+    cwd = argv[0] if argv else os.getcwd()
+    print('python startup: {:.1f} ms'.format(measure(['-c', 'pass'], cwd, runs) * 1000))
+    for args in COMMANDS:
+        print('enot {}: {:.1f} ms'.format(' '.join(args), measure(['-m', 'enot'] + args, cwd, runs) * 1000))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
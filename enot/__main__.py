@@ -2,18 +2,21 @@
 
 Usage:
   enot create <name> [-l LEVEL]
-  enot build [-l LEVEL][--define VARLINE]
-  enot package [-l LEVEL][--define VARLINE]
-  enot release [-l LEVEL][--define VARLINE]
+  enot build [-l LEVEL][--define VARLINE][--offline]
+  enot package [-l LEVEL][--define VARLINE][--offline]
+  enot release [-l LEVEL][--define VARLINE][--offline]
   enot fetch <package> [<version>] [-l LEVEL]
   enot install <package> [<version>] [-l LEVEL]
   enot uninstall <package> [-l LEVEL]
   enot installed
-  enot deps [-l LEVEL]
+  enot index <dir> [-l LEVEL]
+  enot deps [-l LEVEL][--offline]
   enot version
   enot upgrade [-d DEP] [-l LEVEL]
-  enot eunit [-l LEVEL][--define VARLINE]
-  enot ct [--log-dir DIR] [-l LEVEL][--define VARLINE]
+  enot eunit [-l LEVEL][--define VARLINE][--offline][--jobs N][--changed]
+  enot ct [--log-dir DIR] [-l LEVEL][--define VARLINE][--offline][--jobs N][--changed]
+  enot test-shell [-l LEVEL][--define VARLINE][--offline]
+  enot test-run [<test>...] [--ct] [--log-dir DIR] [--changed] [-l LEVEL]
   enot -v | --version
   enot -h | --help
 
@@ -26,22 +29,27 @@ Options:
   --define VARLINE                   define vars for file compilation. Used in erlang preprocessor. different vars
                                      should be separated with spaces, KV vars should use, f.e. --define 'TEST VAR=123'.
                                      [default: '']
+  --offline                          use only local cache: never access remote caches, git or hex.
+                                     Fail if something is missing.
+  -j N --jobs N                      run tests in N erlang nodes in parallel [default: 1]
+  --changed                          run only tests, affected by changes since the last passed run.
+  --ct                               run common test suites instead of eunit modules.
 """
 import os
 import sys
 from os.path import join
 
 from docopt import docopt, DocoptExit
-from jinja2 import Template
-from pkg_resources import Requirement, resource_filename
 
-import enot
 from enot import APPVSN
-from enot.packages.package_builder import Builder
-from enot.packages.package_controller import Controller
 from enot.utils import logger
 from enot.utils.file_utils import ensure_dir
 from enot.utils.logger import warning
+from enot.utils.resources import resource_path
+
+
+# Commands import only modules they need: builder and caches pull git, jinja2 and requests,
+# which is too slow for short commands like version or installed.
 
 
 def main(args=None):
@@ -60,7 +68,7 @@ def main(args=None):
     if arguments['version']:
         result = version(path)
     if arguments['deps']:
-        result = deps(path)
+        result = deps(path, arguments)
     if arguments['release']:
         result = release(path, arguments)
     if arguments['package']:
@@ -71,6 +79,10 @@ def main(args=None):
         result = eunit(path, arguments)
     if arguments['ct']:
         result = ct(path, arguments)
+    if arguments['test-shell']:
+        result = test_shell(path, arguments)
+    if arguments['test-run']:
+        result = test_run(path, arguments)
     if arguments['fetch']:
         result = fetch(arguments)
     if arguments['install']:
@@ -79,6 +91,8 @@ def main(args=None):
         result = uninstall(arguments)
     if arguments['installed']:
         result = installed()
+    if arguments['index']:
+        result = index(arguments)
     if result:
         sys.exit(0)
     else:
@@ -101,26 +115,38 @@ def create(path: str, arguments: dict):
 # Build project with all deps (fetch deps if needed)
 def build(path, arguments: dict):
     define = arguments['--define']
-    builder = Builder.init_from_path(path)
+    builder = init_builder(path, arguments)
     return do_build(builder, define)
 
 
-def do_build(builder: Builder, define: str, test=False):
+# Builder for project in path. Respects --offline.
+def init_builder(path, arguments: dict):
+    from enot.packages.package_builder import Builder
+    from enot.utils.hex_utils import hex_meta
+    hex_meta.offline = arguments.get('--offline', False)  # project's config is parsed before cache is set up
+    builder = Builder.init_from_path(path)
+    builder.system_config.cache.offline = arguments.get('--offline', False)
+    return builder
+
+
+def do_build(builder, define: str, test=False):
     builder.populate(test)
     return builder.build(define)
 
 
 # Print project's application version. Prefer enot_config.json vsn, but if none - use app.src version.
 def version(path):
-    builder = Builder.init_from_path(path)
-    print(builder.project.vsn)  # TODO return vsn?
+    from enot.packages.application_config import AppConfig
+    from enot.packages.config import config_factory
+    config = config_factory.read_project(path)
+    print(config.conf_vsn or AppConfig.from_path(path).vsn)  # TODO return vsn?
     return True
 
 
 # Build a release. Will use current rel dir with config or create new, if none is found
 def release(path, arguments: dict):
     define = arguments['--define']
-    builder = Builder.init_from_path(path)
+    builder = init_builder(path, arguments)
     if not do_build(builder, define):  # TODO check if project was already built
         return False
     builder.release()
@@ -128,8 +154,8 @@ def release(path, arguments: dict):
 
 
 # Fetch and build deps
-def deps(path):
-    builder = Builder.init_from_path(path)
+def deps(path, arguments: dict):
+    builder = init_builder(path, arguments)
     builder.populate()
     builder.deps()
     return True
@@ -138,7 +164,7 @@ def deps(path):
 # Create enot package
 def package(path, arguments: dict):
     define = arguments.get('--define', '')
-    builder = Builder.init_from_path(path)
+    builder = init_builder(path, arguments)
     if not do_build(builder, define):
         return False
     builder.package()
@@ -147,6 +173,7 @@ def package(path, arguments: dict):
 
 # Run upgrade
 def upgrade(path, arguments):
+    from enot.packages.package_builder import Builder
     dep = arguments.get('--dep', None)
     builder = Builder.init_from_path(path)
     builder.drop_locs(dep)
@@ -158,6 +185,7 @@ def upgrade(path, arguments):
 def fetch(arguments):
     fullname = __get_full_name(arguments)
     maybe_vsn = arguments['<version>']
+    from enot.packages.package_controller import Controller
     controller = Controller()
     return controller.fetch(fullname, maybe_vsn)
 
@@ -166,6 +194,7 @@ def fetch(arguments):
 def install(arguments):
     fullname = __get_full_name(arguments)
     maybe_vsn = arguments['<version>']
+    from enot.packages.package_controller import Controller
     controller = Controller()
     return controller.install(fullname, maybe_vsn)
 
@@ -173,36 +202,65 @@ def install(arguments):
 # Uninstall previously installed package. It still remains in local cache.
 def uninstall(arguments):
     fullname = __get_full_name(arguments)
+    from enot.packages.package_controller import Controller
     controller = Controller()
     return controller.uninstall(fullname)
 
 
 # Print installed packages
 def installed():
+    from enot.packages.package_controller import Controller
     print(Controller().installed())
     return True
 
 
+# Regenerate index.json of a static remote cache directory
+def index(arguments):
+    from enot.pac_cache.static_cache import StaticCache
+    StaticCache.generate_index(arguments['<dir>'])
+    return True
+
+
 # Run tests
 def eunit(path, arguments: dict):
     define = arguments['--define']
-    builder = Builder.init_from_path(path)
+    jobs = int(arguments.get('--jobs') or 1)
+    builder = init_builder(path, arguments)
     if not do_build(builder, define, test=True):
         return False
-    return builder.unit_test()
+    return builder.unit_test(jobs, arguments.get('--changed', False))
 
 
 def ct(path, arguments):
     log_dir = arguments['--log-dir']
     define = arguments['--define']
-    builder = Builder.init_from_path(path)
+    jobs = int(arguments.get('--jobs') or 1)
+    builder = init_builder(path, arguments)
     if not do_build(builder, define, test=True):
         return False
-    return builder.common_test(log_dir)
+    return builder.common_test(log_dir, jobs, arguments.get('--changed', False))
+
+
+# Build deps and keep test node running. Project and tests are compiled on every test-run.
+def test_shell(path, arguments: dict):
+    builder = init_builder(path, arguments)
+    builder.populate(True)
+    builder.deps()
+    return builder.test_shell(arguments['--define'])
+
+
+# Run tests in project's test shell
+def test_run(path, arguments: dict):
+    from enot.compiler.warm_node import request_run
+    return request_run(path, {'kind': 'ct' if arguments['--ct'] else 'eunit',
+                              'tests': arguments['<test>'],
+                              'changed': arguments['--changed'],
+                              'log_dir': arguments['--log-dir']})
 
 
 def __ensure_template(src_dir, name, suffix, overwrite_name=False):
-    template = resource_filename(Requirement.parse(enot.APPNAME), 'enot/resources/template' + suffix)
+    from jinja2 import Template
+    template = resource_path('template' + suffix)
     if overwrite_name:
         filename = suffix
     else:
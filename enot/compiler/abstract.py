@@ -74,6 +74,10 @@ class AbstractCompiler(metaclass=ABCMeta):
     def test_path(self) -> str:
         return join(self.package.path, 'test')
 
+    @property
+    def test_output_path(self) -> str:  # compiled tests
+        return join(self.package.path, 'test_ebin')
+
     @property
     def tool(self) -> AbstractTool or None:
         return self._tool
@@ -86,10 +90,10 @@ class AbstractCompiler(metaclass=ABCMeta):
         info(self.executable + ' build ' + self.project_name)
         return run_cmd(self.executable, self.project_name, self.root_path, output=None)
 
-    def unit(self) -> bool:
+    def unit(self, jobs=1, changed=False) -> bool:
         raise RuntimeError("Don't know how to run unit tests with " + self.executable)
 
-    def common(self, log_dir: str) -> bool:
+    def common(self, log_dir: str, jobs=1, changed=False) -> bool:
         raise RuntimeError("Don't know how to run common tests with " + self.executable)
 
     # find tool and link to project
@@ -115,6 +119,8 @@ class AbstractCompiler(metaclass=ABCMeta):
         return None
 
     def __build_tool(self, cache, tool: AbstractTool):
+        if cache.offline:
+            raise RuntimeError('Offline mode: ' + tool.name + ' not found locally and can\'t be downloaded')
         path = cache.temp_dir
         tool_path = tool.ensure(path)
         cache.add_tool(tool.name, tool_path)
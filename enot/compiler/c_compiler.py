@@ -2,13 +2,12 @@ from os.path import join
 
 from enot.packages.config.config import ConfigFile
 
-import enot
 import os
-from pkg_resources import Requirement, resource_filename
 
 from enot.compiler.abstract import AbstractCompiler, run_cmd
 from enot.utils.file_utils import copy_file, ensure_dir
 from enot.utils.logger import debug
+from enot.utils.resources import resource_path
 
 
 class CCompiler(AbstractCompiler):
@@ -50,6 +49,6 @@ class CCompiler(AbstractCompiler):
 def ensure_makefile(src_path):
     mkfile = join(src_path, 'Makefile')
     if not os.path.isfile(mkfile):
-        resource = resource_filename(Requirement.parse(enot.APPNAME), 'enot/resources/CMakefile')
+        resource = resource_path('CMakefile')
         debug('copy ' + resource + ' to ' + mkfile)
         copy_file(resource, mkfile)
@@ -1,22 +1,24 @@
 import os
 import socket
-from os import listdir
-from os.path import isfile, join, isdir
+import subprocess
+import tempfile
+from os.path import join
 
 from jinja2 import Template
 
 from enot.compiler.abstract import AbstractCompiler, run_cmd
 from enot.compiler.c_compiler import CCompiler
+from enot.compiler.run_history import RunHistory
+from enot.compiler.staleness import Staleness
+from enot.compiler.surefire_report import SurefireReport
+from enot.compiler.warm_node import WarmNode
+from enot.compiler.xref import Xref
 from enot.pac_cache import Static
 from enot.packages.config.config import ConfigFile
-from enot.utils.file_utils import ensure_dir, read_file
+from enot.utils.file_utils import ensure_dir, link_if_needed, read_file, remove_dir, write_file
 from enot.utils.logger import debug, info
 
 
-def check_extension(file: str, extension: str) -> bool:
-    return isfile(file) and file.split('.')[-1] == extension
-
-
 # If parse-transform is found in file and this transform is in modules to be compiled
 # - should compile it before them.
 def parse_transform_first(first: dict, files: dict, file):
@@ -47,6 +49,12 @@ class EnotCompiler(AbstractCompiler):
     def deps_path(self) -> str:
         return join(self.package.path, 'deps')
 
+    @property
+    def deps_ebins(self) -> list:
+        if not os.path.isdir(self.deps_path):
+            return []
+        return [join(self.deps_path, dep, 'ebin') for dep in sorted(os.listdir(self.deps_path))]
+
     def compile(self, override_config: ConfigFile or None = None) -> bool:
         info('Enot build ' + self.project_name)
         self.__run_prebuild(override_config)
@@ -64,32 +72,171 @@ class EnotCompiler(AbstractCompiler):
             res = self.__do_compile(all_files, override=override_config)
         if res:
             self.__write_app_file(list(all_files.keys()))
+            Staleness(self.output_path, [], {}).forget()  # options may differ from test shell's ones
         return res
 
-    def common(self, log_dir: str) -> bool:  # TODO should I add override config compilation for tests?
+    # If changed is set - run only suites, affected by changes since the last passed run
+    def common(self, log_dir: str, jobs=1, changed=False) -> bool:  # TODO add override config compilation for tests?
         info('common tests for ' + self.project_name)
-        all_src = self.__get_all_files(self.test_path, 'erl')
-        if self.__do_compile(all_src, output=self.test_path):
-            return self.__do_common_test(log_dir)
-        return False
+        all_src = self.__compile_tests()
+        if all_src is None:
+            return False
+        suites = {name: path for name, path in all_src.items() if name.endswith('_SUITE')}
+        xref = None
+        if changed:
+            xref = self.__scan_xref()
+            suites = {name: suites[name] for name in xref.affected('ct', list(suites))}
+            info(str(len(suites)) + ' suites are affected by changes')
+            if not suites:
+                return True
+        if jobs > 1 and len(suites) > 1:
+            res = self.__do_parallel_common_test(suites, log_dir, jobs)
+        elif changed:
+            res = self.__do_common_test(log_dir, [join(path, name) for name, path in suites.items()])
+        else:
+            res = self.__do_common_test(log_dir)
+        if res and xref is not None:
+            xref.passed('ct', list(suites))
+        return res
 
-    def unit(self) -> bool:  # TODO run unit tests only for modules with include eunit lib?
+    # If changed is set - run only modules, affected by changes since the last passed run
+    def unit(self, jobs=1, changed=False) -> bool:  # TODO run unit tests only for modules with include eunit lib?
         info('unit tests for ' + self.project_name)
         debug('run eunit in ' + self.test_path)
-        all_src = self.__get_all_files(self.test_path, 'erl')
         ensure_dir(self.output_path)
-        if self.__do_compile(all_src, output=self.test_path):
-            modules, test_dirs = self.__get_test_directories(all_src, drop_extension='_SUITE')
-            return self.__do_unit_test(modules, test_dirs)
-        return False
+        all_src = self.__compile_tests()
+        if all_src is None:
+            return False
+        modules = [name for name in all_src if not name.endswith('_SUITE')]  # drop all common tests
+        xref = None
+        if changed:
+            xref = self.__scan_xref()
+            modules = xref.affected('eunit', modules)
+            info(str(len(modules)) + ' test modules are affected by changes')
+            if not modules:
+                return True
+        if jobs > 1 and len(modules) > 1:
+            res = self.__do_parallel_unit_test(modules, jobs)
+        else:
+            res = self.__do_unit_test(modules)
+        if res and xref is not None:
+            xref.passed('eunit', modules)
+        return res
+
+    # Cross reference of project's, tests' and deps' beams
+    def __scan_xref(self) -> Xref:
+        xref = Xref(self.root_path)
+        xref.scan([self.output_path, self.test_output_path] + self.deps_ebins)
+        return xref
+
+    # Compile only changed sources and tests. Return all test modules or None, if compilation failed.
+    def recompile(self, override_config: ConfigFile or None = None) -> dict or None:
+        self.package.rescan()
+        all_files = self.__get_all_files(self.src_path, 'erl')
+        snapshot = self.package.snapshot
+        sources = {name: join(path, name) + '.erl' for name, path in all_files.items()}
+        staleness = Staleness(self.output_path, snapshot.headers, sources)
+        options = self.__compose_compiler_call({}, None, override_config)
+        stale = staleness.stale(all_files, options)
+        debug('compile ' + str(len(stale)) + ' of ' + str(len(all_files)) + ' modules')
+        if stale:
+            first_compiled = self.form_compilation_order(stale)
+            rest = {name: path for name, path in stale.items() if name not in first_compiled}
+            for files in [first_compiled, rest]:
+                if files and not self.__do_compile(files, override=override_config):
+                    return None
+            self.__write_app_file(list(all_files.keys()))
+        staleness.compiled(all_files, options)
+        return self.__compile_tests()
+
+    # Node for test shell: project's modules are hot loaded, deps' modules are loaded once.
+    def warm_node(self) -> WarmNode:
+        return WarmNode([self.test_output_path, self.output_path], self.deps_ebins,
+                        self.root_path, self.__set_env_vars())
+
+    # Run eunit modules or ct suites of compiled tests in warm node. If tests are set - run only them,
+    # if changed is set - only affected by changes since the last passed run.
+    def run_in_node(self, node: WarmNode, all_src: dict, kind: str, tests: list, changed: bool,
+                    log_dir: str, out) -> bool:
+        names = [name for name in all_src if name.endswith('_SUITE') == (kind == 'ct')]
+        if tests:
+            unknown = [test for test in tests if test not in names]
+            if unknown:
+                out('Unknown tests: ' + ', '.join(unknown))
+                return False
+            names = tests
+        xref = None
+        if changed:
+            xref = self.__scan_xref()
+            names = xref.affected(kind, names)
+            out(str(len(names)) + ' tests are affected by changes')
+            if not names:
+                return True
+        history = RunHistory(self.root_path)
+        names = history.longest_first(names)
+        report_dir = tempfile.mkdtemp(prefix='enot_shell_')
+        try:
+            if kind == 'ct':
+                logs = join(self.root_path, log_dir)
+                ensure_dir(logs)
+                res = node.common([join(all_src[name], name) for name in names], logs, report_dir, out)
+            else:
+                res = node.unit(names, report_dir, out)
+            self.__record_durations(history, report_dir)
+        finally:
+            remove_dir(report_dir)
+        if res and xref is not None:
+            xref.passed(kind, names)
+        return res
+
+    # Compile only changed tests to test output dir. Return all test modules or None, if compilation failed.
+    def __compile_tests(self) -> dict or None:
+        all_src = self.__get_all_files(self.test_path, 'erl')
+        output = self.test_output_path
+        ensure_dir(output)
+        snapshot = self.package.snapshot
+        test_headers = snapshot.modules('test', 'hrl')
+        headers = snapshot.headers + [join(path, name) + '.hrl' for name, path in test_headers.items()]
+        modules = list(snapshot.modules('src').items()) + list(all_src.items())
+        sources = {name: join(path, name) + '.erl' for name, path in modules}
+        staleness = Staleness(output, headers, sources)
+        options = self.__compose_compiler_call({}, output, None)
+        stale = staleness.stale(all_src, options)
+        debug('compile ' + str(len(stale)) + ' of ' + str(len(all_src)) + ' tests')
+        if stale and not self.__do_compile(stale, output=output):
+            return None
+        staleness.compiled(all_src, options)
+        self.__prepare_test_output(all_src)
+        return all_src
+
+    # Common test takes suite's data_dir from the dir of suite's beam: link suites' data dirs to test output.
+    # Beams, left in test dirs by previous builds, are removed, so they can't be loaded instead of compiled ones.
+    def __prepare_test_output(self, all_src: dict):
+        output = self.test_output_path
+        for entry in os.scandir(output):
+            if entry.name.endswith('_SUITE_data') and entry.is_symlink():
+                suite = entry.name[:-len('_data')]
+                if suite not in all_src or os.readlink(entry.path) != join(all_src[suite], entry.name):
+                    os.remove(entry.path)
+        for name, path in all_src.items():
+            data_dir = join(path, name + '_data')
+            if name.endswith('_SUITE') and os.path.isdir(data_dir):
+                link_if_needed(data_dir, join(output, name + '_data'))
+            old_beam = join(path, name + '.beam')
+            if os.path.isfile(old_beam):
+                debug('remove old ' + old_beam)
+                os.remove(old_beam)
 
     # run prebuild if it is not disabled in package's config,
     # or disabled in root config with override set to True
+    # Package is rescanned after prebuild, as it can generate sources.
     def __run_prebuild(self, config: ConfigFile or None):
         if not self.package.config.disable_prebuild and \
                 not (config is not None and config.override_conf and config.disable_prebuild):
             for action in self.package.config.prebuild:
                 action.run(self.root_path)
+            if self.package.config.prebuild:
+                self.package.rescan()
 
     def form_compilation_order(self, files: dict) -> dict:
         if not self.package.config.auto_build_order:  # source analysis disabled
@@ -105,14 +252,106 @@ class EnotCompiler(AbstractCompiler):
         env_vars = self.__set_env_vars()
         return run_cmd(cmd, self.project_name, self.root_path, env_vars)
 
-    def __do_unit_test(self, modules: list, test_dirs: list) -> bool:  # TODO make nice output and tests result sum
-        cmd = self.__compose_unit_call(modules, test_dirs)
-        return run_cmd(cmd, self.project_name, self.root_path, shell=True, output=None)
+    # Run modules longest first. Output is printed as is, durations are taken from surefire report.
+    def __do_unit_test(self, modules: list) -> bool:
+        history = RunHistory(self.root_path)
+        report_dir = tempfile.mkdtemp(prefix='enot_eunit_')
+        try:
+            cmd = self.__compose_unit_call(history.longest_first(modules), report_dir=report_dir, tty=True)
+            res = run_cmd(cmd, self.project_name, self.root_path, shell=True, output=None)
+            self.__record_durations(history, report_dir)
+        finally:
+            remove_dir(report_dir)
+        return res
+
+    # Split modules between erlang nodes by their previous durations, run all nodes at once and merge their reports.
+    def __do_parallel_unit_test(self, modules: list, jobs: int) -> bool:
+        history = RunHistory(self.root_path)
+        shards = history.shard(modules, jobs)
+        info('run eunit in ' + str(len(shards)) + ' nodes')
+        reports_dir = tempfile.mkdtemp(prefix='enot_eunit_')
+        try:
+            runs = []
+            for i, shard in enumerate(shards):
+                report_dir = join(reports_dir, str(i))
+                ensure_dir(report_dir)
+                cmd = self.__compose_unit_call(shard, report_dir=report_dir)
+                runs.append((cmd, report_dir, join(reports_dir, str(i) + '.log')))
+            report = self.__run_parallel(runs)
+        finally:
+            remove_dir(reports_dir)
+        history.update(report.durations)
+        report.log()
+        report.log_slowest()
+        return report.ok
+
+    # Split suites between ct_run nodes by their previous durations. Every node logs to it's own dir in log_dir.
+    def __do_parallel_common_test(self, suites: dict, log_dir: str, jobs: int) -> bool:
+        history = RunHistory(self.root_path)
+        shards = history.shard(list(suites), jobs)
+        info('run common tests in ' + str(len(shards)) + ' nodes')
+        logs = join(self.root_path, log_dir)
+        runs = []
+        for i, shard in enumerate(shards):
+            shard_logs = join(logs, 'shard_' + str(i))
+            report_dir = join(shard_logs, 'surefire')
+            remove_dir(report_dir)  # only this run's results are merged
+            ensure_dir(report_dir)
+            cmd = self.__compose_ct_call(shard_logs, suites=[join(suites[s], s) for s in shard], report_dir=report_dir)
+            runs.append((cmd, report_dir, join(shard_logs, 'ct_run.log')))
+        report = self.__run_parallel(runs, self.__set_env_vars())
+        EnotCompiler.__write_shards_index(logs, shards)
+        history.update(report.durations)
+        report.log()
+        report.log_slowest()
+        return report.ok
 
-    def __do_common_test(self, log_dir: str) -> bool:
-        cmd = self.__compose_ct_call(log_dir)
+    # Run all commands at once, each one writing it's output to own file. Merge surefire reports of all of them.
+    # If any command can't be started - already started ones are killed and run fails.
+    def __run_parallel(self, runs: list, env_vars: dict or None = None) -> SurefireReport:
+        processes = []
+        report = SurefireReport()
+        try:
+            for cmd, report_dir, output_path in runs:
+                debug(cmd)
+                with open(output_path, 'w') as output:
+                    process = subprocess.Popen(cmd, stdout=output, stderr=subprocess.STDOUT, cwd=self.root_path,
+                                               env=env_vars, shell=isinstance(cmd, str))
+                processes.append((report_dir, output_path, process))
+        except OSError as e:
+            for _, _, process in processes:
+                process.kill()
+                process.wait()
+            report.add_error('Can\'t run tests: {0}'.format(e))
+            return report
+        for report_dir, output_path, process in processes:
+            exit_code = process.wait()
+            report.add_run(report_dir, exit_code, read_file(output_path))
+        return report
+
+    # Output is printed as is, durations are taken from surefire report in log dir.
+    def __do_common_test(self, log_dir: str, suites: list or None = None) -> bool:
+        history = RunHistory(self.root_path)
+        logs = join(self.root_path, log_dir)
+        report_dir = join(logs, 'surefire')
+        remove_dir(report_dir)  # only this run's results are recorded
+        ensure_dir(report_dir)
+        cmd = self.__compose_ct_call(logs, suites=suites, report_dir=report_dir)
         env_vars = self.__set_env_vars()
-        return run_cmd(cmd, self.project_name, self.root_path, env_vars, output=None)
+        res = run_cmd(cmd, self.project_name, self.root_path, env_vars, output=None)
+        self.__record_durations(history, report_dir)
+        return res
+
+    @staticmethod
+    def __record_durations(history: RunHistory, report_dir: str):
+        report = SurefireReport()
+        try:
+            report.add_run(report_dir, 0, '')
+        except (OSError, ValueError) as e:  # ParseError is ValueError
+            debug('Can\'t read tests report: {0}'.format(e))
+            return
+        history.update(report.durations)
+        report.log_slowest()
 
     def __set_env_vars(self) -> dict:
         env_vars = dict(os.environ)
@@ -122,7 +361,7 @@ class EnotCompiler(AbstractCompiler):
 
     def __compose_compiler_call(self, files: dict, output: str or None, override):
         cmd = [self.executable]
-        if os.path.exists(self.include_path):
+        if 'include' in self.package.snapshot.dirs:
             cmd += ['-I', self.include_path]
         cmd += ['-pa', self.output_path]
         if output:
@@ -137,26 +376,46 @@ class EnotCompiler(AbstractCompiler):
             cmd.append(join(path, filename) + '.erl')
         return cmd
 
-    def __compose_unit_call(self, modules: list, test_dirs: list) -> str:
+    # eunit call. Results are written to report_dir as surefire xml. If tty is not set - tests output is not printed.
+    def __compose_unit_call(self, modules: list, report_dir: str, tty=False) -> str:
         cmd = 'erl'
-        for test_dir in test_dirs:
-            cmd += ' -pa ' + join('test', test_dir)
+        cmd += ' -pa ' + self.test_output_path
         cmd += ' -pa ' + self.output_path
         cmd += ' -pa ' + join(self.deps_path, '*/ebin')
-        cmd += ' -eval "case eunit:test(' + str(modules) + ') of ok -> erlang:halt(0); _ -> erlang:halt(1) end"'
+        options = '{report, {eunit_surefire, [{dir, \\"' + report_dir + '\\"}]}}'
+        if not tty:
+            cmd += ' -noshell'
+            options = 'no_tty, ' + options
+        cmd += ' -eval "case eunit:test(' + str(modules) + ', [' + options + ']) of ' \
+               'ok -> erlang:halt(0); _ -> erlang:halt(1) end"'
         return cmd
 
-    def __compose_ct_call(self, log_dir: str) -> list:
+    # ct_run call for all suites of test dir or only for suites (paths without extension) with surefire report.
+    # Parallel ct_run nodes are not distributed (no -sname), so they don't need epmd. Own log dirs keep them apart.
+    def __compose_ct_call(self, logs: str, suites: list or None = None, report_dir: str or None = None) -> list:
         cmd = ['ct_run', '-no_auto_compile', '-noinput']
         cmd += ['-pa', self.output_path]
         cmd += ['-pa', join(self.deps_path, '*/ebin')]
-        cmd += ['-pa', self.test_path]
-        cmd += ['-dir', self.test_path]
-        logs = join(self.root_path, log_dir)
+        cmd += ['-pa', self.test_output_path]
+        if suites is None:
+            cmd += ['-dir', self.test_path]
+        else:
+            cmd += ['-suite'] + suites
+        if report_dir is not None:
+            cmd += ['-ct_hooks', 'cth_surefire', '[{path, "' + join(report_dir, 'report.xml') + '"}]']
         ensure_dir(logs)
         cmd += ['-logdir', logs]
         return cmd
 
+    # Index of all nodes' logs
+    @staticmethod
+    def __write_shards_index(logs: str, shards: list):
+        lines = ['<html><body><h1>Common test nodes</h1><ul>']
+        for i, shard in enumerate(shards):
+            lines.append('<li><a href="shard_{0}/index.html">shard_{0}</a>: {1}</li>'.format(i, ', '.join(shard)))
+        lines.append('</ul></body></html>')
+        write_file(join(logs, 'shards.html'), '\n'.join(lines))
+
     def __append_macro(self, cmd, override: ConfigFile or None):
         if override is not None and override.override_conf:
             build_vars = override.build_vars
@@ -181,26 +440,7 @@ class EnotCompiler(AbstractCompiler):
             with open(app_path, 'w') as f:
                 f.write(Template(app_src).render(params))
 
-    # scan all folders, return dict, where module names are the keys, and their paths are the values
+    # all files of package's dir (src or test) from package's snapshot, return dict,
+    # where module names are the keys, and their paths are the values
     def __get_all_files(self, path: str, extension: str) -> dict:
-        return_files = {}
-        extension_len = len(extension) + 1  # length of extension + dot
-        for file in listdir(path):
-            abs_file = join(path, file)
-            if isdir(abs_file):
-                subdir_files = self.__get_all_files(abs_file, extension)
-                return_files.update(subdir_files)
-            elif check_extension(abs_file, extension):
-                module_name = file[:-extension_len]  # remove extension
-                return_files[module_name] = path
-        return return_files
-
-    # get tests subdirectories from all_files directories, return as a unique list
-    def __get_test_directories(self, all_files: dict, drop_extension: str) -> (list, list):
-        to_link = set()
-        modules = []
-        for file, path in all_files.items():
-            if not file.endswith(drop_extension):  # drop all common tests
-                to_link.add(os.path.relpath(path, self.test_path))
-                modules.append(file)
-        return modules, list(to_link)
+        return self.package.snapshot.modules(os.path.relpath(path, self.package.path), extension)
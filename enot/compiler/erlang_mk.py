@@ -1,4 +1,3 @@
-import os
 from os import listdir
 
 from enot.compiler.abstract import AbstractCompiler, run_cmd
@@ -31,10 +30,10 @@ class ErlangMKCompiler(AbstractCompiler):
             return True
         return False
 
-    def common(self, log_dir: str) -> bool:  # TODO log_dir
+    def common(self, log_dir: str, jobs=1, changed=False) -> bool:  # TODO log_dir
         return self.__run_test('ct')
 
-    def unit(self) -> bool:
+    def unit(self, jobs=1, changed=False) -> bool:  # erlang.mk runs all tests itself
         return self.__run_test('eunit')
 
     def check_output(self):
@@ -47,12 +46,7 @@ class ErlangMKCompiler(AbstractCompiler):
         return True
 
     def __get_source_files(self):
-        source_files = []
-        for root, directories, filenames in os.walk(self.src_path):
-            for filename in filenames:
-                if filename.endswith('.erl'):
-                    source_files.append(filename[:-4])
-        return source_files
+        return list(self.package.snapshot.modules('src').keys())
 
     def __get_compiled_files(self):
         output = listdir(self.output_path)
@@ -17,8 +17,8 @@ class RebarCompiler(AbstractCompiler):
         info('Rebar build ' + self.project_name)
         return run_cmd([self.executable, 'compile'], self.project_name, self.root_path)
 
-    def unit(self) -> bool:
+    def unit(self, jobs=1, changed=False) -> bool:  # rebar runs all tests itself
         return run_cmd([self.executable, 'eunit'], self.project_name, self.root_path)
 
-    def common(self, log_dir: str) -> bool:  # TODO log_dir
+    def common(self, log_dir: str, jobs=1, changed=False) -> bool:  # TODO log_dir
         return run_cmd([self.executable, 'ct'], self.project_name, self.root_path)
@@ -18,8 +18,8 @@ class Rebar3Compiler(RebarCompiler):
             return True
         return False
 
-    def unit(self) -> bool:
-        return super().unit()
+    def unit(self, jobs=1, changed=False) -> bool:
+        return super().unit(jobs, changed)
 
-    def common(self, log_dir: str) -> bool:
-        return super().common(log_dir)
+    def common(self, log_dir: str, jobs=1, changed=False) -> bool:
+        return super().common(log_dir, jobs, changed)
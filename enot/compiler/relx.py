@@ -3,14 +3,13 @@ import socket
 from os.path import join
 
 from jinja2 import Template
-from pkg_resources import Requirement, resource_filename
 
-import enot
 from enot.compiler.abstract import AbstractCompiler, run_cmd
 from enot.pac_cache import Static
 from enot.packages.config.config import ConfigFile
 from enot.tool.relxtool import RelxTool
 from enot.utils.file_utils import ensure_dir, write_file, read_file, copy_file, ensure_empty
+from enot.utils import resources
 from enot.utils.logger import debug
 
 
@@ -61,7 +60,7 @@ class RelxCompiler(AbstractCompiler):
     def __ensure_resource(self, resource, path):
         resource_path = join(self.package.path, path, resource)
         if not os.path.isfile(resource_path):
-            resource = resource_filename(Requirement.parse(enot.APPNAME), join('enot/resources', resource))
+            resource = resources.resource_path(resource)
             debug('copy ' + resource + ' to ' + resource_path)
             copy_file(resource, resource_path)
         return resource_path
@@ -0,0 +1,68 @@
+import heapq
+import json
+import os
+from os.path import join
+
+from enot.utils.logger import debug
+
+HISTORY_FILE = 'enot_test_history.json'
+DEFAULT_DURATION = 1.0  # seconds, for tests which were never run before
+
+
+# Durations of test modules from previous runs, stored in project's dir.
+# Is used to balance tests between parallel runs.
+class RunHistory:
+    def __init__(self, path: str):
+        self._path = join(path, HISTORY_FILE)
+        self._durations = None  # test module -> seconds. Loaded on first use
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def durations(self) -> dict:
+        if self._durations is None:
+            self._durations = self.__load()
+        return self._durations
+
+    # Expected duration of a test. Tests, which were never run, are expected to be average.
+    def expected(self, name: str) -> float:
+        if name in self.durations:
+            return self.durations[name]
+        if self.durations:
+            return sum(self.durations.values()) / len(self.durations)
+        return DEFAULT_DURATION
+
+    def longest_first(self, names: list) -> list:
+        return sorted(names, key=lambda n: (-self.expected(n), n))
+
+    # Split tests to no more than jobs shards with close expected durations.
+    # Longest tests are placed first, each one to the least loaded shard.
+    def shard(self, names: list, jobs: int) -> list:
+        shards = [(0.0, i, []) for i in range(max(1, min(jobs, len(names))))]
+        for name in self.longest_first(names):
+            load, i, shard = heapq.heappop(shards)
+            shard.append(name)
+            heapq.heappush(shards, (load + self.expected(name), i, shard))
+        return [shard for _, _, shard in sorted(shards, key=lambda s: s[1]) if shard]
+
+    def update(self, durations: dict):
+        self.durations.update(durations)
+        self.__save()
+
+    def __load(self) -> dict:
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def __save(self):
+        try:
+            tmp_path = self.path + '.' + str(os.getpid())
+            with open(tmp_path, 'w') as file:
+                json.dump(self._durations, file, sort_keys=True, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            debug('Can\'t save test history to ' + self.path + ': {0}'.format(e))
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import re
+from os.path import join
+
+from enot.utils.file_utils import read_file, write_file
+
+INCLUDE = re.compile(r'^\s*-include(?:_lib)?\s*\(\s*"([^"]+)"', re.MULTILINE)
+COMPILE_DEPENDENCY = re.compile(r'\{\s*parse_transform\s*,\s*\'?(\w+)|^\s*-behaviou?r\s*\(\s*\'?(\w+)', re.MULTILINE)
+OPTIONS_FILE = '.enot_options'
+
+
+# Finds modules, which should be compiled to output dir: without beam, or with beam older than module's source,
+# any header it includes (recursively) or source of parse transform or behaviour it uses.
+# All modules are stale if compile options were changed since last compilation.
+# Headers and modules, which are not found in the project (f.e. from deps or otp), are not checked.
+class Staleness:
+    def __init__(self, output: str, headers: list, sources: dict):
+        self._output = output
+        self._headers = {}  # header file name -> full paths
+        for header in headers:
+            self._headers.setdefault(os.path.basename(header), []).append(header)
+        self._sources = sources  # module -> full path of it's source
+        self._mtimes = {}
+        self._dependencies = {}  # full path -> full paths of it's compile time dependencies
+
+    @property
+    def options_file(self) -> str:
+        return join(self._output, OPTIONS_FILE)
+
+    # modules is a dict, where module names are the keys, and their dirs are the values
+    def stale(self, modules: dict, options: list) -> dict:
+        if self.__options_hash(options) != self.__saved_options_hash():
+            return dict(modules)
+        stale = {}
+        for name, path in modules.items():
+            beam = self.__mtime(join(self._output, name + '.beam'))
+            dependencies = self.__all_dependencies(join(path, name + '.erl'))
+            if beam is None or any((self.__mtime(file) or 0) > beam for file in dependencies):
+                stale[name] = path
+        return stale
+
+    # Remember options of successful compilation. Remove beams, which have no sources.
+    def compiled(self, modules: dict, options: list):
+        for file in os.listdir(self._output):
+            if file.endswith('.beam') and file[:-len('.beam')] not in modules:
+                os.remove(join(self._output, file))
+        write_file(self.options_file, self.__options_hash(options))
+
+    # All modules will be stale on next check
+    def forget(self):
+        if os.path.exists(self.options_file):
+            os.remove(self.options_file)
+
+    # source itself and all files it depends on
+    def __all_dependencies(self, source: str) -> set:
+        found = set()
+        queue = [source]
+        while queue:
+            file = queue.pop()
+            if file not in found:
+                found.add(file)
+                queue += self.__dependencies(file)
+        return found
+
+    def __dependencies(self, file: str) -> list:
+        if file not in self._dependencies:
+            try:
+                content = read_file(file)
+            except (OSError, ValueError):
+                content = ''
+            dependencies = []
+            for include in INCLUDE.findall(content):
+                dependencies += self._headers.get(os.path.basename(include), [])
+            for transform, behaviour in COMPILE_DEPENDENCY.findall(content):
+                module = transform or behaviour
+                if module in self._sources:
+                    dependencies.append(self._sources[module])
+            self._dependencies[file] = dependencies
+        return self._dependencies[file]
+
+    def __mtime(self, path: str) -> int or None:
+        if path not in self._mtimes:
+            try:
+                self._mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                self._mtimes[path] = None
+        return self._mtimes[path]
+
+    def __saved_options_hash(self) -> str or None:
+        try:
+            return read_file(self.options_file)
+        except OSError:
+            return None
+
+    @staticmethod
+    def __options_hash(options: list) -> str:
+        return hashlib.sha1(json.dumps(options).encode('utf-8')).hexdigest()
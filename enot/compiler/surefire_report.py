@@ -0,0 +1,97 @@
+import os
+import re
+import xml.etree.ElementTree as ElementTree
+from os.path import join
+
+from enot.utils.logger import info, error
+
+SUITE_NAME = re.compile(r"^module '(.+)'$")
+SLOWEST_COUNT = 5
+
+
+# Merged result of test runs. Each run writes surefire (junit) xml reports to its own dir:
+# eunit writes one per module, common test hook - one for all suites.
+class SurefireReport:
+    def __init__(self):
+        self._tests = 0
+        self._failures = 0
+        self._errors = 0
+        self._skipped = 0
+        self._durations = {}  # module -> seconds
+        self._failed = []  # output of failed tests and crashed runs
+
+    @property
+    def tests(self) -> int:
+        return self._tests
+
+    @property
+    def failures(self) -> int:
+        return self._failures
+
+    @property
+    def errors(self) -> int:
+        return self._errors
+
+    @property
+    def skipped(self) -> int:
+        return self._skipped
+
+    @property
+    def durations(self) -> dict:
+        return self._durations
+
+    @property
+    def failed(self) -> list:
+        return self._failed
+
+    @property
+    def ok(self) -> bool:
+        return self.failures == 0 and self.errors == 0
+
+    # Add results of a run. Run, which exited with error without failed tests reported, is counted as error.
+    def add_run(self, report_dir: str, exit_code: int, output: str):
+        failed_before = self.failures + self.errors
+        for file in sorted(os.listdir(report_dir)):
+            if file.endswith('.xml'):
+                root = ElementTree.parse(join(report_dir, file)).getroot()
+                for suite in root.iter('testsuite'):
+                    self.__add_suite(suite)
+        if exit_code != 0 and self.failures + self.errors == failed_before:
+            self._errors += 1
+            self._failed.append('tests exited with ' + str(exit_code) + ':\n' + output)
+
+    # Run, which couldn't be started
+    def add_error(self, message: str):
+        self._errors += 1
+        self._failed.append(message)
+
+    def log(self):
+        for failed in self.failed:
+            error(failed)
+        passed = self.tests - self.failures - self.errors - self.skipped
+        summary = 'Passed: ' + str(passed) + '. Failed: ' + str(self.failures) + '. Errors: ' + str(self.errors) + \
+                  '. Skipped: ' + str(self.skipped) + '.'
+        if self.ok:
+            info(summary)
+        else:
+            error(summary)
+
+    def log_slowest(self, count=SLOWEST_COUNT):
+        slowest = sorted(self.durations.items(), key=lambda d: (-d[1], d[0]))[:count]
+        if slowest:
+            info('Slowest tests:\n' + '\n'.join(['{0:>10.3f}s {1}'.format(time, name) for name, time in slowest]))
+
+    def __add_suite(self, suite):
+        self._tests += int(suite.get('tests', 0))
+        self._failures += int(suite.get('failures', 0))
+        self._errors += int(suite.get('errors', 0))
+        self._skipped += int(suite.get('skipped', 0))
+        name = suite.get('name', '')
+        match = SUITE_NAME.match(name)
+        if match:
+            name = match.group(1)
+        self._durations[name] = self._durations.get(name, 0.0) + float(suite.get('time', 0))
+        for case in suite.iter('testcase'):
+            for result in list(case.iter('failure')) + list(case.iter('error')):
+                details = result.text or result.get('message') or result.get('type', '')
+                self._failed.append(name + ': ' + case.get('name', '') + '\n' + details)
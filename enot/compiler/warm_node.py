@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import socket
+import stat
+import subprocess
+import tempfile
+from os.path import join
+
+from appdirs import user_cache_dir
+
+import enot
+from enot.utils.logger import debug, error, info
+
+SHELL_DONE = 'enot_test_shell_done'
+SOCKET_PATH_MAX = 100  # unix socket path length is limited: 104 on macOS, 108 on linux
+# Read erlang expressions from stdin line by line, evaluate them and print their result after SHELL_DONE marker.
+EVAL_LOOP = '''Loop = fun(Self) ->
+    case io:get_line('') of
+        eof -> erlang:halt(0);
+        Line ->
+            Result = try
+                {ok, Tokens, _} = erl_scan:string(Line),
+                {ok, Exprs} = erl_parse:parse_exprs(Tokens),
+                {value, Value, _} = erl_eval:exprs(Exprs, []),
+                Value
+            catch Class:Reason -> {Class, Reason}
+            end,
+            io:format("~n~s ~w~n", ["''' + SHELL_DONE + '''", Result]),
+            Self(Self)
+    end
+end,
+Loop(Loop).'''
+
+
+# Socket of project's test shell. It is in user's cache dir, or in user's dir in temp dir, if cache dir's path is
+# too long for unix socket.
+def socket_path(path: str) -> str:
+    name = 'enot_shell_' + hashlib.sha1(os.path.realpath(path).encode('utf-8')).hexdigest()[:12] + '.sock'
+    directory = join(user_cache_dir(enot.APPNAME, enot.APPAUTHOR), 'shells')
+    if len(join(directory, name)) > SOCKET_PATH_MAX:
+        directory = join(tempfile.gettempdir(), 'enot_shells_' + str(os.getuid()))
+    return join(directory, name)
+
+
+# Create dir for sockets, accessible only by current user. Raise OSError if it belongs to other user.
+def ensure_socket_dir(directory: str):
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    check_socket_dir(directory)
+
+
+def check_socket_dir(directory: str):
+    stats = os.lstat(directory)
+    if not stat.S_ISDIR(stats.st_mode) or stats.st_uid != os.getuid():
+        raise OSError('Not a directory of current user: ' + directory)
+    if stat.S_IMODE(stats.st_mode) != 0o700:
+        os.chmod(directory, 0o700)
+
+
+# Send test-run request to project's test shell and print it's output. Return tests result.
+def request_run(path: str, request: dict) -> bool:
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        check_socket_dir(os.path.dirname(socket_path(path)))
+        client.connect(socket_path(path))
+    except OSError as e:
+        client.close()
+        error('No test shell for ' + path + ' ({0}). Start it with enot test-shell'.format(e))
+        return False
+    with client, client.makefile('rw', encoding='utf-8') as stream:
+        stream.write(json.dumps(request) + '\n')
+        stream.flush()
+        for line in stream:
+            if line.startswith(SHELL_DONE):
+                return json.loads(line[len(SHELL_DONE):])
+            print(line, end='', flush=True)
+    error('Test shell has stopped')
+    return False
+
+
+def erl_string(value: str) -> str:
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def erl_atom(value: str) -> str:
+    return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def erl_list(values: list) -> str:
+    return '[' + ', '.join(values) + ']'
+
+
+# Long running erlang node. Deps' modules are loaded once on start,
+# project's modules, which were recompiled, are hot loaded before every run.
+class WarmNode:
+    def __init__(self, project_paths: list, deps_paths: list, cwd: str, env_vars: dict):
+        self._project_paths = project_paths  # ebins with hot loaded modules
+        self._deps_paths = deps_paths
+        self._cwd = cwd
+        self._env_vars = env_vars
+        self._process = None
+        self._stamps = {}  # beam path -> [mtime, size] of loaded version
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def start(self, out) -> bool:
+        cmd = ['erl', '-noshell']
+        for path in self._project_paths + self._deps_paths:
+            cmd += ['-pa', path]
+        cmd += ['-eval', EVAL_LOOP]
+        debug(cmd)
+        try:
+            self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                             stderr=subprocess.STDOUT, cwd=self._cwd, env=self._env_vars,
+                                             universal_newlines=True, bufsize=1)
+        except OSError as e:
+            out('Can\'t run erl: {0}'.format(e))
+            return False
+        self._stamps = self.__beams()  # modules, compiled before start, are loaded from disk on first use
+        preload = '_ = code:ensure_modules_loaded([list_to_atom(filename:basename(F, ".beam")) || ' \
+                  'D <- ' + erl_list([erl_string(path) for path in self._deps_paths]) + ', ' \
+                  'F <- filelib:wildcard(filename:join(D, "*.beam"))]), true.'
+        return self.call(preload, out)
+
+    def stop(self):
+        if self.alive:
+            self._process.stdin.close()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
+
+    # Load modules, which were changed since last load, purge removed ones.
+    def reload(self, out) -> bool:
+        beams = self.__beams()
+        changed = [path for path, stamp in beams.items() if self._stamps.get(path) != stamp]
+        removed = [path for path in self._stamps if path not in beams]
+        debug('reload ' + str(len(changed)) + ' modules, purge ' + str(len(removed)))
+        if not changed and not removed:
+            return True
+        load = 'lists:all(fun(F) -> ' \
+               'M = list_to_atom(filename:basename(F, ".beam")), code:purge(M), {ok, B} = file:read_file(F), ' \
+               '{module, M} =:= code:load_binary(M, F, B) end, ' + erl_list([erl_string(p) for p in changed]) + ') ' \
+               'andalso lists:all(fun(F) -> ' \
+               'M = list_to_atom(filename:basename(F, ".beam")), code:purge(M), code:delete(M), true end, ' \
+               + erl_list([erl_string(p) for p in removed]) + ').'
+        if not self.call(load, out):
+            return False
+        self._stamps = beams
+        return True
+
+    def unit(self, modules: list, report_dir: str, out) -> bool:
+        return self.call('eunit:test(' + erl_list([erl_atom(module) for module in modules]) + ', '
+                         '[{report, {eunit_surefire, [{dir, ' + erl_string(report_dir) + '}]}}]) =:= ok.', out)
+
+    def common(self, suites: list, logs: str, report_dir: str, out) -> bool:
+        options = '[{suite, ' + erl_list([erl_string(suite) for suite in suites]) + '}, ' \
+                  '{logdir, ' + erl_string(logs) + '}, {auto_compile, false}, ' \
+                  '{ct_hooks, [{cth_surefire, [{path, ' + erl_string(join(report_dir, 'report.xml')) + '}]}]}]'
+        return self.call('case ct:run_test(' + options + ') of {_, 0, _} -> true; _ -> false end.', out)
+
+    # Evaluate expression in node, pass node's output to out. Return True if expression returned true.
+    def call(self, expression: str, out) -> bool:
+        if not self.alive:
+            out('Test node is not running')
+            return False
+        self._process.stdin.write(expression + '\n')
+        self._process.stdin.flush()
+        for line in self._process.stdout:
+            if line.startswith(SHELL_DONE):
+                result = line[len(SHELL_DONE):].strip()
+                if result not in ('true', 'false'):
+                    out(result)
+                return result == 'true'
+            out(line.rstrip('\n'))
+        out('Test node has stopped')
+        self._process = None
+        return False
+
+    def __beams(self) -> dict:
+        beams = {}
+        for directory in self._project_paths:
+            if os.path.isdir(directory):
+                for entry in os.scandir(directory):
+                    if entry.name.endswith('.beam') and entry.is_file():
+                        stat = entry.stat()
+                        beams[entry.path] = [stat.st_mtime_ns, stat.st_size]
+        return beams
+
+
+# Keeps project's warm node and runs tests in it on test-run requests, received on a unix socket, one at a time.
+# Project's sources and tests are recompiled incrementally before every run.
+class ShellServer:
+    def __init__(self, compiler, override_config=None):
+        self._compiler = compiler  # EnotCompiler
+        self._override_config = override_config
+        self._node = compiler.warm_node()
+        self._path = socket_path(compiler.root_path)
+
+    def serve(self) -> bool:
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            ensure_socket_dir(os.path.dirname(self._path))
+            if os.path.exists(self._path):  # left by killed shell
+                os.remove(self._path)
+            server.bind(self._path)
+            server.listen(1)
+        except OSError as e:
+            error('Can\'t listen on ' + self._path + ': {0}'.format(e))
+            server.close()
+            return False
+        if not self._node.start(info):
+            error('Can\'t start test node')
+            server.close()
+            os.remove(self._path)
+            self._node.stop()
+            return False
+        try:
+            info('Test shell is ready. Run tests with enot test-run')
+            while True:
+                connection, _ = server.accept()
+                with connection, connection.makefile('rw', encoding='utf-8') as stream:
+                    self.__handle(stream)
+        except KeyboardInterrupt:
+            return True
+        finally:
+            server.close()
+            if os.path.exists(self._path):
+                os.remove(self._path)
+            self.stop()
+
+    def stop(self):
+        self._node.stop()
+
+    def run(self, kind: str, tests: list, changed: bool, log_dir: str, out) -> bool:
+        all_src = self._compiler.recompile(self._override_config)
+        if all_src is None:
+            out('Compilation failed')
+            return False
+        if not self._node.alive and not self._node.start(out):
+            return False
+        if not self._node.reload(out):
+            return False
+        return self._compiler.run_in_node(self._node, all_src, kind, tests, changed, log_dir, out)
+
+    def __handle(self, stream):
+        def out(line: str):
+            try:
+                stream.write(line + '\n')
+                stream.flush()
+            except OSError:  # client has gone, but tests are run till the end
+                pass
+
+        try:
+            request = json.loads(stream.readline())
+            res = self.run(request['kind'], request['tests'], request['changed'], request['log_dir'], out)
+        except (ValueError, KeyError) as e:
+            out('Bad request: {0}'.format(e))
+            res = False
+        out(SHELL_DONE + ' ' + json.dumps(res))
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+from os.path import join
+
+from enot.utils.beam_utils import read_beam
+from enot.utils.logger import debug, warning
+
+XREF_FILE = 'enot_xref.json'
+
+
+# Cross reference graph of compiled modules: module -> modules it references (calls, behaviours, funs).
+# Is stored in project's dir with digests of passed tests, per test kind (eunit, ct): digest covers hashes
+# of all modules the test reaches. Graph is updated incrementally: only changed beams are read again.
+class Xref:
+    def __init__(self, path: str):
+        self._path = join(path, XREF_FILE)
+        self._beams = None  # beam path -> {'stamp': [mtime, size], 'module', 'hash', 'atoms'}. Loaded on first use
+        self._passed = None  # test kind -> {test: digest of modules it reached, when it passed}
+        self._modules = {}  # module -> it's beam info, from the last scan
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    # Read all beams of dirs, which were changed since last scan
+    def scan(self, dirs: list):
+        self.__load()
+        beams = {}
+        for directory in dirs:
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if entry.name.endswith('.beam') and entry.is_file():
+                    beams[entry.path] = self.__read(entry)
+        self._beams = {path: beam for path, beam in beams.items() if beam is not None}
+        self._modules = {beam['module']: beam for beam in self._beams.values()}
+        self.__save()
+
+    # Tests, which never passed or reach modules, changed (added, removed) since they passed.
+    def affected(self, kind: str, tests: list) -> list:
+        passed = self._passed.get(kind, {})
+        return [test for test in tests if passed.get(test) != self.__digest(test)]
+
+    # Remember tests as passed with modules they reach now. Other tests keep their state.
+    def passed(self, kind: str, tests: list):
+        passed = self._passed.setdefault(kind, {})
+        for test in tests:
+            passed[test] = self.__digest(test)
+        self.__save()
+
+    # Hashes of test itself and all modules it references, directly or through other modules
+    def __digest(self, test: str) -> str:
+        found = set()
+        queue = [test]
+        while queue:
+            module = queue.pop()
+            if module not in found and module in self._modules:
+                found.add(module)
+                queue += self._modules[module]['atoms']
+        sha = hashlib.sha1()
+        for module in sorted(found):
+            sha.update((module + ':' + self._modules[module]['hash'] + '\n').encode('utf-8'))
+        return sha.hexdigest()
+
+    def __read(self, entry) -> dict or None:
+        stat = entry.stat()
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        known = self._beams.get(entry.path)
+        if known is not None and known['stamp'] == stamp:
+            return known
+        try:
+            md5, atoms = read_beam(entry.path)
+        except (OSError, ValueError) as e:
+            warning('Can\'t read ' + entry.path + ': {0}'.format(e))
+            return None
+        return {'stamp': stamp, 'module': atoms[0], 'hash': md5, 'atoms': atoms[1:]}
+
+    def __load(self):
+        if self._beams is not None:
+            return
+        try:
+            with open(self.path, 'r') as file:
+                content = json.load(file)
+            self._beams = content['beams']
+            self._passed = content['passed']
+        except (OSError, ValueError, KeyError):
+            self._beams = {}
+            self._passed = {}
+
+    def __save(self):
+        try:
+            tmp_path = self.path + '.' + str(os.getpid())
+            with open(tmp_path, 'w') as file:
+                json.dump({'beams': self._beams, 'passed': self._passed}, file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            debug('Can\'t save xref to ' + self.path + ': {0}'.format(e))
@@ -3,13 +3,12 @@ from os.path import join
 
 import enot
 from appdirs import *
-from jinja2 import Template
-from pkg_resources import Requirement, resource_filename
 
 from enot.compiler.compiler_type import Compiler
-from enot.pac_cache.cache_man import CacheMan
 from enot.utils.file_utils import read_file, ensure_dir
+from enot.utils.hex_utils import hex_meta, HEX_META_EXPIRY
 from enot.utils.logger import info
+from enot.utils.resources import resource_path
 
 
 def temp_dir() -> str:  # TODO get system temp dir (os independent)
@@ -20,6 +19,7 @@ def init_config(source: str, path: str, file: str):
     cache_dir = user_cache_dir(enot.APPNAME, enot.APPAUTHOR)
     ensure_dir(path)
     ensure_dir(cache_dir)
+    from jinja2 import Template  # slow to import, is needed only on first run
     with open(source, 'r') as r:
         content = r.read()
     with open(join(path, file), 'w') as f:
@@ -31,22 +31,58 @@ def ensure_conf_file(path: str) -> str:
         os.makedirs(path)
     config_path = join(path, 'global_config.json')
     if not os.path.exists(config_path):
-        template = resource_filename(Requirement.parse(enot.APPNAME), 'enot/resources/global_config.json')
+        template = resource_path('global_config.json')
         init_config(template, path, 'global_config.json')
     return config_path
 
 
+# Process-wide global properties, see global_properties()
+_shared = {}  # conf dir -> (config file's stat signature, GlobalProperties)
+_injected = None
+
+
+# Global properties shared by all builders and controllers of the process.
+# Are created on first access and recreated only if global config file was changed.
+def global_properties(path=user_config_dir(enot.APPNAME)) -> 'GlobalProperties':
+    if _injected is not None:
+        return _injected
+    signature = __config_signature(ensure_conf_file(path))
+    shared = _shared.get(path)
+    if shared is None or shared[0] != signature:
+        shared = (signature, GlobalProperties(path))
+        _shared[path] = shared
+    return shared[1]
+
+
+# Use properties instead of global config for all builders and controllers (embedding, tests).
+# None returns to global config and drops all shared properties.
+def set_global_properties(properties: 'GlobalProperties' or None):
+    global _injected
+    _injected = properties
+    _shared.clear()
+
+
+def __config_signature(config_path: str) -> tuple:
+    stat_result = os.stat(config_path)
+    return config_path, stat_result.st_mtime_ns, stat_result.st_size
+
+
+# Global config is read on first access to it's properties. Caches are created on first access to cache.
 class GlobalProperties:
     def __init__(self, path=user_config_dir(enot.APPNAME)):
-        config_path = ensure_conf_file(path)
-        content = read_file(config_path)
-        conf = json.loads(content)
         self._conf_dir = path
-        self.__init_from_dict(conf)
+        self._conf = None
+        self._cache = None
+
+    @property
+    def conf(self) -> dict:  # global config file's content
+        if self._conf is None:
+            self.__load()
+        return self._conf
 
     @property
     def temp_dir(self) -> str:
-        return self._temp_dir
+        return self.conf['temp_dir']
 
     @property
     def conf_dir(self) -> str:
@@ -54,16 +90,25 @@ class GlobalProperties:
 
     @property
     def compiler(self) -> Compiler:
+        if self._conf is None:
+            self.__load()
         return self._compiler
 
     @property
-    def cache(self) -> CacheMan:
+    def cache(self) -> 'CacheMan':
+        if self._cache is None:
+            from enot.pac_cache.cache_man import CacheMan  # caches are slow to import
+            self._cache = CacheMan(self.conf)
         return self._cache
 
+    def __load(self):
+        config_path = ensure_conf_file(self.conf_dir)
+        self._conf = json.loads(read_file(config_path))
+        self.__init_from_dict(self._conf)
+
     def __init_from_dict(self, conf: dict):
-        self._temp_dir = conf['temp_dir']
+        hex_meta.expiry = conf.get('hex_meta_expiry', HEX_META_EXPIRY)
         self.__set_compiler(conf)
-        self._cache = CacheMan(conf)
 
     def __set_compiler(self, conf):
         try:
@@ -1,12 +1,60 @@
+import json
+import os
 import shlex
+import shutil
 import subprocess
+from os.path import join
 
-from enot.utils.logger import warning
+from appdirs import user_cache_dir
+
+import enot
+from enot.utils.file_utils import ensure_dir
+from enot.utils.logger import warning, debug
 
 
 class Static:
+    __versions = {}  # (erl path, erl mtime) -> otp release, detected in this process
+
+    # Otp release of erl from PATH. Is detected once per process and persisted by erl's real path and mtime,
+    # so erlang VM is started only when erlang is installed or changed.
+    # Version managers' shims (asdf, mise) run different otp installs with the same unchanged script,
+    # so version of a shim is not persisted, but detected in every process.
     @staticmethod
     def get_erlang_version(default_erlang=None):
+        erl = shutil.which('erl')
+        if erl is None:
+            warning('No erlang installed!')
+            return default_erlang
+        erl = os.path.realpath(erl)
+        key = (erl, os.stat(erl).st_mtime_ns)
+        if key not in Static.__versions:
+            persist = Static.is_otp_install(erl)
+            persisted = Static.__load_versions() if persist else {}
+            known = persisted.get(erl, {})
+            if known.get('mtime') == key[1]:
+                Static.__versions[key] = known['vsn']
+            else:
+                vsn = Static.__detect_erlang_version()
+                if vsn is None:
+                    return default_erlang
+                Static.__versions[key] = vsn
+                if persist:
+                    persisted[erl] = {'mtime': key[1], 'vsn': vsn}
+                    Static.__save_versions(persisted)
+        return Static.__versions[key]
+
+    # erl is a part of otp install (<root>/bin/erl with <root>/releases), not a version manager's shim
+    @staticmethod
+    def is_otp_install(erl: str) -> bool:
+        return os.path.isdir(join(os.path.dirname(os.path.dirname(erl)), 'releases'))
+
+    # file, where detected otp releases are persisted
+    @staticmethod
+    def versions_file() -> str:
+        return join(user_cache_dir(enot.APPNAME, enot.APPAUTHOR), 'erlang_versions.json')
+
+    @staticmethod
+    def __detect_erlang_version() -> str or None:
         try:
             vsn = subprocess.check_output(
                 shlex.split("erl -eval 'erlang:display(erlang:system_info(otp_release)), halt().' -noshell"))
@@ -17,5 +65,25 @@ class Static:
                 return file.split(',')[2].strip('"')
         except FileNotFoundError:
             warning('No erlang installed!')
-            return default_erlang
+            return None
         return vsn.decode('utf-8').strip("\n\r\"")
+
+    @staticmethod
+    def __load_versions() -> dict:
+        try:
+            with open(Static.versions_file(), 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def __save_versions(versions: dict):
+        path = Static.versions_file()
+        try:
+            ensure_dir(os.path.dirname(path))
+            tmp_path = path + '.' + str(os.getpid())
+            with open(tmp_path, 'w') as file:
+                json.dump(versions, file)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            debug('Can\'t save erlang version to ' + path + ': {0}'.format(e))
@@ -12,6 +12,7 @@ from enot.utils.logger import info
 class CacheType(Enum):
     LOCAL = 'local'
     ENOT = 'enot'
+    STATIC = 'static'
 
 
 class Cache(metaclass=ABCMeta):
@@ -1,28 +1,42 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from os.path import join
 
 from enot.compiler.c_compiler import CCompiler
 from enot.pac_cache import cache_factory
 from enot.pac_cache.cache import CacheType, Cache
+from enot.pac_cache.circuit_breaker import CircuitBreaker
 from enot.pac_cache.local_cache import LocalCache
 from enot.pac_cache.remote_cache import RemoteCache
 from enot.pac_cache.remote_cache_exception import RemoteCacheException
+from enot.packages.config.config import get_hex_versions
 from enot.packages.package import Package
-from enot.utils.logger import warning
+from enot.utils.hex_utils import hex_meta
+from enot.utils.logger import warning, debug
+
+HEAD_START = 1  # seconds, during which the fastest known remote cache is queried alone, before querying others
 
 
 class CacheMan:
     def __init__(self, conf: dict):
         self._local_cache = None
-        self._caches = {}
+        self._caches = None  # remote caches are created on first use
+        self._remote_confs = []
+        self._temp_dir = conf['temp_dir']
+        self._default_erlang = conf.get('default_erlang', '20')
+        self._concurrent_remotes = conf.get('concurrent_remotes', False)
+        self._latency = {}  # remote cache name -> time of its last answer in seconds
+        self._executor = None  # queries remote caches concurrently. Is created on first use, one per session
+        self._probes = {}  # remote cache name -> future of its last concurrent query
+        self._breaker = CircuitBreaker(conf.get('remote_max_failures', 3))
         for cache in conf.get('cache', []):
             cache_type = CacheType(cache['type'])
-            cache = cache_factory.get_cache(cache_type, cache, conf['temp_dir'], conf.get('default_erlang', '20'))
-            if cache_type == CacheType.LOCAL and isinstance(cache, LocalCache):
+            if cache_type == CacheType.LOCAL:
                 if self._local_cache is not None:
                     raise RuntimeError('More that one local cache found in config!')
-                self._local_cache = cache
+                self._local_cache = cache_factory.get_cache(cache_type, cache, self._temp_dir, self._default_erlang)
             else:
-                self.remote_caches[cache.name] = cache
+                self._remote_confs.append((cache_type, cache))
 
     # TODO may be move temp dir property here and send to caches on all operations needed?
 
@@ -32,8 +46,36 @@ class CacheMan:
 
     @property
     def remote_caches(self) -> {str: RemoteCache}:
+        if self._caches is None:
+            self._caches = {}
+            for cache_type, conf in self._remote_confs:
+                cache = cache_factory.get_cache(cache_type, conf, self._temp_dir, self._default_erlang)
+                self._caches[cache.name] = cache
         return self._caches
 
+    @property
+    def concurrent_remotes(self) -> bool:  # query all remote caches at once and use the first hit
+        return self._concurrent_remotes
+
+    @property
+    def offline(self) -> bool:  # use local cache only, never access network
+        return self.local_cache.offline
+
+    @offline.setter
+    def offline(self, offline: bool):
+        self.local_cache.offline = offline
+        hex_meta.offline = offline
+
+    @property
+    def available_remotes(self) -> list:  # remote caches, which can be queried in this session
+        if self.offline:
+            return []
+        return [cache for cache in self.remote_caches.values() if not self._breaker.is_open(cache.name)]
+
+    @property
+    def ordered_remotes(self) -> list:  # available remote caches, fastest first. Not queried yet are kept in config order
+        return sorted(self.available_remotes, key=lambda c: self._latency.get(c.name, float('inf')))
+
     @property
     def official_cache(self):
         for cache in self.remote_caches.values():
@@ -48,11 +90,44 @@ class CacheMan:
             path = join(self.local_cache.path, self.local_cache.get_package_path(dep))
             dep.update_from_cache(path)
             return
-        for cache in self.remote_caches.values():
+        if self.concurrent_remotes:  # all caches, which have the package, are tried till one succeeds
+            caches = (cache for cache, _ in self.__answered_remotes(lambda c: c.exists(dep)))
+        else:
+            caches = self.available_remotes
+        for cache in caches:
             if self.exists_remote(cache, dep):
                 return
         self.local_cache.fetch_package(dep)
 
+    # Resolve unlocked branch deps remotely to find already built commits in local cache
+    def resolve_branches(self, deps: list):
+        if not self.offline:
+            self.local_cache.resolve_branches(deps)
+
+    # Get deps of package's version without fetching its sources. Return None if it is not possible.
+    def read_deps(self, package: Package) -> list or None:
+        if package.git_tag is None:  # branch head can change, should be populated
+            return None
+        if self.exists_local(package):  # populating from local cache doesn't fetch anything
+            self.populate(package)
+            return package.deps
+        config = self.local_cache.read_config(package)
+        if config is None:
+            return None
+        return [Package.from_dep(name, dep) for name, dep in config.deps.items()]
+
+    # All known tags of package: already in local cache and available in package's repo
+    def get_tags(self, package: Package) -> list:
+        tags = set(self.local_cache.get_versions(package.fullname))
+        if not self.offline and package.url is not None and not package.config.hex_only:
+            tags.update(LocalCache.ls_remote_tags(package.url))
+        if not self.offline and package.config.hex:
+            try:
+                tags.update(get_hex_versions(package.name))
+            except (OSError, ValueError, KeyError) as e:
+                warning('Can\'t get ' + package.name + ' versions from hex: {0}'.format(e))
+        return list(tags)
+
     # check if local cache contains this dep
     def exists_local(self, package: Package) -> bool:
         if package.url is not None and self.local_cache.exists(package):  # local cache has this package
@@ -66,12 +141,17 @@ class CacheMan:
     def exists_remote(self, cache: Cache, dep: Package) -> bool:
         try:
             cache.fetch_package(dep)
+            self._breaker.success(cache.name)
             self.add_fetched(cache, dep)
             self.__fetch_all_deps(cache, dep)
             return True
         except RemoteCacheException as e:
+            self._breaker.success(cache.name)
             warning(cache.name + ': {0}'.format(e))
             return False
+        except OSError as e:  # connection problems. Requests exceptions are OSErrors too
+            self._breaker.failure(cache.name, e)
+            return False
         except Exception as e:
             warning('Error from remote cache ' + cache.name + ': {0}'.format(e))
             return False
@@ -90,8 +170,12 @@ class CacheMan:
             self.local_cache.fetch_package(package)
 
     def fetch_version(self, fullname: str, vsn: str) -> bool:
-        for cache in self.remote_caches.values():
-            maybe_package = cache.fetch_version(fullname, vsn)
+        if self.concurrent_remotes:
+            caches = (cache for cache, _ in self.__answered_remotes(lambda c: c.has_version(fullname, vsn)))
+        else:
+            caches = self.available_remotes
+        for cache in caches:
+            maybe_package = self.__call_remote(cache, lambda c: c.fetch_version(fullname, vsn))
             if maybe_package:
                 self.add_fetched(cache, maybe_package)
                 return True
@@ -99,10 +183,14 @@ class CacheMan:
         return False
 
     def get_versions(self, fullname: str) -> list:
-        for cache in self.remote_caches.values():
-            versions = cache.get_versions(fullname)
-            if versions:
+        if self.concurrent_remotes:
+            for _, versions in self.__answered_remotes(lambda c: c.get_versions(fullname)):
                 return versions
+        else:
+            for cache in self.available_remotes:
+                versions = self.__call_remote(cache, lambda c: c.get_versions(fullname))
+                if versions:
+                    return versions
         warning('No such package ' + fullname)
         return []
 
@@ -129,10 +217,9 @@ class CacheMan:
 
     # search for missing dep in other remote caches. If nothing found - fetch, build and add it manually
     def __obtain_missing_dep(self, not_found_cache: Cache, dep: Package):
-        other_remote = self.remote_caches
-        for cache in other_remote.values():  # try to find dep in other remotes
+        for cache in self.ordered_remotes:  # try to find dep in other remotes
             if cache is not not_found_cache:
-                if cache.exists(dep):
+                if self.__call_remote(cache, lambda c: c.exists(dep)):
                     warning('Took dep ' + dep.name + ' from ' + cache.name)
                     cache.fetch_package(dep)
                     self.add_fetched(cache, dep)
@@ -141,6 +228,77 @@ class CacheMan:
         self.local_cache.fetch_package(dep)
         return self.local_cache.add_package(dep)
 
+    # Query remote caches concurrently. Yield caches, which answered positively, with their answers, in answer order.
+    # The fastest known cache is queried first, others - only if it hasn't answered positively during HEAD_START.
+    # Cache, which hasn't answered previous query yet (f.e. hung), is not queried again.
+    def __answered_remotes(self, probe):
+        caches = [cache for cache in self.ordered_remotes if not self.__is_probing(cache)]
+        if not caches:
+            return
+        head, rest = caches[0], caches[1:]
+        futures = {self.__submit(head, probe): head}
+        if head.name in self._latency:
+            done, _ = wait(futures, timeout=HEAD_START)
+            for future in done:
+                del futures[future]
+                answer = self.__answer(head, future)
+                if answer:
+                    yield head, answer
+        futures.update({self.__submit(cache, probe): cache for cache in rest})
+        for future in as_completed(futures):
+            answer = self.__answer(futures[future], future)
+            if answer:
+                yield futures[future], answer
+
+    def __submit(self, cache: Cache, probe):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=len(self.remote_caches))
+        future = self._executor.submit(self.__timed_probe, cache, probe)
+        self._probes[cache.name] = future
+        return future
+
+    def __is_probing(self, cache: Cache) -> bool:
+        future = self._probes.get(cache.name)
+        if future is not None and not future.done():
+            debug('skip ' + cache.name + ', previous query is not answered yet')
+            return True
+        return False
+
+    # result of concurrent query. Connection errors are counted, other errors are shown
+    def __answer(self, cache: Cache, future):
+        try:
+            return future.result()
+        except OSError as e:
+            self._breaker.failure(cache.name, e)
+        except Exception as e:
+            warning('Error from remote cache ' + cache.name + ': {0}'.format(e))
+        return None
+
+    # run probe on cache, remember how long did it take
+    def __timed_probe(self, cache: Cache, probe):
+        start = time.monotonic()
+        answer = probe(cache)
+        self._latency[cache.name] = time.monotonic() - start
+        self._breaker.success(cache.name)
+        return answer
+
+    # run probe on cache. Connection errors are counted, cache is skipped if it is unreachable.
+    def __call_remote(self, cache: Cache, probe):
+        if self._breaker.is_open(cache.name):
+            debug('skip unreachable ' + cache.name)
+            return None
+        try:
+            answer = probe(cache)
+        except RemoteCacheException as e:
+            self._breaker.success(cache.name)
+            warning(cache.name + ': {0}'.format(e))
+            return None
+        except OSError as e:
+            self._breaker.failure(cache.name, e)
+            return None
+        self._breaker.success(cache.name)
+        return answer
+
     # Check if all deps exist in local cache
     def __check_all_deps(self, package: Package):
         for dep in package.deps:
@@ -0,0 +1,29 @@
+from enot.utils.logger import warning, debug
+
+
+# Counts consecutive connection failures of remote caches.
+# After threshold failures cache is considered unreachable till the end of the session.
+class CircuitBreaker:
+    def __init__(self, threshold: int):
+        self._threshold = threshold
+        self._failures = {}
+        self._open = set()
+
+    @property
+    def threshold(self) -> int:
+        return self._threshold
+
+    def is_open(self, name: str) -> bool:  # cache is unreachable, should be skipped
+        return name in self._open
+
+    def success(self, name: str):  # cache answered (even if it doesn't have the package)
+        self._failures[name] = 0
+
+    def failure(self, name: str, reason: Exception):
+        failures = self._failures.get(name, 0) + 1
+        self._failures[name] = failures
+        debug('Connection to ' + name + ' failed (' + str(failures) + '): {0}'.format(reason))
+        if failures >= self.threshold and name not in self._open:
+            self._open.add(name)
+            warning(name + ' is unreachable after ' + str(failures) +
+                    ' attempts, skip it for the rest of the build. Last error: {0}'.format(reason))
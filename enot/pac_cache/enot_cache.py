@@ -13,6 +13,9 @@ class EnotCache(RemoteCache):
         cache_url = conf['url']
         super().__init__(name, temp_dir, cache_url, default_erlang, CacheType.ENOT)
 
+    def exists(self, package: Package) -> bool:
+        return self.has_version(package.fullname, package.git_vsn)
+
     def get_versions(self, fullname: str) -> list:
         versions = self._get_versions(fullname)
         return [pv['ref'] for pv in versions]
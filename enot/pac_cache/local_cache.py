@@ -1,19 +1,35 @@
+import hashlib
 import json
 import os
+import re
 import shutil
 import stat
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
 from os import listdir
 from os.path import join
+from urllib.parse import urlparse
 
-from git import Repo
-from pkg_resources import Requirement, resource_filename
+from git import Repo, Git, GitCommandError
+from jinja2 import Template
 
-import enot
 from enot.pac_cache.cache import Cache, CacheType
+from enot.pac_cache.remote_cache_exception import RemoteCacheException
+from enot.packages.config import config_factory
+from enot.packages.config.config import ConfigFile, get_hex_checksums
 from enot.packages.package import Package
-from enot.utils.file_utils import if_dir_exists, ensure_dir, link_if_needed, copy_file
+from enot.utils.file_utils import if_dir_exists, ensure_dir, link_if_needed, copy_file, write_file
 from enot.utils.file_utils import remove_dir
-from enot.utils.logger import debug, info
+from enot.utils.hex_utils import download_package, HEX_REPO
+from enot.utils.http_utils import download_archive
+from enot.utils.logger import debug, info, warning
+from enot.utils.resources import resource_path
+
+GIT_ENV = {'GIT_TERMINAL_PROMPT': '0'}  # fail instead of asking for credentials
+COMMIT_HASH = re.compile('^[0-9a-f]{40}$')
+LS_REMOTE_WORKERS = 8
+SPARSE_PATHS = ['src', 'include', 'c_src', 'priv']  # needed for build. Root files are always checked out
+CONFIG_FILES = ['enot_config.json', 'rebar.config', 'Makefile', 'erlang.mk']  # used to detect project's config
 
 
 class LocalCache(Cache):
@@ -26,12 +42,40 @@ class LocalCache(Cache):
         ensure_dir(temp_dir)
         ensure_dir(self.tool_dir)
         self._locks = {}
-        self.__fill_locks()
+        self._commits = {}  # (fullname, git_vsn) -> commit hash of fetched version
+        self._offline = False
+        self._sparse_checkout = conf.get('sparse_checkout', False)
+        self._archives = conf.get('archives', {})
+        self._hex_repo = conf.get('hex_repo', HEX_REPO)
 
     @property
     def tool_dir(self):
         return join(self.path, 'tool')
 
+    @property
+    def mirror_dir(self):  # bare git mirrors of all fetched deps
+        return join(self.path, 'git_mirrors')
+
+    @property
+    def offline(self) -> bool:  # git and other network sources are not allowed
+        return self._offline
+
+    @offline.setter
+    def offline(self, offline: bool):
+        self._offline = offline
+
+    @property
+    def sparse_checkout(self) -> bool:  # checkout and download only files needed for build
+        return self._sparse_checkout
+
+    @property
+    def archives(self) -> dict:  # host -> url template of tag archive
+        return self._archives
+
+    @property
+    def hex_repo(self) -> str or None:  # repository of hex tarballs. Hex deps are fetched from git if not set
+        return self._hex_repo
+
     @property
     def locks(self) -> dict:
         return self._locks
@@ -46,6 +90,23 @@ class LocalCache(Cache):
     def set_lock(self, dep: Package, hash_str: str):
         self._locks[dep.fullname] = dep.git_branch + '-' + hash_str
 
+    # load project's locks
+    def load_locks(self, path: str):
+        locks_file = join(path, 'enot_locks.json')
+        self._locks = {}  # cache is shared between projects
+        if os.path.isfile(locks_file):
+            with open(locks_file, 'r') as file:
+                self._locks = json.load(file)
+
+    # Commit hash of package's version if it is known: fetched in this session or locked branch
+    def get_commit(self, package: Package) -> str or None:
+        if (package.fullname, package.git_vsn) in self._commits:
+            return self._commits[(package.fullname, package.git_vsn)]
+        vsn, need_lock = self.__get_vsn(package)
+        if package.git_tag is None and not need_lock:
+            return vsn
+        return None
+
     def get_package_path(self, package: Package, no_null=False) -> str or None:
         if package.git_tag is not None:  # normal tagged dep
             return join(package.fullname, package.git_vsn, self.erlang_version)
@@ -68,15 +129,42 @@ class LocalCache(Cache):
 
     # clone git repo to tmp, make package to scan and update it's config
     def fetch_package(self, dep: Package):
+        if self.offline:
+            raise RuntimeError('Offline mode: ' + dep.fullname + ' (' + str(dep.git_vsn) + ') not found in local cache')
         temp_path = join(self.temp_dir, dep.name)
         info('fetch ' + temp_path)
         remove_dir(temp_path)
         vsn, need_lock = self.__get_vsn(dep)
-        hash_str = LocalCache.fetch(dep.url, vsn, temp_path)
+        if dep.config.hex_only:
+            if dep.git_tag is None or not self.__fetch_hex(dep, temp_path):
+                raise RuntimeError('Can\'t fetch ' + dep.name + ' (' + str(dep.git_vsn) + ') from hex repo')
+            from_archive = True
+        else:
+            from_archive = dep.git_tag is not None and (self.__fetch_hex(dep, temp_path) or
+                                                        self.__fetch_archive(dep, temp_path))
+        if not from_archive:
+            hash_str = self.fetch(dep.url, vsn, temp_path)
+            self._commits[(dep.fullname, dep.git_vsn)] = hash_str
         dep.update_from_cache(temp_path)
+        if self.sparse_checkout and not from_archive:
+            LocalCache.__extend_checkout(dep, temp_path)
         if need_lock:
             self.set_lock(dep, hash_str)
 
+    # Resolve heads of unlocked branch deps remotely, without cloning. Deps are queried concurrently.
+    # If resolved commit was already built - lock it, so it will be taken from local cache.
+    def resolve_branches(self, deps: list):
+        unlocked = {dep.fullname: dep for dep in deps if dep.url and self.__get_vsn(dep)[1]}
+        if not unlocked:
+            return
+        deps = list(unlocked.values())
+        with ThreadPoolExecutor(max_workers=min(len(deps), LS_REMOTE_WORKERS)) as executor:
+            heads = list(executor.map(lambda d: LocalCache.ls_remote(d.url, d.git_branch), deps))
+        for dep, hash_str in zip(deps, heads):
+            if hash_str and self.check_exists(join(dep.fullname, dep.git_branch + '-' + hash_str, self.erlang_version)):
+                debug(dep.fullname + ' ' + dep.git_branch + ' head ' + hash_str + ' is already in cache')
+                self.set_lock(dep, hash_str)
+
     # add built package to local cache, update its path
     def add_package(self, package: Package, rewrite=False) -> bool:
         full_dir = join(self.path, self.get_package_path(package, True))
@@ -97,7 +185,7 @@ class LocalCache(Cache):
             package.generate_package()
         copy_file(join(path, 'enot_config.json'), join(full_dir, 'enot_config.json'))
         copy_file(enot_package, join(full_dir, package.name + '.ep'))
-        resource = resource_filename(Requirement.parse(enot.APPNAME), 'enot/resources/EmptyMakefile')
+        resource = resource_path('EmptyMakefile')
         debug('copy ' + resource + ' to ' + join(full_dir, 'Makefile'))
         copy_file(resource, join(full_dir, 'Makefile'))
         package.path = full_dir  # update package's dir to point to cache
@@ -141,19 +229,13 @@ class LocalCache(Cache):
         cache_path = join(self.tool_dir, toolname)
         link_if_needed(cache_path, join(package.path, toolname))
 
-    # load package's locks.
-    def __fill_locks(self):
-        if os.path.isfile('enot_locks.json'):
-            with open('enot_locks.json', 'r') as file:
-                self._locks = json.load(file)
-
     # Return git version to use and should lock flag
     def __get_vsn(self, dep: Package):
         if dep.git_tag:  # no need to check lock over tag version
             return dep.git_tag, False
-        lock = self.get_lock(dep.name)
+        lock = self.get_lock(dep.fullname)
         if lock:  # this package's version is locked, return locked commit's hash
-            [branch, hash_str] = lock.split('-')
+            [branch, hash_str] = lock.rsplit('-', 1)
             if branch == dep.git_branch:  # same branch locked
                 return hash_str, False
             return dep.git_branch, True  # locked branch was changed
@@ -165,9 +247,120 @@ class LocalCache(Cache):
         include_dst = join(package_path, 'deps', name, dir_to_link)
         return link_if_needed(include_src, include_dst)
 
+    # Update bare mirror of url with rev's objects and check rev out to path as a worktree of the mirror.
+    # Only objects, missing in mirror, are downloaded. Return checked out commit hash.
+    def fetch(self, url, rev, path) -> str:
+        try:
+            mirror = self.__update_mirror(url, rev)
+            hash_str = mirror.git.rev_parse(LocalCache.__mirror_ref(rev) + '^{commit}')
+            mirror.git.worktree('prune')  # forget worktrees of removed temp dirs
+            if self.sparse_checkout:
+                LocalCache.__sparse_worktree(mirror, path, hash_str)
+            else:
+                mirror.git.worktree('add', '--detach', path, hash_str)
+            return hash_str
+        except GitCommandError as e:
+            warning('Can\'t use git mirror for ' + url + ', clone it: {0}'.format(e.stderr))
+            remove_dir(path)
+            return LocalCache.clone(url, rev, path)
+
+    # Read config of tagged dep's version from dep's git mirror without checking it out.
+    # Mirror is created or updated with tag's objects if needed.
+    # Return None if mirror can't be fetched (f.e. offline or dep is hex only) or config can't be read.
+    def read_config(self, dep: Package) -> ConfigFile or None:
+        if dep.git_tag is None or dep.url is None or dep.config.hex_only:
+            return None
+        mirror_path = self.__mirror_path(dep.url)
+        ref = LocalCache.__mirror_ref(dep.git_tag)
+        try:
+            if os.path.isdir(mirror_path) and LocalCache.__has_commit(Repo(mirror_path), ref):
+                mirror = Repo(mirror_path)
+            elif self.offline:
+                return None
+            else:
+                mirror = self.__update_mirror(dep.url, dep.git_tag)
+            files = mirror.git.ls_tree('--name-only', ref).splitlines()
+            meta_path = join(self.temp_dir, 'meta', dep.name)
+            remove_dir(meta_path)
+            ensure_dir(meta_path)
+            for file in CONFIG_FILES:
+                if file in files:  # erlang.mk is only a marker of build system
+                    content = mirror.git.show(ref + ':' + file) if file != 'erlang.mk' else ''
+                    write_file(join(meta_path, file), content)
+            return config_factory.read_project(meta_path, url=dep.url)
+        except (GitCommandError, ValueError) as e:
+            debug('Can\'t read ' + dep.name + ' ' + dep.git_tag + ' config from mirror: {0}'.format(e))
+            return None
+
+    # Download tagged hex dep's tarball from hex repo. Return False if it is not a hex dep or tarball can't be used.
+    def __fetch_hex(self, dep: Package, path: str) -> bool:
+        if not dep.config.hex or not self.hex_repo:
+            return False
+        vsn = dep.git_tag[1:] if dep.git_tag.startswith('v') else dep.git_tag  # hex versions have no v prefix
+        info('download ' + dep.name + ' ' + vsn + ' from ' + self.hex_repo)
+        try:
+            download_package(self.hex_repo, dep.name, vsn, path, get_hex_checksums(dep.name, vsn))
+            if not any(os.path.isfile(join(path, file)) for file in CONFIG_FILES):
+                raise RuntimeError('no supported build config in package')
+            return True
+        except (RemoteCacheException, RuntimeError, OSError, tarfile.TarError) as e:
+            warning('Can\'t fetch ' + dep.name + ' ' + vsn + ' from hex: {0}'.format(e))
+            remove_dir(path)
+            return False
+
+    # Download tagged dep's archive, if archive url template is set for dep's host. Return False if git should be used.
+    def __fetch_archive(self, dep: Package, path: str) -> bool:
+        url = self.__archive_url(dep)
+        if url is None:
+            return False
+        info('download ' + url)
+        try:
+            download_archive(url, path)
+            return True
+        except (RemoteCacheException, RuntimeError, OSError, tarfile.TarError) as e:
+            warning('Can\'t download ' + url + ', fetch ' + dep.name + ' with git: {0}'.format(e))
+            remove_dir(path)
+            return False
+
+    def __archive_url(self, dep: Package) -> str or None:
+        parsed = urlparse(dep.url)
+        template = self.archives.get(parsed.netloc)
+        paths = parsed.path.strip('/').split('/')
+        if template is None or len(paths) < 2:
+            return None
+        [namespace, name] = paths[-2:]
+        return Template(template).render(url=dep.url, host=parsed.netloc, namespace=namespace, name=name,
+                                         tag=dep.git_tag)
+
+    # List tags of remote repo without cloning
+    @staticmethod
+    def ls_remote_tags(url) -> list:
+        try:
+            out = Git().ls_remote('--tags', '--refs', url, env=GIT_ENV)
+        except GitCommandError as e:
+            debug('Can\'t list tags of ' + url + ': {0}'.format(e.stderr))
+            return []
+        return [line.split('refs/tags/', 1)[1] for line in out.splitlines() if 'refs/tags/' in line]
+
+    # Get hash of branch's head without cloning. Return None if it can't be resolved.
     @staticmethod
-    def fetch(url, rev, path):
-        repo = Repo.clone_from(url, path)
+    def ls_remote(url, branch) -> str or None:
+        try:
+            out = Git().ls_remote(url, 'refs/heads/' + branch, env=GIT_ENV)
+        except GitCommandError as e:
+            debug('Can\'t resolve ' + url + ' ' + branch + ': {0}'.format(e.stderr))
+            return None
+        if not out:
+            return None
+        return out.split()[0]
+
+    # Clone only requested tag or branch tip. Full history is fetched only for locked commit hashes.
+    @staticmethod
+    def clone(url, rev, path) -> str:
+        if COMMIT_HASH.match(rev):
+            repo = Repo.clone_from(url, path, env=GIT_ENV)
+        else:
+            repo = LocalCache.__shallow_clone(url, rev, path)
         if repo.bare:
             raise RuntimeError('Empty repo ' + url)
         git = repo.git
@@ -175,6 +368,87 @@ class LocalCache(Cache):
         repo.create_head(rev)
         return repo.head.object.hexsha
 
+    def __mirror_path(self, url) -> str:
+        return join(self.mirror_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.git')
+
+    def __get_mirror(self, url) -> (Repo, bool):
+        mirror_path = self.__mirror_path(url)
+        if os.path.isdir(mirror_path):
+            return Repo(mirror_path), False
+        mirror = Repo.init(mirror_path, bare=True)
+        mirror.create_remote('origin', url)
+        if self.sparse_checkout:  # partial clone: blobs are downloaded only when checked out
+            with mirror.config_writer() as config:
+                config.set_value('core', 'repositoryformatversion', 1)
+                config.set_value('extensions', 'partialClone', 'origin')
+                config.set_value('remote "origin"', 'promisor', True)
+                config.set_value('remote "origin"', 'partialclonefilter', 'blob:none')
+        return mirror, True
+
+    # Fetch rev to mirror. Shallow mirrors stay shallow, unless commit hash is requested.
+    def __update_mirror(self, url, rev) -> Repo:
+        mirror, new = self.__get_mirror(url)
+        shallow = os.path.isfile(join(mirror.git_dir, 'shallow'))
+        try:
+            with mirror.git.custom_environment(**GIT_ENV):
+                if not COMMIT_HASH.match(rev):
+                    depth = ['--depth', '1'] if new or shallow else []
+                    mirror.git.fetch(*depth, 'origin', '+' + rev + ':' + LocalCache.__mirror_ref(rev))
+                elif not LocalCache.__has_commit(mirror, rev):  # locked commit needs history
+                    unshallow = ['--unshallow'] if shallow else []
+                    mirror.git.fetch(*unshallow, 'origin', '+refs/heads/*:refs/heads/*', '+refs/tags/*:refs/tags/*')
+        except GitCommandError:
+            if new:  # don't keep empty mirror
+                remove_dir(mirror.git_dir)
+            raise
+        return mirror
+
+    @staticmethod
+    def __sparse_worktree(mirror: Repo, path: str, hash_str: str):
+        mirror.git.worktree('add', '--no-checkout', '--detach', path, hash_str)
+        worktree = Repo(path)
+        worktree.git.sparse_checkout('set', '--cone', *SPARSE_PATHS)
+        with worktree.git.custom_environment(**GIT_ENV):
+            worktree.git.checkout('--detach')
+
+    # Checkout paths, declared in dep's config. Prebuild actions can use anything - checkout all.
+    @staticmethod
+    def __extend_checkout(dep: Package, path: str):
+        try:
+            worktree = Repo(path)
+            with worktree.git.custom_environment(**GIT_ENV):
+                if dep.config.prebuild:
+                    debug(dep.name + ' has prebuild actions, checkout all files')
+                    worktree.git.sparse_checkout('disable')
+                elif dep.config.sparse_paths:
+                    worktree.git.sparse_checkout('add', *dep.config.sparse_paths)
+        except GitCommandError as e:  # not a sparse checkout (cloned directly)
+            debug('Can\'t change checkout of ' + dep.name + ': {0}'.format(e.stderr))
+
+    @staticmethod
+    def __mirror_ref(rev) -> str:
+        if COMMIT_HASH.match(rev):
+            return rev
+        return 'refs/enot/' + rev
+
+    @staticmethod
+    def __has_commit(repo: Repo, hash_str: str) -> bool:
+        try:
+            repo.git.cat_file('-e', hash_str + '^{commit}')
+            return True
+        except GitCommandError:
+            return False
+
+    @staticmethod
+    def __shallow_clone(url, rev, path) -> Repo:
+        branch = {} if rev == 'HEAD' else {'branch': rev, 'single_branch': True}
+        try:
+            return Repo.clone_from(url, path, env=GIT_ENV, depth=1, **branch)
+        except GitCommandError as e:  # server doesn't support shallow clones or rev is not a ref
+            warning('Shallow clone of ' + url + ' (' + rev + ') failed, fetch full history: {0}'.format(e.stderr))
+            remove_dir(path)
+            return Repo.clone_from(url, path, env=GIT_ENV)
+
     @staticmethod
     def __copy_include(rewrite, full_dir, path):
         cache_include = join(full_dir, 'include')
@@ -12,6 +12,10 @@ class RemoteCache(Cache):
     def exists(self, package: Package) -> bool:
         return True
 
+    # check if cache has package's version built with current erlang
+    def has_version(self, fullname: str, version: str) -> bool:
+        return self.erlang_version in self.get_erl_versions(fullname, version)
+
     @abstractmethod
     def add_package(self, package: Package, rewrite=True) -> bool:
         pass
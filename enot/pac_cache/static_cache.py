@@ -0,0 +1,93 @@
+import json
+import os
+from os import listdir
+from os.path import join, isdir, isfile
+
+from enot.pac_cache.cache import CacheType
+from enot.pac_cache.remote_cache import RemoteCache
+from enot.pac_cache.remote_cache_exception import RemoteCacheException
+from enot.packages.package import Package
+from enot.utils.file_utils import write_file
+from enot.utils.http_utils import read_url, download_url
+from enot.utils.logger import warning, info
+
+INDEX_FILE = 'index.json'
+
+
+# Remote cache without any api. Packages are served from a plain directory (file://) or
+# static http server, using the same layout as local cache: Namespace/Project/Ref/Erlang/Project.ep
+# All available packages are listed in index.json in the root of the cache:
+# {"Namespace/Project": {"Ref": ["Erlang", ...]}}
+class StaticCache(RemoteCache):
+    def __init__(self, temp_dir: str, default_erlang: str, conf: dict):
+        name = conf['name']
+        cache_url = conf['url'].rstrip('/')
+        super().__init__(name, temp_dir, cache_url, default_erlang, CacheType.STATIC)
+        self._index = None
+
+    @property
+    def index(self) -> dict:  # loaded once per session
+        if self._index is None:
+            self._index = self.__load_index()
+        return self._index
+
+    def exists(self, package: Package) -> bool:
+        return self.has_version(package.fullname, package.git_vsn)
+
+    def get_versions(self, fullname: str) -> list:
+        return list(self.index.get(fullname, {}).keys())
+
+    def get_erl_versions(self, fullname: str, version: str) -> list:
+        return self.index.get(fullname, {}).get(version, [])
+
+    def fetch_version(self, fullname: str, version: str) -> Package or None:
+        [name] = fullname.split('/')[-1:]
+        write_path = self.__download_package(name, fullname, version)
+        return Package.from_package(write_path)
+
+    def add_package(self, package: Package, rewrite=True) -> bool:
+        raise RuntimeError('Not implemented')
+
+    def fetch_package(self, package: Package):
+        write_path = self.__download_package(package.name, package.fullname, package.git_vsn)
+        package.update_from_package(write_path)
+
+    # Scan static cache directory and write its index.json. Return the index.
+    @staticmethod
+    def generate_index(path: str) -> dict:
+        index = {}
+        for namespace in StaticCache.__list_dirs(path):
+            for project in StaticCache.__list_dirs(join(path, namespace)):
+                project_path = join(path, namespace, project)
+                versions = {}
+                for ref in StaticCache.__list_dirs(project_path):
+                    erl_versions = [erl for erl in StaticCache.__list_dirs(join(project_path, ref))
+                                    if isfile(join(project_path, ref, erl, project + '.ep'))]
+                    if erl_versions:
+                        versions[ref] = sorted(erl_versions)
+                if versions:
+                    index[namespace + '/' + project] = versions
+        write_file(join(path, INDEX_FILE), json.dumps(index, sort_keys=True, indent=4))
+        info('indexed ' + str(len(index)) + ' packages in ' + path)
+        return index
+
+    def __load_index(self) -> dict:
+        try:
+            return json.loads(read_url(self.path + '/' + INDEX_FILE).decode('utf-8'))
+        except RemoteCacheException as e:
+            warning(self.name + ': {0}'.format(e))
+            return {}
+
+    def __download_package(self, name: str, fullname: str, version: str) -> str:
+        if not self.has_version(fullname, version):
+            raise RemoteCacheException('Package ' + fullname + ':' + version + ' not found')
+        url = '/'.join([self.path, fullname, version, self.erlang_version, name + '.ep'])
+        write_path = join(self.temp_dir, name + '.ep')
+        download_url(url, write_path)
+        return write_path
+
+    @staticmethod
+    def __list_dirs(path: str) -> list:
+        if not os.path.exists(path):
+            return []
+        return [d for d in listdir(path) if isdir(join(path, d))]
@@ -6,6 +6,8 @@ from os.path import join
 from tarfile import TarFile
 
 from enot.utils.erl_file_utils import parse_app_config, contains_app_file, parse_app_config_content
+from enot.utils.parse_cache import parse_cache
+from enot.utils.project_scanner import ProjectSnapshot
 
 
 class AppConfig:
@@ -17,8 +19,16 @@ class AppConfig:
         self._compose_app_file = compose
 
     @classmethod
-    # Find and parse src/Name.app.src. If none - find and parse ebin/Name.app. If none - return None
-    def from_path(cls, path: str) -> 'AppConfig' or None:
+    # Find and parse src/Name.app.src. If none - find and parse ebin/Name.app. If none - return None.
+    # Is taken from parse cache, if app files were not changed.
+    def from_path(cls, path: str, snapshot: ProjectSnapshot or None = None) -> 'AppConfig' or None:
+        if snapshot is None:
+            snapshot = ProjectSnapshot.scan(path)
+        files = snapshot.app_files('src') + snapshot.app_files('ebin', suffix='.app')
+        return parse_cache.get('app', [path], files, lambda: cls.parse_path(path))
+
+    @classmethod
+    def parse_path(cls, path: str) -> 'AppConfig' or None:
         src_path = join(path, 'src')
         if contains_app_file(src_path):  # Check .app.src
             name, vsn, apps, template = parse_app_config(src_path)
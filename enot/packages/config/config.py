@@ -1,11 +1,16 @@
 import json
 from abc import ABCMeta, abstractmethod
 from os.path import join
-from urllib import request
 
 from enot.compiler.compiler_type import Compiler
+from enot.packages import semver
 from enot.packages.dep import Dep
 from enot.utils.file_utils import write_file
+from enot.utils.hex_utils import hex_meta, CHECKSUMS
+from enot.utils.logger import warning
+
+HEX_PACKAGES = 'https://hex.pm/packages/'
+HEX_API_TIMEOUT = 10  # seconds
 
 """
 Project config file. Can be rebar.config (Rebar1-3), config in Makefile (erlang.mk) or enot_config.json (enot)
@@ -17,17 +22,63 @@ def write_package_config(path, package_config):
 
 
 def request_hex_info(name: str) -> dict:
-    package = request.urlopen('https://hex.pm/api/packages/' + name)
+    from urllib import request  # slow to import, is needed only when metadata is not cached
+    package = request.urlopen('https://hex.pm/api/packages/' + name, timeout=HEX_API_TIMEOUT)
     return json.loads(package.read().decode())
 
 
+def request_hex_release(name: str, vsn: str) -> dict:
+    from urllib import request
+    release = request.urlopen('https://hex.pm/api/packages/' + name + '/releases/' + vsn, timeout=HEX_API_TIMEOUT)
+    return json.loads(release.read().decode())
+
+
+# Checksums of hex release, published by hex registry. Taken from package's metadata if it has them,
+# requested otherwise. Empty if they are unknown (f.e. offline).
+def get_hex_checksums(name: str, vsn: str) -> dict:
+    try:
+        releases = get_hex_info(name).get('releases', [])
+    except RuntimeError:
+        releases = []
+    known = [release for release in releases if release['version'] == vsn and release.get('checksum')]
+    if known:
+        release = known[0]
+    elif hex_meta.offline:
+        return {}
+    else:
+        try:
+            release = request_hex_release(name, vsn)
+        except (OSError, ValueError) as e:
+            warning('Can\'t get ' + name + ' ' + vsn + ' checksum from hex: {0}'.format(e))
+            return {}
+    return {key: release[key] for key in CHECKSUMS if release.get(key)}
+
+
+# Hex package's metadata. Is requested only if it is not known or expired.
+def get_hex_info(name: str) -> dict:
+    return hex_meta.get(name, lambda n: request_hex_info(n))
+
+
+# Request metadata of all hex deps of the config at once, before parsing them one by one
+def prefetch_hex_info(names: list):
+    hex_meta.prefetch(names, lambda n: request_hex_info(n))
+
+
+# Hex dep is fetched from hex repo. Its GitHub url (if any) is used to fetch sources, when hex repo is not available.
+# Dep without GitHub url gets its hex page as url: it is hex only and can't be fetched with git.
 def get_dep_info_from_hex(name: str, tag: str) -> Dep:
-    parsed = request_hex_info(name)
+    parsed = get_hex_info(name)
     meta = parsed['meta']
-    links = meta['links']
+    links = meta.get('links') or {}
     links_lower = {k.lower(): v for k, v in links.items()}  # sometimes Hex have GitHub and sometimes Github it response
-    url = links_lower['github']
-    return Dep(url, None, tag=tag)
+    url = links_lower.get('github', HEX_PACKAGES + name)
+    if not semver.is_version(tag):  # requirement, like '~> 1.2'. Tag will be chosen by resolver
+        return Dep(url, None, vsn=tag, hex=True)
+    return Dep(url, None, tag=tag, hex=True)
+
+
+def get_hex_versions(name: str) -> list:
+    return [release['version'] for release in get_hex_info(name).get('releases', [])]
 
 
 class ConfigFile(metaclass=ABCMeta):
@@ -53,6 +104,9 @@ class ConfigFile(metaclass=ABCMeta):
         self._compare_versions = True
         self._install = []
         self._uninstall = []
+        self._sparse_paths = []
+        self._vsn_constraint = None
+        self._hex = False
 
     @property
     def name(self) -> str:  # project's name
@@ -78,6 +132,26 @@ class ConfigFile(metaclass=ABCMeta):
     def git_tag(self, tag):
         self._git_tag = tag
 
+    @property
+    def vsn_constraint(self) -> str or None:  # version requirement of dep
+        return self._vsn_constraint
+
+    @vsn_constraint.setter
+    def vsn_constraint(self, constraint):
+        self._vsn_constraint = constraint
+
+    @property
+    def hex(self) -> bool:  # dep is published on hex, its tarball can be fetched from hex repo
+        return self._hex
+
+    @hex.setter
+    def hex(self, hex):
+        self._hex = hex
+
+    @property
+    def hex_only(self) -> bool:  # hex dep without git repo, can be fetched only from hex repo
+        return self.hex and self.url is not None and self.url.startswith(HEX_PACKAGES)
+
     @property
     def fullname(self) -> str or None:  # namespace/name
         return self._fullname
@@ -126,6 +200,10 @@ class ConfigFile(metaclass=ABCMeta):
     def prebuild(self) -> list:  # actions to be run before the build
         return self._prebuild
 
+    @property
+    def sparse_paths(self) -> list:  # additional paths to checkout in sparse checkout mode
+        return self._sparse_paths
+
     @property
     def build_vars(self) -> list:  # erlang build vars, passed to the compiler (string or tuple of size 2)
         return self._build_vars
@@ -192,6 +270,8 @@ class ConfigFile(metaclass=ABCMeta):
         if self.uninstall:
             uninstall = [action.export() for action in self.uninstall]
             export['uninstall'] = uninstall
+        if self.sparse_paths:
+            export['sparse_paths'] = self.sparse_paths
         if self.fullname:
             export['fullname'] = self.fullname
         if self.git_tag is not None:
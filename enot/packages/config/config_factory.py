@@ -1,14 +1,26 @@
-from os import listdir
-from os.path import isfile, join
+from os.path import join
 
 from enot.packages.config.config import ConfigFile
 from enot.packages.config.enot import EnotConfig
 from enot.packages.config.erlang_mk import ErlangMkConfig
 from enot.packages.config.rebar import RebarConfig
+from enot.utils.parse_cache import parse_cache
+from enot.utils.project_scanner import ProjectSnapshot
 
 
-def read_project(path: str, url=None) -> ConfigFile:
-    files = get_files(path)
+CONFIG_FILES = ['enot_config.json', 'erlang.mk', 'rebar.config', 'Makefile']
+
+
+# Parse project's config. Is taken from parse cache, if config files were not changed.
+def read_project(path: str, url=None, snapshot: ProjectSnapshot or None = None) -> ConfigFile:
+    if snapshot is None:
+        snapshot = ProjectSnapshot.scan(path)
+    files = snapshot.files
+    return parse_cache.get('project', [path, url], [join(path, file) for file in CONFIG_FILES if file in files],
+                           lambda: parse_project(path, files, url=url))
+
+
+def parse_project(path: str, files: list, url=None) -> ConfigFile:
     if 'enot_config.json' in files:
         return EnotConfig.from_path(path, url=url)
     elif 'erlang.mk' in files:
@@ -16,8 +28,3 @@ def read_project(path: str, url=None) -> ConfigFile:
     elif 'rebar.config' in files:
         return RebarConfig(path, url=url)
     raise ValueError("Unknown build system in project " + path)
-
-
-def get_files(path: str) -> list:
-    all_objects = listdir(path)
-    return [d for d in all_objects if isfile(join(path, d))]
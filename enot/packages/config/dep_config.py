@@ -9,6 +9,8 @@ class DepConfig(ConfigFile):
         self._url = dep.url
         self._git_tag = dep.tag
         self._git_branch = dep.branch
+        self._vsn_constraint = dep.vsn
+        self._hex = dep.hex
 
     def get_compiler(self):
         RuntimeError("Dep " + self.name + "can't be compiled")
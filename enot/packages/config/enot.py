@@ -2,22 +2,21 @@ import json
 from os.path import join
 from tarfile import TarFile
 
-from enot.action import action_factory
-from enot.action.release import Release
 from enot.compiler.compiler_type import Compiler
-from enot.packages.config.config import ConfigFile, get_dep_info_from_hex
+from enot.packages.config.config import ConfigFile, get_dep_info_from_hex, prefetch_hex_info
 from enot.packages.dep import Dep
 from enot.utils.file_utils import read_file
 
 
 def parse_deps(deps: list) -> dict:
     found = {}
+    prefetch_hex_info([dep['name'] for dep in deps if 'url' not in dep])
     for dep in deps:
         name = dep['name']
         if 'url' not in dep:
-            found[name] = get_dep_info_from_hex(name, dep['tag'])
+            found[name] = get_dep_info_from_hex(name, dep.get('tag', dep.get('vsn')))
         else:
-            found[name] = Dep(dep['url'], dep.get('branch', None), tag=dep.get('tag', None))
+            found[name] = Dep(dep['url'], dep.get('branch', None), tag=dep.get('tag', None), vsn=dep.get('vsn', None))
     return found
 
 
@@ -43,11 +42,12 @@ class EnotConfig(ConfigFile):
         self._fullname = config.get('fullname', None)
         self._compare_versions = config.get('compare_versions', True)
         self._prebuild = EnotConfig.parse_steps(config.get('prebuild', []))
+        self._sparse_paths = config.get('sparse_paths', [])
         self._install = EnotConfig.parse_steps(config.get('install', []))
         self._is_release = False
-        for action in self.install:
-            if isinstance(action, Release):
-                self._is_release = True
+        if self.install:
+            from enot.action.release import Release
+            self._is_release = any(isinstance(action, Release) for action in self.install)
         self._uninstall = EnotConfig.parse_steps(config.get('uninstall', []))
 
     @property
@@ -82,6 +82,9 @@ class EnotConfig(ConfigFile):
 
     @staticmethod
     def parse_steps(steps: list) -> list:
+        if not steps:
+            return []
+        from enot.action import action_factory  # actions import compilers and tools, which are slow to import
         actions = []
         for step in steps:
             [(action_type, params)] = step.items()
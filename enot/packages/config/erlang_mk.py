@@ -1,5 +1,4 @@
 import re
-from distutils.sysconfig import parse_makefile
 from os.path import join
 
 from enot.compiler.compiler_type import Compiler
@@ -57,6 +56,7 @@ class ErlangMkConfig(ConfigFile):
         super().__init__()
         self._path = path
         makefile = join(path, 'Makefile')
+        from distutils.sysconfig import parse_makefile  # slow to import, is needed only for erlang.mk projects
         content = parse_makefile(makefile)
         self._url = url
         self.__conf_init(content)
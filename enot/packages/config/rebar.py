@@ -1,31 +1,29 @@
 from os.path import join
 
-from erl_terms.erl_terms_core import decode
-
 from enot.compiler.compiler_type import Compiler
-from enot.packages.config.config import ConfigFile, get_dep_info_from_hex
+from enot.packages.config.config import ConfigFile, get_dep_info_from_hex, prefetch_hex_info
 from enot.packages.dep import Dep
 from enot.utils.erl_file_utils import parse_platform_define
 from enot.utils.file_utils import read_file
 
 
 # TODO raw is not supported for now
-def parse_dep_body(body: tuple) -> Dep:
+def parse_dep_body(body: tuple, vsn=None) -> Dep:
     if body[0] != 'git':
         raise RuntimeError('Unsupported dep type: ' + body[0] + ', only git is supported.')
     if len(body) == 2:
-        return Dep(body[1], 'master')
+        return Dep(body[1], 'master', vsn=vsn)
     if len(body) == 3:
         rev = body[2]
         if isinstance(rev, str):
             if rev == '':
-                return Dep(body[1], 'HEAD')
+                return Dep(body[1], 'HEAD', vsn=vsn)
             else:
-                return Dep(body[1], rev)
+                return Dep(body[1], rev, vsn=vsn)
         if len(rev) == 2 and rev[0] == 'branch' or rev[0] == 'ref':
-            return Dep(body[1], rev[1])
+            return Dep(body[1], rev[1], vsn=vsn)
         if len(rev) == 2 and rev[0] == 'tag':
-            return Dep(body[1], 'master', rev[1])
+            return Dep(body[1], 'master', rev[1], vsn=vsn)
     raise RuntimeError('Unknown dep ' + str(body))
 
 
@@ -34,6 +32,7 @@ class RebarConfig(ConfigFile):
         super().__init__()
         self._path = path
         self._platform_defines = []
+        from erl_terms.erl_terms_core import decode  # slow to import, parsed configs are usually taken from cache
         rebarconfig = decode(read_file(join(path, 'rebar.config')))
         self._url = url
         self.__parse_config(rebarconfig)
@@ -53,16 +52,19 @@ class RebarConfig(ConfigFile):
                 self.__parse_erl_opts(value)
 
     def __parse_deps(self, deps):
+        prefetch_hex_info([dep[0] for dep in deps if isinstance(dep[-1], str)])
         for dep in deps:
             name = dep[0]
+            vsn = None
             if len(dep) == 2:  # {Dep, {git, Url, Rev}}
                 body = dep[1]
             else:
-                body = dep[2]  # {Dep, VsnRegex, {git, Url, Rev}}
+                vsn = dep[1]  # {Dep, VsnRegex, {git, Url, Rev}}
+                body = dep[2]
             if isinstance(body, str):
                 self.deps[name] = get_dep_info_from_hex(name, body)
             else:
-                self.deps[name] = parse_dep_body(body)
+                self.deps[name] = parse_dep_body(body, vsn=vsn)
 
     def __parse_erl_opts(self, value):
         for opt in value:
@@ -1,8 +1,10 @@
 class Dep:
-    def __init__(self, url: str, branch: str or None, tag=None):
+    def __init__(self, url: str, branch: str or None, tag=None, vsn=None, hex=False):
         self._url = Dep.__cut_git(url)
         self._tag = tag
         self._branch = branch
+        self._vsn = vsn
+        self._hex = hex
 
     @property
     def url(self) -> str:
@@ -16,6 +18,14 @@ class Dep:
     def branch(self) -> str:
         return self._branch
 
+    @property
+    def vsn(self) -> str or None:  # version requirement, f.e. '~> 1.2'. Is not a part of dep's identity
+        return self._vsn
+
+    @property
+    def hex(self) -> bool:  # dep is published on hex. Is not a part of dep's identity
+        return self._hex
+
     def __eq__(self, other):
         if isinstance(other, Dep):
             return self.url == other.url and self.tag == other.tag and self.branch == other.branch
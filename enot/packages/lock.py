@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+from os.path import join
+
+from enot.packages.dep import Dep
+from enot.packages.package import Package
+from enot.packages.resolver import Resolver
+from enot.utils.logger import debug
+
+CONFIG_HASH = 'config_hash'  # hash of root project's deps declarations, lock is valid only for them
+TEST_CONFIG_HASH = 'test_config_hash'  # hash of test deps declarations, is set only if test deps are locked too
+PACKAGES = 'packages'  # name -> resolved package. Branch locks are kept by fullnames, as before
+
+
+# Hash of everything in project's config, which affects deps resolution
+def config_hash(package: Package) -> str:
+    declared = {'deps': {name: __declaration(dep) for name, dep in package.config.deps.items()},
+                'compare_versions': package.compare_versions}
+    return hashlib.sha1(json.dumps(declared, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def test_config_hash(package: Package) -> str:
+    declared = {name: __declaration(dep) for name, dep in package.config.test_deps.items()}
+    return hashlib.sha1(json.dumps(declared, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+# Lock every resolved package: its version in local cache, commit, content hash and direct deps.
+# If test deps were not populated (test_config_hash_str is None), but packages were taken from the lock
+# with locked test deps - test deps stay locked.
+def lock_packages(local_cache, config_hash_str: str, test_config_hash_str: str or None, packages: dict,
+                  from_lock=False):
+    old = local_cache.locks.get(PACKAGES, {})
+    if test_config_hash_str is None and from_lock:
+        test_config_hash_str = local_cache.locks.get(TEST_CONFIG_HASH)
+    locked = {}
+    if test_config_hash_str is not None and from_lock:
+        locked.update(old)
+    for name, package in packages.items():
+        path = local_cache.get_package_path(package, True)
+        if path is None:  # can't be taken from local cache
+            continue
+        ref = os.path.basename(os.path.dirname(path))
+        previous = old.get(name, {})
+        if previous.get('ref') != ref:
+            previous = {}
+        locked[name] = {'fullname': package.fullname,
+                        'url': package.url,
+                        'tag': package.git_tag,
+                        'branch': package.git_branch,
+                        'hex': package.config.hex,
+                        'ref': ref,
+                        'commit': local_cache.get_commit(package) or previous.get('commit'),
+                        'content_hash': __content_hash(local_cache, package, ref) or previous.get('content_hash'),
+                        'deps': sorted([dep.name for dep in package.deps])}
+    local_cache.locks[CONFIG_HASH] = config_hash_str
+    if test_config_hash_str is None:
+        local_cache.locks.pop(TEST_CONFIG_HASH, None)
+    else:
+        local_cache.locks[TEST_CONFIG_HASH] = test_config_hash_str
+    local_cache.locks[PACKAGES] = locked
+
+
+# Drop resolved packages, so deps will be resolved again. Branch locks are kept.
+def unlock_packages(local_cache):
+    local_cache.locks.pop(CONFIG_HASH, None)
+    local_cache.locks.pop(TEST_CONFIG_HASH, None)
+    local_cache.locks.pop(PACKAGES, None)
+
+
+# Construct packages straight from the lock and the local cache, without resolution.
+# test_config_hash_str is None if test deps are not needed.
+# Return None if lock doesn't match project's config or some locked package is not in local cache.
+def locked_packages(local_cache, deps: list, config_hash_str: str, test_config_hash_str: str or None = None) \
+        -> dict or None:
+    if local_cache.locks.get(CONFIG_HASH) != config_hash_str:
+        return None
+    if test_config_hash_str is not None and local_cache.locks.get(TEST_CONFIG_HASH) != test_config_hash_str:
+        return None
+    locked = local_cache.locks.get(PACKAGES, {})
+    packages = {}
+    names = [dep.name for dep in deps]
+    while names:
+        name = names.pop()
+        if name in packages:
+            continue
+        package = __from_lock(local_cache, name, locked.get(name))
+        if package is None:
+            return None
+        packages[name] = package
+        names += locked[name]['deps']
+    Resolver.link_duplicates(deps, packages)
+    return packages
+
+
+def __from_lock(local_cache, name: str, entry: dict or None) -> Package or None:
+    if entry is None:
+        debug(name + ' is not locked')
+        return None
+    if entry['tag'] is None and local_cache.get_lock(entry['fullname']) != entry['ref']:
+        debug(name + ' branch lock was changed')
+        return None
+    path = join(local_cache.path, entry['fullname'], entry['ref'], local_cache.erlang_version)
+    if not os.path.isdir(path):
+        debug(name + ' ' + entry['ref'] + ' is not in local cache')
+        return None
+    package = Package.from_dep(name, Dep(entry['url'], entry['branch'], tag=entry['tag'],
+                                         hex=entry.get('hex', False)))
+    if entry.get('content_hash') and __file_hash(join(path, name + '.ep')) != entry['content_hash']:
+        debug(name + ' ' + entry['ref'] + ' content differs from locked')
+        return None
+    package.update_from_cache(path)
+    if sorted([dep.name for dep in package.deps]) != entry['deps']:
+        debug(name + ' ' + entry['ref'] + ' deps differ from locked')
+        return None
+    return package
+
+
+def __declaration(dep: Dep) -> list:
+    return [dep.url, dep.branch, dep.tag, dep.vsn]
+
+
+def __content_hash(local_cache, package: Package, ref: str) -> str or None:
+    return __file_hash(join(local_cache.path, package.fullname, ref, local_cache.erlang_version, package.name + '.ep'))
+
+
+def __file_hash(path: str) -> str or None:
+    if not os.path.isfile(path):
+        return None
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(65536), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
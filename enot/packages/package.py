@@ -12,15 +12,19 @@ from enot.packages.config.enot import EnotConfig
 from enot.packages.config.dep_config import DepConfig
 from enot.packages.dep import Dep
 from enot.utils.file_utils import tar
+from enot.utils.git_utils import get_head_tag
 from enot.utils.logger import info
+from enot.utils.project_scanner import ProjectSnapshot
 
 
 class Package:
-    def __init__(self, path: str or None, config: ConfigFile or None, app_config: AppConfig or None, has_nifs=False):
+    def __init__(self, path: str or None, config: ConfigFile or None, app_config: AppConfig or None, has_nifs=False,
+                 snapshot: ProjectSnapshot or None = None):
         self._config = config
         self._app_config = app_config
         self._path = path
         self._has_nifs = has_nifs
+        self._snapshot = snapshot
         self._deps = []
         self._test_deps = []
         self.__set_deps()
@@ -48,6 +52,10 @@ class Package:
     def git_tag(self) -> str or None:  # git tag
         return self.config.git_tag
 
+    @property
+    def vsn_constraint(self) -> str or None:  # version requirement, set by dependent package
+        return self.config.vsn_constraint
+
     @property
     def compare_versions(self) -> bool:
         return self.config.compare_versions
@@ -72,6 +80,16 @@ class Package:
     def path(self, path):
         self._path = path
 
+    @property
+    def snapshot(self) -> ProjectSnapshot:  # files of package's path. Is scanned once, till rescan is called
+        if self._snapshot is None or self._snapshot.path != self.path:
+            self._snapshot = ProjectSnapshot.scan(self.path)
+        return self._snapshot
+
+    # forget package's files, they will be scanned on next access
+    def rescan(self):
+        self._snapshot = None
+
     @property
     def app_config(self) -> AppConfig or None:  # .app.src or .app
         return self._app_config
@@ -119,10 +137,10 @@ class Package:
     @classmethod  # TODO url is not set here!
     # Package is created from path on local system. Usually when opening project
     def from_path(cls, path: str, url=None):
-        config = config_factory.read_project(path, url=url)
-        app_config = AppConfig.from_path(path)
-        has_nifs = os.path.exists(join(path, 'c_src'))  # TODO search for .so files in priv?
-        return cls(path, config, app_config, has_nifs)
+        snapshot = ProjectSnapshot.scan(path)
+        config = config_factory.read_project(path, url=url, snapshot=snapshot)
+        app_config = AppConfig.from_path(path, snapshot=snapshot)
+        return cls(path, config, app_config, snapshot.has_nifs, snapshot)
 
     @classmethod
     # Package is created from enot package archive.
@@ -144,16 +162,22 @@ class Package:
         name = self.name
         git_tag = self.git_tag
         git_branch = self.git_branch
-        self._config = config_factory.read_project(path, url=self.url)
+        vsn_constraint = self.vsn_constraint
+        hex = self.config.hex
+        snapshot = ProjectSnapshot.scan(path)
+        self._config = config_factory.read_project(path, url=self.url, snapshot=snapshot)
         self._config.git_tag = git_tag
         self._config.git_branch = git_branch
+        self._config.vsn_constraint = vsn_constraint
+        self._config.hex = hex
         if self.config.name == '':
             self.config.name = name
         if not self.fullname:
             self.config.fullname_from_git(self.url)
-        self._app_config = AppConfig.from_path(path)
-        self._has_nifs = os.path.exists(join(path, 'c_src'))
+        self._app_config = AppConfig.from_path(path, snapshot=snapshot)
+        self._has_nifs = snapshot.has_nifs
         self._path = path
+        self._snapshot = snapshot
         self.__set_deps()
 
     # Update Package, created by from_dep classmethod.
@@ -162,9 +186,13 @@ class Package:
         name = self.name
         git_tag = self.git_tag
         git_branch = self.git_branch
+        vsn_constraint = self.vsn_constraint
+        hex = self.config.hex
         self.__do_update_from_package(path, self.url)
         self.config.git_tag = git_tag  # TODO refactor me
         self.config.git_branch = git_branch
+        self.config.vsn_constraint = vsn_constraint
+        self.config.hex = hex
         if self.config.name == '':
             self.config.name = name
         if not self.fullname:
@@ -180,6 +208,7 @@ class Package:
         self._path = package.path
         self._deps = package.deps
         self._has_nifs = package.has_nifs
+        self._snapshot = package._snapshot
 
     def export(self) -> dict:
         export = self.config.export()
@@ -240,10 +269,7 @@ class Package:
                 if not self.url:
                     self.config.url = repo.remotes.origin.url  # TODO remove .git ending?
                 if not self.git_tag:
-                    tag_name = None
-                    for tag in repo.tags:
-                        if tag.commit == repo.head.commit:
-                            tag_name = tag.path
+                    tag_name = get_head_tag(repo)
                     if tag_name:
                         paths = tag_name.split('/')
                         [tag] = paths[-1:]
@@ -4,37 +4,39 @@ from os import listdir
 from os.path import join
 
 from enot.compiler.compiler_factory import get_compiler
+from enot.compiler.enot import EnotCompiler
 from enot.compiler.relx import RelxCompiler
-from enot.global_properties import GlobalProperties
+from enot.compiler.warm_node import ShellServer
+from enot.global_properties import GlobalProperties, global_properties
+from enot.packages import lock
 from enot.packages.package import Package
-from enot.utils.file_utils import remove_dir
-from enot.utils.logger import debug, info, warning
-
-
-# Can raise ValueError
-# Returns [major, minor, bugfix] semver
-def try_get_semver(vsn: str) -> list:
-    if vsn.startswith('v'):
-        to_parse = vsn[1:]
-    else:
-        to_parse = vsn
-    return to_parse.split('.')
+from enot.packages.resolver import Resolver
+from enot.utils.file_utils import read_file, remove_dir, write_file
+from enot.utils.logger import error, info
 
 
 class Builder:
-    def __init__(self, path: str, package: Package or None):
+    # lock is False for packages, built in local cache: their locks are not written
+    def __init__(self, path: str, package: Package or None, system_config: GlobalProperties or None = None,
+                 lock=True):
         super().__init__()
-        self._system_config = GlobalProperties()
+        self._system_config = system_config or global_properties()
         self._path = path
         self._packages = {}
         self._project = package
         self._define = ''
         self._rescan_deps = False
+        self._config_hash = None
+        self._test_config_hash = None
+        self._from_lock = False
+        self._lock = lock
+        if package is not None:
+            self.system_config.cache.local_cache.load_locks(package.path)
 
     @classmethod
-    def init_from_path(cls, path) -> 'Builder':
+    def init_from_path(cls, path, system_config: GlobalProperties or None = None, lock=True) -> 'Builder':
         package = Package.from_path(path)
-        return cls(path, package)
+        return cls(path, package, system_config, lock)
 
     @classmethod
     def init_without_package(cls, path) -> 'Builder':
@@ -83,28 +85,49 @@ class Builder:
         self.project.generate_package()
 
     # Run unit and common tests
-    def unit_test(self) -> bool:
+    def unit_test(self, jobs=1, changed=False) -> bool:
         compiler = get_compiler(self.system_config, self.define, self.project)
-        return compiler.unit()
+        return compiler.unit(jobs, changed)
 
-    def common_test(self, log_dir):
+    def common_test(self, log_dir, jobs=1, changed=False):
+        compiler = get_compiler(self.system_config, self.define, self.project)
+        return compiler.common(log_dir, jobs, changed)
+
+    # Keep test node running and run tests in it on test-run requests. Deps should be built already.
+    def test_shell(self, define: str = '') -> bool:
+        self._define = define
         compiler = get_compiler(self.system_config, self.define, self.project)
-        return compiler.common(log_dir)
+        if not isinstance(compiler, EnotCompiler):
+            error('Test shell supports only projects, built with enot')
+            return False
+        return ShellServer(compiler, self.project.config).serve()
 
-    # Parse package config, download missing deps to /tmp
+    # Parse package config, select deps versions, download missing deps to /tmp.
+    # If lock matches project's config and all locked packages are in local cache - take them without resolution.
     def populate(self, include_test_deps=False):
+        self._config_hash = lock.config_hash(self.project)
+        self._test_config_hash = lock.test_config_hash(self.project) if include_test_deps else None
         deps = self.project.deps
         if include_test_deps:
             deps += self.project.test_deps
-        self.__populate_deps(deps)
-        locks = self.system_config.cache.local_cache.locks
-        if locks:
-            self.dump_locs(locks)
+        local_cache = self.system_config.cache.local_cache
+        packages = lock.locked_packages(local_cache, deps, self._config_hash, self._test_config_hash)
+        self._from_lock = packages is not None
+        if packages is None:
+            resolver = Resolver(self.system_config.cache, self.compare_versions)
+            packages = resolver.resolve(deps)
+        else:
+            info('use locked deps')
+        self._packages = packages
+        self.__update_locks()
 
-    # dump package's locs if there are some.
+    # dump package's locs if there are some. File is not rewritten if locks are the same.
     def dump_locs(self, locks: dict):
-        with open(join(self.project.path, 'enot_locks.json'), 'w') as file:
-            json.dump(locks, file, sort_keys=True, indent=4)
+        path = join(self.project.path, 'enot_locks.json')
+        content = json.dumps(locks, sort_keys=True, indent=4)
+        if os.path.isfile(path) and read_file(path) == content:
+            return
+        write_file(path, content)
 
     # if name is None - remove all locs. if set - remove only locs for name
     def drop_locs(self, name: str or None):  # drop locs for one or all packages
@@ -112,7 +135,8 @@ class Builder:
         if name is None:
             cache.locks = {}
         else:
-            del cache.locks[name]
+            cache.locks.pop(name, None)
+            lock.unlock_packages(cache)
         with open(join(self.project.path, 'enot_locks.json'), 'w') as file:
             json.dump(cache.locks, file, sort_keys=True, indent=4)
 
@@ -121,18 +145,28 @@ class Builder:
         build_res = self.__build_tree(self.project, is_subpackage=False)
         if self.rescan_deps:
             self.__rescan_deps()
+        self.__update_locks()  # built deps have content hashes now
         return build_res
 
     def deps(self):
         self.__build_deps(self.project, is_subpackage=False)
         if self.rescan_deps:
             self.__rescan_deps()
+        self.__update_locks()
 
     def release(self):
         compiler = RelxCompiler(self.project)
         compiler.ensure_tool(self.system_config.cache.local_cache)
         return compiler.compile()
 
+    # lock populated packages and dump all locks
+    def __update_locks(self):
+        local_cache = self.system_config.cache.local_cache
+        if not self._lock or self._config_hash is None or not (self.packages or local_cache.locks):
+            return
+        lock.lock_packages(local_cache, self._config_hash, self._test_config_hash, self.packages, self._from_lock)
+        self.dump_locs(local_cache.locks)
+
     # Build all deps, add to cache and link to project
     def __build_deps(self, package: Package, is_subpackage=True):
         info('build deps for ' + package.name)
@@ -163,47 +197,6 @@ class Builder:
             self.system_config.cache.add_package_local(package)
         return res
 
-    def __populate_deps(self, level):  # TODO add an ability to fetch deps in parallel
-        next_level = []
-        for dep in level:
-            if dep.name not in self.packages:
-                debug('new dep: ' + dep.name)
-                self.system_config.cache.populate(dep)  # populated dep becomes package
-                self.packages[dep.name] = dep
-                next_level += dep.deps
-            else:
-                next_level += self.__compare_and_select(dep)
-        if next_level:
-            self.__populate_deps(next_level)
-
-    def __compare_and_select(self, dep: Package) -> list:
-        pkg_vsn = self.packages[dep.name].git_vsn
-        additional_deps = []
-        if dep.git_vsn != pkg_vsn:  # It is not the same dep
-            try:  # try to compare versions
-                additional_deps = self.__compare_vsns(dep, pkg_vsn)
-            except ValueError:  # not m.m.b version (may be tag vs branch). Just replace.
-                warning('Skip ' + dep.name + ' (' + dep.git_vsn + '). Use ' + pkg_vsn)
-        dep.update_from_duplicate(self.packages[dep.name])
-        return additional_deps
-
-    # compare to versions, update to newer or fail if incompatible majors. Do not compare if disallowed.
-    def __compare_vsns(self, dep: Package, pkg_vsn):
-        if not self.compare_versions:
-            raise ValueError  # skip vsn check - always prefer versions closer to root
-        [major1, minor1, bug1] = try_get_semver(dep.git_vsn)
-        [major2, minor2, bug2] = try_get_semver(pkg_vsn)
-        if major1 != major2:
-            raise RuntimeError(
-                'Deps ' + dep.name + ' has incompatible versions: ' + pkg_vsn + ' vs ' + dep.git_vsn)
-        if minor1 > minor2 or bug1 > bug2:  # dep is newer than selected - prefer it
-            info('Prefer newer version for ' + dep.name + ', ' + pkg_vsn + ' -> ' + dep.git_vsn)
-            self.packages[dep.name] = dep
-            # TODO try use same repo to speed up new vsn fetch
-            self.system_config.cache.populate(dep)
-            return dep.deps
-        return []
-
     # list deps directory and compare to packages, which should always be actual due to
     # populate at the beginning of the build. If dep is in deps dir, but not in self.packages
     # this dep is dead and should be unlinked.
@@ -1,11 +1,10 @@
+import os
 from os.path import join
 
-from enot.packages.package_builder import Builder
+from appdirs import user_config_dir
 from tinydb import TinyDB, where
 
-from enot.global_properties import GlobalProperties
-from enot.pac_cache.local_cache import LocalCache
-from enot.packages.package import Package
+import enot
 from enot.utils.logger import warning, info
 
 INSTALLED_TABLE = 'installed'
@@ -13,20 +12,27 @@ DATABASE_FILE = 'enot_index.json'
 
 
 class Controller:
-    def __init__(self) -> None:
+    def __init__(self, conf_dir=user_config_dir(enot.APPNAME), system_config=None) -> None:
         super().__init__()
-        self._system_config = GlobalProperties()
+        self._conf_dir = conf_dir
+        self._system_config = system_config
 
+    # system configuration, shared with builders. Is imported on first access, as caches are slow to import.
     @property
-    def system_config(self) -> GlobalProperties:  # system configuration
+    def system_config(self):
+        if self._system_config is None:
+            from enot.global_properties import global_properties
+            self._system_config = global_properties(self._conf_dir)
         return self._system_config
 
+    # Index of installed packages. Doesn't load system config, if it was not injected.
     @property
     def db_path(self) -> str:
-        return join(self.system_config.conf_dir, DATABASE_FILE)
+        conf_dir = self._conf_dir if self._system_config is None else self._system_config.conf_dir
+        return join(conf_dir, DATABASE_FILE)
 
     @property
-    def local_cache(self) -> LocalCache:
+    def local_cache(self):
         return self.system_config.cache.local_cache
 
     def fetch(self, fullname: str, maybe_version: str or None) -> bool:
@@ -43,7 +49,9 @@ class Controller:
         erlang_vsns = self.local_cache.get_erl_versions(fullname, vsn)
         [latest_erl] = erlang_vsns[-1:]
         # populate and build deps
-        builder = Builder.init_from_path(join(self.local_cache.path, fullname, vsn, latest_erl))
+        from enot.packages.package_builder import Builder
+        builder = Builder.init_from_path(join(self.local_cache.path, fullname, vsn, latest_erl), self.system_config,
+                                         lock=False)
         builder.populate()
         builder.deps()
         if builder.project.install(self.system_config, latest_erl):
@@ -61,6 +69,7 @@ class Controller:
             vsn = package['vsn']
             erlang_vsns = self.local_cache.get_erl_versions(fullname, package['vsn'])
             [latest_erl] = erlang_vsns[-1:]
+            from enot.packages.package import Package
             pack = Package.from_path(join(self.local_cache.path, fullname, vsn, latest_erl))
             if not pack.uninstall():
                 warning('Can\'t uninstall package ' + fullname + ': ' + vsn)
@@ -69,7 +78,10 @@ class Controller:
             self.__remove_from_installed(fullname, vsn)
         return True
 
+    # doesn't touch system config and caches - just reads the index
     def installed(self) -> list:
+        if not os.path.exists(self.db_path):
+            return []
         return self.__get_all_installed()
 
     # if version is none - search remote caches for versions
@@ -0,0 +1,158 @@
+from enot.packages import semver
+from enot.packages.dep import Dep
+from enot.packages.package import Package
+from enot.packages.semver import Constraint
+from enot.utils.logger import debug, info, warning
+
+
+# Selects exactly one version of every dep in the tree before fetching dep's sources.
+# Deps of every considered version are read from local cache or git mirror if possible, so superseded
+# versions are not downloaded. Only selected versions are populated.
+# Tag versions are compatible if they have the same major, the newest one is selected. Version
+# requirements (vsn_constraint) are checked against tags of dep's repo. Branch deps and deps of projects
+# with compare_versions disabled are not compared - requirement closer to the root wins.
+class Resolver:
+    def __init__(self, cache, compare_versions=True):
+        self._cache = cache
+        self._compare_versions = compare_versions
+        self._deps = {}  # (name, git_vsn) -> deps of this version
+        self._tags = {}  # name -> all known tags
+
+    # Return selected and populated packages by names
+    def resolve(self, deps: list) -> dict:
+        selected = {}
+        seen_states = set()
+        while True:
+            requirements = self.__collect(deps, selected)
+            changed = False
+            for name, required in requirements.items():
+                choice = self.__choose(name, required)
+                current = selected.get(name)
+                if current is None or current.git_vsn != choice.git_vsn:
+                    if current is not None:
+                        info('Prefer ' + name + ' ' + choice.git_vsn + ' over ' + current.git_vsn)
+                    selected[name] = choice
+                    changed = True
+            for name in [name for name in selected if name not in requirements]:  # required only by superseded
+                debug('drop ' + name)
+                del selected[name]
+                changed = True
+            if not changed:
+                break
+            state = frozenset((name, package.git_vsn) for name, package in selected.items())
+            if state in seen_states:
+                raise RuntimeError('Can\'t resolve deps: versions ' + str(sorted(state)) + ' change in circle')
+            seen_states.add(state)
+        for package in selected.values():
+            if package.path is None:  # deps were read without fetching
+                self._cache.populate(package)
+        Resolver.link_duplicates(deps, selected)
+        return selected
+
+    # Walk tree of currently selected versions. Return all requirements for each dep, closer to the root first.
+    def __collect(self, deps: list, selected: dict) -> dict:
+        requirements = {}
+        level = deps
+        while level:
+            new = []
+            for dep in level:
+                if dep.name not in requirements:
+                    requirements[dep.name] = []
+                    new.append(dep.name)
+                requirements[dep.name].append(dep)
+            expand = [selected[name] for name in new if name in selected]
+            self._cache.resolve_branches([package for package in expand if not self.__is_known(package)])
+            level = []
+            for package in expand:
+                level += self.__deps_of(package)
+        return requirements
+
+    def __is_known(self, package: Package) -> bool:
+        return package.path is not None or (package.name, package.git_vsn) in self._deps
+
+    # Deps of package's version. Read from local cache or dep's git mirror. Populate only if they can't be read
+    # this way (f.e. dep has no git url or mirror can't be fetched).
+    def __deps_of(self, package: Package) -> list:
+        key = (package.name, package.git_vsn)
+        if key not in self._deps:
+            if package.path is not None:
+                deps = package.deps
+            else:
+                deps = self._cache.read_deps(package)
+                if deps is None:
+                    debug('can\'t read ' + package.name + ' ' + str(package.git_vsn) + ' deps, populate it')
+                    self._cache.populate(package)
+                    deps = package.deps
+            self._deps[key] = deps
+        return self._deps[key]
+
+    def __choose(self, name: str, required: list) -> Package:
+        first = required[0]
+        if not Resolver.__is_semver(first):
+            Resolver.__warn_skipped(first, required[1:])
+            return first
+        if self._compare_versions:
+            comparable = [dep for dep in required if Resolver.__is_semver(dep)]
+        else:  # only the closest to the root requirement is used
+            comparable = [first]
+        Resolver.__warn_skipped(first, [dep for dep in required if dep not in comparable])
+        candidates = {}
+        for dep in reversed(comparable):  # requirement closer to the root is preferred for the same tag
+            if dep.git_tag is not None:
+                candidates[dep.git_tag] = dep
+        if any(dep.git_tag is None for dep in comparable):  # version range - search in all tags
+            for tag in self.__get_tags(first):
+                candidates.setdefault(tag, None)
+        try:
+            allowed = [tag for tag in candidates
+                       if semver.is_version(tag) and all(Resolver.__allows(dep, tag) for dep in comparable)]
+        except ValueError as e:
+            raise RuntimeError('Dep ' + name + ' has bad version requirement: {0}'.format(e))
+        if not allowed:
+            raise RuntimeError('Deps ' + name + ' has incompatible versions: ' +
+                               ', '.join([Resolver.__describe(dep) for dep in comparable]))
+        best = max(allowed, key=semver.parse)
+        if candidates[best] is None:
+            selected = Dep(first.url, None, tag=best, vsn=first.vsn_constraint, hex=first.config.hex)
+            return Package.from_dep(name, selected)
+        return candidates[best]
+
+    def __get_tags(self, package: Package) -> list:
+        if package.name not in self._tags:
+            self._tags[package.name] = self._cache.get_tags(package)
+        return self._tags[package.name]
+
+    @staticmethod
+    def __is_semver(dep: Package) -> bool:
+        if dep.git_tag is not None:
+            return semver.is_version(dep.git_tag)
+        return dep.git_branch is None and dep.vsn_constraint is not None \
+            and dep.vsn_constraint.strip() not in semver.UNCONSTRAINED
+
+    @staticmethod
+    def __allows(dep: Package, tag: str) -> bool:
+        if dep.vsn_constraint is not None and not Constraint(dep.vsn_constraint).allows(tag):
+            return False
+        if dep.git_tag is not None:
+            return semver.compatible(dep.git_tag, tag)
+        return True
+
+    @staticmethod
+    def __describe(dep: Package) -> str:
+        if dep.git_tag is not None:
+            return dep.git_tag
+        return dep.vsn_constraint
+
+    @staticmethod
+    def __warn_skipped(used: Package, skipped: list):
+        for dep in skipped:
+            if dep.git_vsn != used.git_vsn:
+                warning('Skip ' + dep.name + ' (' + str(dep.git_vsn) + '). Use ' + str(used.git_vsn))
+
+    # Make every requirement of the dep in the tree point to the selected package
+    @staticmethod
+    def link_duplicates(deps: list, selected: dict):
+        for dep in deps + [dep for package in selected.values() for dep in package.deps]:
+            package = selected.get(dep.name)
+            if package is not None and dep is not package:
+                dep.update_from_duplicate(package)
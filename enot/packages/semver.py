@@ -0,0 +1,95 @@
+import re
+
+VERSION = re.compile(r'^v?(\d+)(?:\.(\d+))?(?:\.(\d+))?(-[0-9A-Za-z.-]+)?(\+[0-9A-Za-z.-]+)?$')
+REQUIREMENT = re.compile(r'^(==|!=|>=|<=|~>|>|<)?\s*(\S+)$')
+UNCONSTRAINED = ['', '.*']  # rebar's {dep, "", {git, Url, Rev}} allows any version
+
+
+# Parse Major.Minor.Bugfix version (with optional v prefix) to comparable tuple. Missing parts are zeros.
+# Pre-release versions are lower than release ones. Raise ValueError if it is not a version.
+def parse(vsn: str) -> tuple:
+    match = VERSION.match(vsn or '')
+    if not match:
+        raise ValueError('Not a semantic version: ' + str(vsn))
+    major, minor, bugfix, pre, _ = match.groups()
+    return int(major), int(minor or 0), int(bugfix or 0), pre is None
+
+
+def is_version(vsn: str) -> bool:
+    try:
+        parse(vsn)
+        return True
+    except ValueError:
+        return False
+
+
+# vsn can replace base: same major and not older
+def compatible(base: str, vsn: str) -> bool:
+    parsed_base = parse(base)
+    parsed = parse(vsn)
+    return parsed[0] == parsed_base[0] and parsed >= parsed_base
+
+
+# Version requirement. Supports hex/mix style requirements: '~> 1.2', '>= 1.0.0 and < 2.0.0', '1.0.0 or 2.0.0'
+# Anything else is treated as rebar's version regex, f.e. "1\\.0\\..*". Raise ValueError if it is not a regex.
+class Constraint:
+    def __init__(self, spec: str):
+        self._spec = spec.strip()
+        self._alternatives = None
+        self._regex = None
+        if self.unconstrained:
+            return
+        try:
+            self._alternatives = [[Constraint.__parse_requirement(req) for req in alternative.split(' and ')]
+                                  for alternative in self._spec.split(' or ')]
+        except ValueError:
+            self._alternatives = None
+            try:
+                self._regex = re.compile(self._spec)
+            except re.error as e:
+                raise ValueError('Bad version requirement "' + self._spec + '": {0}'.format(e))
+
+    @property
+    def spec(self) -> str:
+        return self._spec
+
+    @property
+    def unconstrained(self) -> bool:
+        return self._spec in UNCONSTRAINED
+
+    def allows(self, vsn: str) -> bool:
+        if self.unconstrained:
+            return True
+        if self._regex is not None:
+            return self._regex.fullmatch(vsn) is not None or self._regex.fullmatch(vsn.lstrip('v')) is not None
+        try:
+            parsed = parse(vsn)
+        except ValueError:
+            return False
+        return any(all(check(parsed) for check in alternative) for alternative in self._alternatives)
+
+    @staticmethod
+    def __parse_requirement(requirement: str):
+        match = REQUIREMENT.match(requirement.strip())
+        if not match:
+            raise ValueError('Not a requirement: ' + requirement)
+        op, vsn = match.groups()
+        bound = parse(vsn)
+        if op is None or op == '==':
+            return lambda v: v == bound
+        if op == '!=':
+            return lambda v: v != bound
+        if op == '>=':
+            return lambda v: v >= bound
+        if op == '<=':
+            return lambda v: v <= bound
+        if op == '>':
+            return lambda v: v > bound
+        if op == '<':
+            return lambda v: v < bound
+        # ~> 2.1 allows 2.x (x >= 1), ~> 2.1.3 allows 2.1.x (x >= 3)
+        if vsn.count('.') >= 2:
+            upper = (bound[0], bound[1] + 1, 0, False)
+        else:
+            upper = (bound[0] + 1, 0, 0, False)
+        return lambda v: bound <= v < upper
@@ -0,0 +1,66 @@
+import gzip
+import hashlib
+import struct
+
+ATOM_CHUNKS = [b'AtU8', b'Atom']
+# Chunks, which define module's behaviour. Debug info, compile info, docs and line numbers are not included,
+# so recompilation of the same code or moving it to other lines doesn't change module's hash.
+CODE_CHUNKS = [b'AtU8', b'Atom', b'Code', b'StrT', b'ImpT', b'ExpT', b'FunT', b'LitT', b'LocT', b'Attr']
+
+
+# Read compiled module. Return hash of it's code and it's atoms (module name is the first one).
+# All modules, module calls, uses as behaviour or in funs, are in it's atoms.
+def read_beam(path: str) -> (str, list):
+    with open(path, 'rb') as file:
+        content = file.read()
+    if content[:2] == b'\x1f\x8b':  # compiled with compressed option
+        content = gzip.decompress(content)
+    chunks = parse_chunks(content)
+    md5 = hashlib.md5()
+    for chunk_id in CODE_CHUNKS:
+        if chunk_id in chunks:
+            md5.update(chunk_id + chunks[chunk_id])
+    for chunk_id in ATOM_CHUNKS:
+        if chunk_id in chunks:
+            return md5.hexdigest(), parse_atoms(chunks[chunk_id], 'utf-8' if chunk_id == b'AtU8' else 'latin-1')
+    raise ValueError('No atoms in ' + path)
+
+
+# Return chunk id -> chunk data
+def parse_chunks(content: bytes) -> dict:
+    if content[:4] != b'FOR1' or content[8:12] != b'BEAM':
+        raise ValueError('Not a beam file')
+    chunks = {}
+    pos = 12
+    while pos + 8 <= len(content):
+        chunk_id = content[pos:pos + 4]
+        [size] = struct.unpack('>I', content[pos + 4:pos + 8])
+        chunks[chunk_id] = content[pos + 8:pos + 8 + size]
+        pos += 8 + (size + 3) // 4 * 4  # chunks are 4 bytes aligned
+    return chunks
+
+
+# Atoms are prefixed with count. Negative count means that atom lengths use compact encoding (OTP 26+).
+def parse_atoms(chunk: bytes, encoding: str) -> list:
+    [count] = struct.unpack('>i', chunk[:4])
+    compact = count < 0
+    atoms = []
+    pos = 4
+    for _ in range(abs(count)):
+        if compact:
+            length, pos = __compact_length(chunk, pos)
+        else:
+            length = chunk[pos]
+            pos += 1
+        atoms.append(chunk[pos:pos + length].decode(encoding))
+        pos += length
+    return atoms
+
+
+def __compact_length(chunk: bytes, pos: int) -> (int, int):
+    first = chunk[pos]
+    if first & 0x08 == 0:  # 4 bit value
+        return first >> 4, pos + 1
+    if first & 0x10 == 0:  # 11 bit value
+        return ((first & 0xe0) << 3) | chunk[pos + 1], pos + 2
+    raise ValueError('Unsupported atom length encoding')
@@ -1,21 +1,25 @@
-import errno
 import os
 import shutil
 import stat
-import subprocess
 import tarfile
 from os.path import join
 from shutil import copyfile
-from subprocess import PIPE
 
 from enot.utils.logger import debug
 
+_programms = {}  # (name, PATH) -> program's full path or None
+
 
 def read_file(path: str) -> str:
     with open(path, 'r', encoding='utf-8') as f:
         return f.read()
 
 
+def read_file_bytes(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
 def copy_file(src: str, dst: str):
     debug('copy ' + src + ' to ' + dst)
     copyfile(src, dst)
@@ -115,14 +119,18 @@ def check_cmd(path: str, cmd: str) -> str or bool:
 
 # Check if program installed in system
 def ensure_programm(name: str) -> bool:
-    try:
-        subprocess.call([name], stdout=PIPE, stderr=PIPE)
-        return True
-    except OSError as e:
-        if e.errno == errno.ENOENT:
-            return False
-        else:
-            raise
+    return find_programm(name) is not None
+
+
+# Return full path of program, found in PATH, or None. Program is not run.
+# Result is memoized per process (for the same PATH), as it is checked for every package on every build.
+def find_programm(name: str) -> str or None:
+    key = (name, os.environ.get('PATH', os.defpath))
+    if key not in _programms:
+        path = shutil.which(name, path=key[1])
+        debug(name + ' resolved to ' + str(path))
+        _programms[key] = path
+    return _programms[key]
 
 
 def ensure_executable(cmd: str):
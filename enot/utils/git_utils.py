@@ -0,0 +1,50 @@
+import os
+from os.path import join
+
+from git import Repo
+
+_tags = {}  # git dir -> (refs fingerprint, {commit hash: [tag refs]})
+
+
+# Return tag ref (refs/tags/...), which points to repo's HEAD, or None.
+# All tags are read with a single for-each-ref (annotated tags are peeled) and memoized per repo,
+# until repo's refs are changed.
+def get_head_tag(repo: Repo) -> str or None:
+    tags = get_tags(repo)
+    if not tags:  # no need to resolve head (repo can even have no commits)
+        return None
+    head_tags = tags.get(repo.head.commit.hexsha, [])
+    if not head_tags:
+        return None
+    return head_tags[-1]
+
+
+# Return commit hash -> tag refs (sorted by name) for all tags of repo.
+def get_tags(repo: Repo) -> dict:
+    git_dir = repo.common_dir
+    fingerprint = __refs_fingerprint(git_dir)
+    cached = _tags.get(git_dir)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+    tags = {}
+    out = repo.git.for_each_ref('--format=%(objectname) %(*objectname) %(refname)', 'refs/tags')
+    for line in out.splitlines():
+        [objectname, peeled, refname] = line.split(' ', 2)
+        tags.setdefault(peeled or objectname, []).append(refname)
+    _tags[git_dir] = (fingerprint, tags)
+    return tags
+
+
+# Tags are changed - packed-refs or any dir of refs/tags (tags can be nested, f.e. release/1.0) are modified.
+# Git writes refs with rename, so adding, moving or deleting a tag changes mtime of its dir.
+def __refs_fingerprint(git_dir: str) -> tuple:
+    try:
+        stamps = [os.stat(join(git_dir, 'packed-refs')).st_mtime_ns]
+    except FileNotFoundError:
+        stamps = [None]
+    for root, _, _ in sorted(os.walk(join(git_dir, 'refs', 'tags'))):
+        try:
+            stamps.append((root, os.stat(root).st_mtime_ns))
+        except FileNotFoundError:  # removed while walking
+            continue
+    return tuple(stamps)
@@ -0,0 +1,198 @@
+import hashlib
+import io
+import json
+import os
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os.path import join
+
+from appdirs import user_cache_dir
+
+import enot
+from enot.utils.file_utils import ensure_dir
+from enot.utils.logger import debug, warning
+
+HEX_REPO = 'https://repo.hex.pm'
+HEX_META_EXPIRY = 24 * 60 * 60  # seconds, after which package's metadata is requested from hex again
+HEX_META_WORKERS = 8
+CHECKSUMMED = ['VERSION', 'metadata.config', 'contents.tar.gz']  # checksum of tarball v2/v3 covers these files
+CHECKSUMS = ['checksum', 'outer_checksum']  # release's checksums in hex api: of CHECKSUMMED files, of whole tarball
+
+
+# Url of package's tarball in hex repository (repo.hex.pm or its mirror, f.e. file:///var/hex)
+def tarball_url(repo: str, name: str, vsn: str) -> str:
+    return repo.rstrip('/') + '/tarballs/' + name + '-' + vsn + '.tar'
+
+
+# Download hex package's tarball, check it and extract package's sources to dst.
+# Tarball is verified against checksums, published by hex registry (see CHECKSUMS). Without them
+# only tarball's integrity is checked (against CHECKSUM file in it), what doesn't protect from replaced tarball.
+# Raise RemoteCacheException if there is no such package in repo, RuntimeError if tarball is broken or differs.
+def download_package(repo: str, name: str, vsn: str, dst: str, checksums: dict or None = None):
+    url = tarball_url(repo, name, vsn)
+    checksums = checksums or {}
+    from enot.utils.http_utils import read_url  # requests is slow to import, is needed only for downloads
+    data = read_url(url)
+    if 'outer_checksum' in checksums and \
+            hashlib.sha256(data).hexdigest().lower() != checksums['outer_checksum'].lower():
+        raise RuntimeError('Checksum of ' + url + ' differs from hex registry')
+    files = __read_tarball(data)
+    if files.get('VERSION') not in [b'2', b'3']:
+        raise RuntimeError('Unsupported hex tarball version in ' + url)
+    sha = hashlib.sha256()
+    for file in CHECKSUMMED:
+        sha.update(files[file])
+    if sha.hexdigest().upper() != files['CHECKSUM'].decode().strip().upper():
+        raise RuntimeError('Broken tarball ' + url)
+    if 'checksum' in checksums and sha.hexdigest().lower() != checksums['checksum'].lower():
+        raise RuntimeError('Checksum of ' + url + ' differs from hex registry')
+    if not checksums:
+        warning(name + ' ' + vsn + ' is not verified: hex registry checksum is unknown')
+    ensure_dir(dst)
+    with tarfile.open(fileobj=io.BytesIO(files['contents.tar.gz']), mode='r:gz') as contents:
+        if hasattr(tarfile, 'data_filter'):
+            contents.extractall(dst, filter='data')
+        else:
+            contents.extractall(dst, members=__safe_members(contents))
+
+
+def __read_tarball(data: bytes) -> dict:
+    files = {}
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r:') as tarball:
+        for member in tarball:
+            if member.isfile():
+                files[member.name] = tarball.extractfile(member).read()
+    missing = [file for file in CHECKSUMMED + ['CHECKSUM'] if file not in files]
+    if missing:
+        raise RuntimeError('Not a hex tarball, missing ' + ', '.join(missing))
+    return files
+
+
+def __safe_members(archive: tarfile.TarFile):
+    for member in archive:
+        if os.path.isabs(member.name) or '..' in member.name.split('/') or member.issym() or member.islnk():
+            raise RuntimeError('Unsafe path in hex package: ' + member.name)
+        yield member
+
+
+# Hex packages metadata, requested from hex api. Kept in memory and in a json file between runs.
+# Fresh metadata is returned without requests. Expired metadata is requested again, but still used if hex is
+# unreachable or offline mode is on.
+class HexMeta:
+    def __init__(self, path: str or None = None, expiry=HEX_META_EXPIRY):
+        self._path = path
+        self._expiry = expiry
+        self._offline = False
+        self._meta = None  # name -> {'time': request time, 'info': metadata}. Loaded on first use
+        self._failed = set()  # names, which couldn't be requested. Are not requested again in this run
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:  # file where metadata is persisted
+        if self._path is None:
+            return join(user_cache_dir(enot.APPNAME, enot.APPAUTHOR), 'hex_meta.json')
+        return self._path
+
+    @path.setter
+    def path(self, path: str):
+        self._path = path
+        self._meta = None
+        self._failed = set()
+
+    @property
+    def expiry(self) -> int:
+        return self._expiry
+
+    @expiry.setter
+    def expiry(self, expiry: int):
+        self._expiry = expiry
+
+    @property
+    def offline(self) -> bool:  # never request hex, use known metadata only
+        return self._offline
+
+    @offline.setter
+    def offline(self, offline: bool):
+        self._offline = offline
+
+    # Metadata of package. request(name) is called only if there is no fresh metadata.
+    def get(self, name: str, request) -> dict:
+        self.prefetch([name], request)
+        entry = self.__entries().get(name)
+        if entry is None:
+            if self.offline:
+                raise RuntimeError('Offline mode: no hex metadata for ' + name)
+            raise RuntimeError('Can\'t get hex metadata for ' + name)
+        return entry['info']
+
+    # Request metadata of all packages, which don't have fresh one, concurrently. Save it once for all of them.
+    def prefetch(self, names: list, request):
+        entries = self.__entries()
+        now = time.time()
+        missing = sorted({name for name in names if name not in self._failed and
+                          (name not in entries or now - entries[name]['time'] > self.expiry)})
+        if not missing or self.offline:
+            return
+        if len(missing) == 1:
+            answers = [HexMeta.__request(missing[0], request)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(missing), HEX_META_WORKERS)) as executor:
+                answers = list(executor.map(lambda name: HexMeta.__request(name, request), missing))
+        updated = {name: info for name, info in zip(missing, answers) if info is not None}
+        self._failed.update([name for name in missing if name not in updated])
+        if not updated:
+            return
+        with self._lock:
+            for name, info in updated.items():
+                entries[name] = {'time': now, 'info': info}
+            self.__save()
+
+    def __entries(self) -> dict:
+        with self._lock:
+            if self._meta is None:
+                self._meta = self.__load()
+            return self._meta
+
+    def __load(self) -> dict:
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def __save(self):
+        try:
+            ensure_dir(os.path.dirname(self.path))
+            tmp_path = self.path + '.' + str(os.getpid())
+            with open(tmp_path, 'w') as file:
+                json.dump(self._meta, file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            debug('Can\'t save hex metadata to ' + self.path + ': {0}'.format(e))
+
+    @staticmethod
+    def __request(name: str, request) -> dict or None:
+        try:
+            return HexMeta.__trim(request(name))
+        except (OSError, ValueError) as e:  # URLError and timeouts are OSErrors
+            warning('Can\'t get hex metadata for ' + name + ': {0}'.format(e))
+            return None
+
+    # keep only used fields
+    @staticmethod
+    def __trim(info: dict) -> dict:
+        meta = info.get('meta') or {}
+        return {'name': info.get('name'),
+                'meta': {'links': meta.get('links') or {}},
+                'releases': [HexMeta.__trim_release(release) for release in info.get('releases', [])]}
+
+    @staticmethod
+    def __trim_release(release: dict) -> dict:
+        trimmed = {'version': release['version']}
+        trimmed.update({key: release[key] for key in CHECKSUMS if release.get(key)})
+        return trimmed
+
+
+hex_meta = HexMeta()
@@ -1,7 +1,14 @@
+import os
+import tarfile
+from os.path import join
+
 import requests
 from requests import Response
 
 from enot.pac_cache.remote_cache_exception import RemoteCacheException
+from enot.utils.file_utils import copy_file, read_file_bytes, ensure_dir
+
+TIMEOUT = (10, 60)  # connect and read timeouts in seconds. Unreachable host should not hang the build
 
 
 def download_file(request: Response, write_path: str, first_bytes_check: bytes, error_str: str):
@@ -18,14 +25,108 @@ def download_file(request: Response, write_path: str, first_bytes_check: bytes,
 
 
 def post_redirect(url: str, body: dict, headers):
-    r = requests.post(url, json=body, headers=headers)
+    r = requests.post(url, json=body, headers=headers, timeout=TIMEOUT)
     if r.status_code == 308 or r.status_code == 301 or r.status_code == 307:
         return post_redirect(r.text, body, headers)
     return r
 
 
 def get_redirect(url: str):
-    r = requests.get(url)
+    r = requests.get(url, timeout=TIMEOUT)
     if r.status_code == 308 or r.status_code == 301 or r.status_code == 307:
         return get_redirect(r.text)
     return r
+
+
+# Read content of file:// or http(s):// url. Raise RemoteCacheException if there is no such file.
+def read_url(url: str) -> bytes:
+    if url.startswith('file://'):
+        try:
+            return read_file_bytes(url[7:])
+        except FileNotFoundError:
+            raise RemoteCacheException('No such file: ' + url)
+    r = requests.get(url, timeout=TIMEOUT)
+    if r.status_code == 404:
+        raise RemoteCacheException('No such file: ' + url)
+    if r.status_code != 200:
+        raise RuntimeError('Error accessing remote: ' + url + ' ' + str(r.status_code))
+    return r.content
+
+
+# Download file:// or http(s):// url to write_path. Raise RemoteCacheException if there is no such file.
+def download_url(url: str, write_path: str):
+    if url.startswith('file://'):
+        try:
+            copy_file(url[7:], write_path)
+        except FileNotFoundError:
+            raise RemoteCacheException('No such file: ' + url)
+        return
+    r = requests.get(url, stream=True, timeout=TIMEOUT)
+    if r.status_code == 404:
+        raise RemoteCacheException('No such file: ' + url)
+    if r.status_code != 200:
+        raise RuntimeError('Error accessing remote: ' + url + ' ' + str(r.status_code))
+    with open(write_path, 'wb') as fd:
+        for chunk in r.iter_content(chunk_size=65536):
+            fd.write(chunk)
+
+
+# Stream tar archive from file:// or http(s):// url and extract it to dst, without saving the archive.
+# Top level directory is stripped (forges put all files to project-tag/).
+# Raise RemoteCacheException if there is no such archive.
+def download_archive(url: str, dst: str):
+    if url.startswith('file://'):
+        try:
+            with open(url[7:], 'rb') as file:
+                __extract_stream(file, dst)
+        except FileNotFoundError:
+            raise RemoteCacheException('No such file: ' + url)
+        return
+    r = requests.get(url, stream=True, timeout=TIMEOUT)
+    if r.status_code == 404:
+        raise RemoteCacheException('No such file: ' + url)
+    if r.status_code != 200:
+        raise RuntimeError('Error accessing remote: ' + url + ' ' + str(r.status_code))
+    __extract_stream(r.raw, dst)
+
+
+def __extract_stream(stream, dst: str):
+    ensure_dir(dst)
+    root = os.path.realpath(dst)
+    safe = {'filter': 'data'} if hasattr(tarfile, 'data_filter') else {}
+    with tarfile.open(fileobj=stream, mode='r|*') as archive:
+        for member in archive:
+            name = __strip_top_dir(member.name)
+            if not name:  # top level directory itself
+                continue
+            member.name = name
+            if member.islnk():
+                member.linkname = __strip_top_dir(member.linkname)
+            __check_member(member, root)
+            archive.extract(member, dst, **safe)
+
+
+# Checks of tarfile's data filter, which old pythons don't have: member and its link target are inside root,
+# no special files and no setuid bits.
+def __check_member(member: tarfile.TarInfo, root: str):
+    if not (member.isfile() or member.isdir() or member.issym() or member.islnk()):
+        raise RuntimeError('Unsupported file type in archive: ' + member.name)
+    paths = [join(root, member.name)]
+    if member.issym():
+        paths.append(join(root, os.path.dirname(member.name), member.linkname))
+    elif member.islnk():
+        paths.append(join(root, member.linkname))
+    for path in paths:
+        if os.path.commonpath([root, os.path.realpath(path)]) != root:
+            raise RuntimeError('Unsafe path in archive: ' + member.name)
+    member.mode &= 0o755
+
+
+def __strip_top_dir(path: str) -> str:
+    parts = path.split('/', 1)
+    if len(parts) < 2:
+        return ''
+    name = parts[1]
+    if os.path.isabs(name) or '..' in name.split('/'):
+        raise RuntimeError('Unsafe path in archive: ' + path)
+    return name
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import pickle
+import time
+from os.path import join
+
+from appdirs import user_cache_dir
+
+import enot
+from enot.utils.file_utils import ensure_dir
+from enot.utils.logger import debug
+
+PARSE_CACHE_MAX = 1000  # results on disk. Least recently used are removed
+PARSE_CACHE_EXPIRY = 30 * 24 * 60 * 60  # seconds, after which unused result is removed from disk
+
+
+# Parsed configs (project's config, app config), serialized in memory and in user's cache dir between runs.
+# There is one result per kind and key (f.e. project's path): it is stored with digest of content of all files
+# it was parsed from, so changed file is parsed again and it's new result replaces the old one.
+# Results of removed projects and temp dirs are pruned from disk by age and count.
+# Every get returns a new copy of the result, as packages modify their configs.
+class ParseCache:
+    def __init__(self, path: str or None = None):
+        self._path = path
+        self._memory = {}  # slot -> (digest, data)
+        self._pruned = False
+
+    @property
+    def path(self) -> str:  # directory with serialized results
+        if self._path is None:
+            return join(user_cache_dir(enot.APPNAME, enot.APPAUTHOR), 'parsed')
+        return self._path
+
+    @path.setter
+    def path(self, path: str):
+        self._path = path
+        self._memory = {}
+        self._pruned = False
+
+    # Return parsed result for files (missing files are allowed). Call parse only if files were not parsed before.
+    def get(self, kind: str, key: list, files: list, parse):
+        slot = ParseCache.__slot(kind, key)
+        digest = ParseCache.__digest(kind, key, files)
+        data = self.__cached(slot, digest)
+        if data is not None:
+            try:
+                return pickle.loads(data)
+            except Exception as e:  # saved by incompatible version or broken
+                debug('Can\'t load parsed ' + kind + ' for ' + str(key) + ': {0}'.format(e))
+        result = parse()
+        try:
+            data = pickle.dumps(result)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            debug('Can\'t save parsed ' + kind + ' for ' + str(key) + ': {0}'.format(e))
+            return result
+        self._memory[slot] = (digest, data)
+        self.__save(slot, digest, data)
+        return result
+
+    # Result of slot, if it was parsed from the same content
+    def __cached(self, slot: str, digest: str) -> bytes or None:
+        cached = self._memory.get(slot)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+        path = join(self.path, slot)
+        try:
+            with open(path, 'rb') as file:
+                content = file.read()
+            if content[:len(digest)] != digest.encode('utf-8'):
+                return None
+            os.utime(path)  # recently used results are not pruned
+        except OSError:
+            return None
+        data = content[len(digest):]
+        self._memory[slot] = (digest, data)
+        return data
+
+    def __save(self, slot: str, digest: str, data: bytes):
+        try:
+            ensure_dir(self.path)
+            tmp_path = join(self.path, slot + '.' + str(os.getpid()))
+            with open(tmp_path, 'wb') as file:
+                file.write(digest.encode('utf-8') + data)
+            os.replace(tmp_path, join(self.path, slot))
+        except OSError as e:
+            debug('Can\'t save parsed config to ' + self.path + ': {0}'.format(e))
+        self.__prune()
+
+    # Remove expired and least recently used results. Is done once per run.
+    def __prune(self):
+        if self._pruned:
+            return
+        self._pruned = True
+        try:
+            entries = sorted([(entry.stat().st_mtime, entry.path) for entry in os.scandir(self.path)
+                              if entry.is_file()], reverse=True)
+        except OSError:
+            return
+        now = time.time()
+        for i, (mtime, path) in enumerate(entries):
+            if i >= PARSE_CACHE_MAX or now - mtime > PARSE_CACHE_EXPIRY:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    debug('Can\'t remove parsed config ' + path + ': {0}'.format(e))
+
+    @staticmethod
+    def __slot(kind: str, key: list) -> str:
+        return hashlib.sha1(repr([kind, key]).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def __digest(kind: str, key: list, files: list) -> str:
+        sha = hashlib.sha1()
+        sha.update(repr([enot.APPVSN, kind, key]).encode('utf-8'))
+        for file in files:
+            sha.update(file.encode('utf-8'))
+            try:
+                with open(file, 'rb') as f:
+                    sha.update(hashlib.sha1(f.read()).digest())
+            except OSError:
+                sha.update(b'\0missing')
+        return sha.hexdigest()
+
+
+parse_cache = ParseCache()
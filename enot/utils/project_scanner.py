@@ -0,0 +1,100 @@
+import os
+from os.path import join
+
+WALKED_DIRS = ['src', 'include', 'test']  # scanned recursively
+LISTED_DIRS = ['ebin']  # only top level files are scanned
+
+
+# Snapshot of package's directory, made by a single scandir pass: root files and dirs, sources, headers, app files,
+# nif presence and mtimes of all scanned files. Other directories (deps, priv, c_src, .git) are not walked.
+# Should be rescanned, when project's files are changed (f.e. by prebuild steps).
+class ProjectSnapshot:
+    def __init__(self, path: str):
+        self._path = path
+        self._files = []  # root files names
+        self._dirs = set()  # root dirs names
+        self._scanned = {}  # root dir name -> full paths of all files in it
+        self._mtimes = {}  # full path -> mtime in ns
+
+    @classmethod
+    def scan(cls, path: str) -> 'ProjectSnapshot':
+        snapshot = cls(path)
+        snapshot.__scan()
+        return snapshot
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def files(self) -> list:  # names of files in project's root
+        return self._files
+
+    @property
+    def dirs(self) -> set:  # names of dirs in project's root
+        return self._dirs
+
+    @property
+    def has_nifs(self) -> bool:  # TODO search for .so files in priv?
+        return 'c_src' in self.dirs
+
+    @property
+    def headers(self) -> list:  # full paths of all .hrl files in include and src
+        return [file for file in self.__all_files('include') + self.__all_files('src') if file.endswith('.hrl')]
+
+    # Return dict, where module names are the keys, and their dirs are the values
+    def modules(self, dir_name: str, extension='erl') -> dict:
+        suffix = '.' + extension
+        found = {}
+        for file in self.__all_files(dir_name):
+            if file.endswith(suffix):
+                directory, filename = os.path.split(file)
+                found[filename[:-len(suffix)]] = directory
+        return found
+
+    # full paths of app files in top level of dir
+    def app_files(self, dir_name: str, suffix='.app.src') -> list:
+        directory = join(self.path, dir_name)
+        return sorted([file for file in self.__all_files(dir_name)
+                       if file.endswith(suffix) and os.path.dirname(file) == directory])
+
+    def mtime(self, path: str) -> int or None:
+        return self._mtimes.get(path)
+
+    def __all_files(self, dir_name: str) -> list:
+        return self._scanned.get(dir_name, [])
+
+    def __scan(self):
+        for entry in ProjectSnapshot.__entries(self.path):
+            if entry.is_dir():
+                self._dirs.add(entry.name)
+                if entry.name in WALKED_DIRS or entry.name in LISTED_DIRS:
+                    self._scanned[entry.name] = self.__walk(entry.path, entry.name in WALKED_DIRS)
+            elif entry.is_file():
+                self._files.append(entry.name)
+                self.__remember(entry)
+
+    def __walk(self, path: str, recursive: bool) -> list:
+        files = []
+        for entry in ProjectSnapshot.__entries(path):
+            if entry.is_dir():
+                if recursive:
+                    files += self.__walk(entry.path, recursive)
+            elif entry.is_file():
+                files.append(entry.path)
+                self.__remember(entry)
+        return files
+
+    def __remember(self, entry: os.DirEntry):
+        try:
+            self._mtimes[entry.path] = entry.stat().st_mtime_ns
+        except OSError:  # removed while scanning or broken link
+            pass
+
+    @staticmethod
+    def __entries(path: str) -> list:
+        try:
+            with os.scandir(path) as entries:
+                return list(entries)
+        except (FileNotFoundError, NotADirectoryError):
+            return []
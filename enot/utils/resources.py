@@ -0,0 +1,10 @@
+from os.path import join, dirname
+
+import enot
+
+RESOURCES_DIR = join(dirname(enot.__file__), 'resources')
+
+
+# Path of enot's resource file. Resources are installed as package data, next to enot's modules.
+def resource_path(name: str) -> str:
+    return join(RESOURCES_DIR, name)
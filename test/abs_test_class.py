@@ -7,9 +7,12 @@ from os.path import join
 from git import Repo
 
 import test
+from enot.global_properties import set_global_properties
 from enot.tool.tool import AbstractTool
 from enot.utils import logger
-from enot.utils.file_utils import ensure_empty, remove_dir
+from enot.utils.file_utils import ensure_empty, remove_dir, ensure_dir, tar
+from enot.utils.hex_utils import hex_meta
+from enot.utils.parse_cache import parse_cache
 
 
 class TestClass(unittest.TestCase):
@@ -59,6 +62,10 @@ class TestClass(unittest.TestCase):
         conf = self.global_config
         with open(self.conf_file, 'w') as outfile:
             json.dump(conf, outfile, sort_keys=True, indent=4)
+        hex_meta.path = join(self.test_dir, 'hex_meta.json')  # don't use hex metadata from user's cache
+        hex_meta.offline = False
+        parse_cache.path = join(self.test_dir, 'parsed')
+        set_global_properties(None)  # every test has it's own global config
 
     def tearDown(self):
         remove_dir(test.get_test_dir(self.test_name))
@@ -120,3 +127,20 @@ def ensure_tool(tool: AbstractTool):
     if os.path.isfile(tool_path):
         return tool_path
     return tool.ensure(test.TEST_DIR)
+
+
+# put built package to static cache dir, using local cache layout: Namespace/Project/Ref/Erlang/Project.ep
+def add_static_package(static_dir: str, erl: str, fullname: str, vsn: str, deps: list or None = None):
+    name = fullname.split('/')[-1]
+    pack_dir = join(os.path.dirname(static_dir), 'pack', name)
+    ensure_dir(join(pack_dir, 'ebin'))
+    with open(join(pack_dir, 'enot_config.json'), 'w') as config:
+        json.dump({'name': name,
+                   'fullname': fullname,
+                   'tag': vsn,
+                   'app_vsn': vsn,
+                   'with_source': False,
+                   'deps': deps or []}, config)
+    package_dir = join(static_dir, fullname, vsn, erl)
+    ensure_dir(package_dir)
+    tar(pack_dir, ['ebin', 'enot_config.json'], join(package_dir, name + '.ep'))
@@ -0,0 +1,163 @@
+import os
+import time
+import unittest
+from os.path import join
+
+from mock import patch
+from requests.exceptions import ConnectionError
+
+from enot.pac_cache.cache_man import CacheMan
+from enot.pac_cache.remote_cache_exception import RemoteCacheException
+from enot.pac_cache.static_cache import StaticCache
+from enot.packages.dep import Dep
+from enot.packages.package import Package
+from test.abs_test_class import TestClass, add_static_package
+
+
+def slow_versions(_fullname: str) -> list:
+    time.sleep(1)
+    return ['0.0.1']
+
+
+class CacheManTests(TestClass):
+    def __init__(self, method_name):
+        super().__init__('cache_man_tests', method_name)
+
+    @property
+    def conf(self) -> dict:
+        return {'temp_dir': self.tmp_dir,
+                'concurrent_remotes': True,
+                'cache': [
+                    {
+                        'name': 'local_cache',
+                        'type': 'local',
+                        'url': 'file://' + self.cache_dir
+                    },
+                    {
+                        'name': 'slow',
+                        'type': 'static',
+                        'url': 'file://' + join(self.test_dir, 'slow')
+                    },
+                    {
+                        'name': 'fast',
+                        'type': 'static',
+                        'url': 'file://' + join(self.test_dir, 'fast')
+                    }
+                ]}
+
+    def add_package(self, cache_name: str, erl: str, fullname: str, vsn: str):
+        static_dir = join(self.test_dir, cache_name)
+        add_static_package(static_dir, erl, fullname, vsn)
+        StaticCache.generate_index(static_dir)
+
+    # First answered cache is used, other answers are ignored. Fastest cache is remembered and queried first.
+    def test_first_hit_versions(self):
+        cache_man = CacheMan(self.conf)
+        erl = cache_man.local_cache.erlang_version
+        self.add_package('fast', erl, 'comtihon/test_app', '1.0.0')
+        self.assertEqual(['slow', 'fast'], [cache.name for cache in cache_man.ordered_remotes])
+        with patch.object(cache_man.remote_caches['slow'], 'get_versions', side_effect=slow_versions):
+            self.assertEqual(['1.0.0'], cache_man.get_versions('comtihon/test_app'))
+        self.assertEqual(['fast', 'slow'], [cache.name for cache in cache_man.ordered_remotes])
+        fast = cache_man.remote_caches['fast']
+        fast_versions = fast.get_versions
+
+        def delayed_versions(fullname: str) -> list:  # still answers in HEAD_START
+            time.sleep(0.3)
+            return fast_versions(fullname)
+
+        with patch.object(cache_man.remote_caches['slow'], 'get_versions', return_value=['0.0.1']) as mock_slow, \
+                patch.object(fast, 'get_versions', side_effect=delayed_versions):
+            self.assertEqual(['1.0.0'], cache_man.get_versions('comtihon/test_app'))
+            mock_slow.assert_not_called()  # remembered fastest cache is queried alone first
+
+    # Cache without package is skipped, package is populated from the cache which has it
+    def test_populate_concurrent(self):
+        cache_man = CacheMan(self.conf)
+        erl = cache_man.local_cache.erlang_version
+        self.add_package('slow', erl, 'comtihon/other_app', '1.0.0')
+        self.add_package('fast', erl, 'comtihon/test_app', '1.0.0')
+        dep = Package.from_dep('test_app', Dep('https://github.com/comtihon/test_app', None, tag='1.0.0'))
+        cache_man.populate(dep)
+        self.assertEqual(True, cache_man.exists_local(dep))
+        self.assertEqual(True, os.path.isdir(join(self.cache_dir, 'comtihon', 'test_app', '1.0.0', erl, 'ebin')))
+
+    # If package can't be fetched from the first cache, which has it, other caches, which have it, are tried
+    def test_populate_concurrent_fallback(self):
+        cache_man = CacheMan(self.conf)
+        erl = cache_man.local_cache.erlang_version
+        self.add_package('slow', erl, 'comtihon/test_app', '1.0.0')
+        self.add_package('fast', erl, 'comtihon/test_app', '1.0.0')
+        dep = Package.from_dep('test_app', Dep('https://github.com/comtihon/test_app', None, tag='1.0.0'))
+        broken = RemoteCacheException('broken package')
+        with patch.object(cache_man.remote_caches['slow'], 'fetch_package', side_effect=broken) as mock_slow, \
+                patch.object(cache_man.remote_caches['fast'], 'fetch_package', side_effect=broken) as mock_fast, \
+                patch.object(cache_man.local_cache, 'fetch_package') as mock_git:
+            cache_man.populate(dep)
+            self.assertEqual(1, mock_slow.call_count)
+            self.assertEqual(1, mock_fast.call_count)
+            mock_git.assert_called_once_with(dep)
+        dep = Package.from_dep('test_app', Dep('https://github.com/comtihon/test_app', None, tag='1.0.0'))
+        with patch.object(cache_man.remote_caches['slow'], 'fetch_package', side_effect=broken), \
+                patch.object(cache_man.local_cache, 'fetch_package') as mock_git:
+            cache_man.populate(dep)
+            mock_git.assert_not_called()
+        self.assertEqual(True, cache_man.exists_local(dep))
+
+    def test_fetch_version_concurrent(self):
+        cache_man = CacheMan(self.conf)
+        erl = cache_man.local_cache.erlang_version
+        self.add_package('slow', erl, 'comtihon/test_app', '1.0.0')
+        self.add_package('fast', erl, 'comtihon/test_app', '1.1.0')
+        self.assertEqual(True, cache_man.fetch_version('comtihon/test_app', '1.1.0'))
+        self.assertEqual(True, cache_man.check_exists_local('comtihon/test_app', '1.1.0'))
+        self.assertEqual(False, cache_man.fetch_version('comtihon/test_app', '2.0.0'))
+
+    # Unreachable cache is not queried anymore after remote_max_failures connection errors in a row
+    def test_unreachable_remote_skipped(self):
+        conf = dict(self.conf, concurrent_remotes=False, remote_max_failures=2)
+        cache_man = CacheMan(conf)
+        erl = cache_man.local_cache.erlang_version
+        self.add_package('fast', erl, 'comtihon/test_app', '1.0.0')
+        with patch.object(cache_man.remote_caches['slow'], 'get_versions',
+                          side_effect=ConnectionError('unreachable')) as mock_versions:
+            for _ in range(3):
+                self.assertEqual(['1.0.0'], cache_man.get_versions('comtihon/test_app'))
+            self.assertEqual(2, mock_versions.call_count)
+        self.assertEqual(['fast'], [cache.name for cache in cache_man.available_remotes])
+
+    # Offline: remotes and git are not accessed, missing package fails the build
+    def test_offline(self):
+        cache_man = CacheMan(self.conf)
+        cache_man.offline = True
+        erl = cache_man.local_cache.erlang_version
+        self.add_package('fast', erl, 'comtihon/test_app', '1.0.0')
+        dep = Package.from_dep('test_app', Dep('https://github.com/comtihon/test_app', None, tag='1.0.0'))
+        with patch('enot.pac_cache.local_cache.LocalCache.fetch') as mock_fetch:
+            with self.assertRaises(RuntimeError):
+                cache_man.populate(dep)
+            mock_fetch.assert_not_called()
+        self.assertEqual([], cache_man.get_versions('comtihon/test_app'))
+        cache_man.offline = False
+        cache_man.populate(dep)
+        self.assertEqual(True, cache_man.exists_local(dep))
+
+    # Remote caches are not created, while package is found in local cache
+    def test_remotes_lazy(self):
+        cache_man = CacheMan(self.conf)
+        erl = cache_man.local_cache.erlang_version
+        self.add_package('fast', erl, 'comtihon/test_app', '1.0.0')
+        dep = Package.from_dep('test_app', Dep('https://github.com/comtihon/test_app', None, tag='1.0.0'))
+        with patch('enot.pac_cache.cache_factory.get_cache') as mock_get_cache:
+            self.assertEqual(False, cache_man.exists_local(dep))
+            mock_get_cache.assert_not_called()
+        cache_man.populate(dep)  # from remote
+        self.assertEqual(['slow', 'fast'], list(cache_man.remote_caches))
+        cache_man = CacheMan(self.conf)
+        with patch('enot.pac_cache.cache_factory.get_cache') as mock_get_cache:
+            cache_man.populate(dep)  # from local
+            mock_get_cache.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import stat
+import unittest
+from os.path import join
+
+from mock import patch
+
+from enot.pac_cache import Static
+from enot.utils.file_utils import write_file, read_file
+from test.abs_test_class import TestClass
+
+
+class ErlangVersionTests(TestClass):
+    def __init__(self, method_name):
+        super().__init__('erlang_version_tests', method_name)
+
+    # fake erl, which counts its runs. Shim prints otp release from FAKE_OTP env
+    def fake_erl(self, shim=False) -> str:
+        erl_path = join(self.test_dir, 'bin', 'erl')
+        os.makedirs(os.path.dirname(erl_path))
+        if not shim:
+            os.makedirs(join(self.test_dir, 'releases'))
+        vsn = '"$FAKE_OTP"' if shim else '21'
+        write_file(erl_path, '#!/bin/sh\necho run >> ' + join(self.test_dir, 'runs') + '\necho \'"\'' + vsn + '\'"\'\n')
+        os.chmod(erl_path, os.stat(erl_path).st_mode | stat.S_IEXEC)
+        return erl_path
+
+    def runs(self) -> int:
+        if not os.path.isfile(join(self.test_dir, 'runs')):
+            return 0
+        return len(read_file(join(self.test_dir, 'runs')).splitlines())
+
+    # Erlang VM is started only once per erl binary, version is persisted between runs
+    def test_version_persisted(self):
+        erl_path = self.fake_erl()
+        with patch.dict(os.environ, {'PATH': os.path.dirname(erl_path) + os.pathsep + os.environ['PATH']}), \
+                patch.object(Static, 'versions_file', return_value=join(self.test_dir, 'erlang_versions.json')):
+            self.assertEqual('21', Static.get_erlang_version())
+            self.assertEqual('21', Static.get_erlang_version())
+            self.assertEqual(1, self.runs())
+            Static._Static__versions.clear()  # new process
+            self.assertEqual('21', Static.get_erlang_version())
+            self.assertEqual(1, self.runs())
+            mtime = os.stat(erl_path).st_mtime_ns
+            os.utime(erl_path, ns=(mtime + 10 ** 9, mtime + 10 ** 9))  # erlang was reinstalled
+            self.assertEqual('21', Static.get_erlang_version())
+            self.assertEqual(2, self.runs())
+
+    # Shim's version is detected in every process, as otp can be switched without changing the shim
+    def test_shim_not_persisted(self):
+        erl_path = self.fake_erl(shim=True)
+        with patch.dict(os.environ, {'PATH': os.path.dirname(erl_path) + os.pathsep + os.environ['PATH'],
+                                     'FAKE_OTP': '24'}), \
+                patch.object(Static, 'versions_file', return_value=join(self.test_dir, 'erlang_versions.json')):
+            self.assertEqual('24', Static.get_erlang_version())
+            self.assertEqual('24', Static.get_erlang_version())
+            self.assertEqual(1, self.runs())
+            Static._Static__versions.clear()  # new process with other otp
+            os.environ['FAKE_OTP'] = '26'
+            self.assertEqual('26', Static.get_erlang_version())
+            self.assertEqual(False, os.path.exists(join(self.test_dir, 'erlang_versions.json')))
+
+    # Default version is used, if there is no erlang
+    def test_no_erlang(self):
+        with patch('shutil.which', return_value=None):
+            self.assertEqual('20', Static.get_erlang_version('20'))
+
+
+if __name__ == '__main__':
+    unittest.main()
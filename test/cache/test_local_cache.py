@@ -1,16 +1,27 @@
+import hashlib
+import io
 import os
+import shutil
+import tarfile
+import threading
 import unittest
+from functools import partial
+from http.server import HTTPServer, SimpleHTTPRequestHandler
 from os.path import join
 
+from git import Repo
 from mock import patch
 
 import test
 from enot.__main__ import create
 from enot.pac_cache import Static
 from enot.pac_cache.local_cache import LocalCache
+from enot.packages.config.config import HEX_PACKAGES
+from enot.packages.dep import Dep
 from enot.packages.package import Package
 from enot.packages.package_builder import Builder
-from enot.utils.file_utils import remove_dir, copy_file
+from enot.utils.file_utils import remove_dir, copy_file, write_file, ensure_dir
+from enot.utils.http_utils import download_archive
 from test.abs_test_class import TestClass, set_deps, set_git_url, set_git_tag, modify_config
 
 
@@ -246,5 +257,207 @@ class LocalCacheTests(TestClass):
         self.assertEqual([Static.get_erlang_version()], local_cache.get_erl_versions('comtihon/test_app', '1.1.0'))
 
 
+    # Deps are fetched through the bare mirror in local cache. Tags and branches are fetched with depth 1.
+    # Mirror is reused for new versions.
+    def test_fetch_via_mirror(self):
+        pack_path = join(self.test_dir, 'test_app')
+        repo = Repo.init(pack_path)
+        repo.index.add(['enot_config.json'])
+        tagged = repo.index.commit('First commit').hexsha
+        set_git_tag(pack_path, '1.0.0')
+        url = 'file://' + pack_path
+        local_cache = LocalCache(self.tmp_dir, '20', {'name': 'local_cache', 'url': 'file://' + self.cache_dir})
+        tag_path = join(self.tmp_dir, 'tag')
+        self.assertEqual(tagged, local_cache.fetch(url, '1.0.0', tag_path))
+        self.assertEqual(True, os.path.isfile(join(tag_path, 'enot_config.json')))
+        [mirror] = os.listdir(local_cache.mirror_dir)
+        self.assertEqual(True, os.path.isfile(join(local_cache.mirror_dir, mirror, 'shallow')))
+        write_file(join(pack_path, 'README.md'), 'new commit')
+        repo.index.add(['README.md'])
+        latest = repo.index.commit('Second commit').hexsha
+        branch_path = join(self.tmp_dir, 'branch')
+        self.assertEqual(latest, local_cache.fetch(url, 'master', branch_path))
+        self.assertEqual(True, os.path.isfile(join(branch_path, 'README.md')))
+        self.assertEqual([mirror], os.listdir(local_cache.mirror_dir))
+        hash_path = join(self.tmp_dir, 'hash')
+        self.assertEqual(tagged, local_cache.fetch(url, tagged, hash_path))  # already in mirror
+        self.assertEqual(False, os.path.isfile(join(hash_path, 'README.md')))
+
+    # Without mirror deps are cloned directly: shallow for tags and branches, full for commit hashes
+    def test_clone(self):
+        pack_path = join(self.test_dir, 'test_app')
+        repo = Repo.init(pack_path)
+        repo.index.add(['enot_config.json'])
+        tagged = repo.index.commit('First commit').hexsha
+        set_git_tag(pack_path, '1.0.0')
+        write_file(join(pack_path, 'README.md'), 'new commit')
+        repo.index.add(['README.md'])
+        latest = repo.index.commit('Second commit').hexsha
+        url = 'file://' + pack_path
+        tag_path = join(self.tmp_dir, 'tag')
+        self.assertEqual(tagged, LocalCache.clone(url, '1.0.0', tag_path))
+        self.assertEqual(True, os.path.isfile(join(tag_path, '.git', 'shallow')))
+        branch_path = join(self.tmp_dir, 'branch')
+        self.assertEqual(latest, LocalCache.clone(url, 'master', branch_path))
+        self.assertEqual(1, len(list(Repo(branch_path).iter_commits())))
+        hash_path = join(self.tmp_dir, 'hash')
+        self.assertEqual(tagged, LocalCache.clone(url, tagged, hash_path))
+        self.assertEqual(False, os.path.isfile(join(hash_path, '.git', 'shallow')))
+
+    # Branch head is resolved remotely. If its commit was already built - it is locked and taken from cache.
+    def test_resolve_branches(self):
+        local_cache = LocalCache(self.tmp_dir, '20', {'name': 'local_cache', 'url': 'file://' + self.cache_dir})
+        built = Package.from_dep('test_app', Dep('https://github.com/comtihon/test_app', 'master'))
+        new = Package.from_dep('other_app', Dep('https://github.com/comtihon/other_app', 'master'))
+        ensure_dir(join(self.cache_dir, 'comtihon', 'test_app', 'master-some_hash', local_cache.erlang_version))
+        self.assertEqual(False, local_cache.exists(built))
+        with patch.object(LocalCache, 'ls_remote', return_value='some_hash') as mock_ls_remote:
+            local_cache.resolve_branches([built, new])
+            self.assertEqual(2, mock_ls_remote.call_count)
+        self.assertEqual(True, local_cache.exists(built))
+        self.assertEqual({'comtihon/test_app': 'master-some_hash'}, local_cache.locks)
+        with patch.object(LocalCache, 'ls_remote') as mock_ls_remote:  # locked deps are not resolved again
+            local_cache.resolve_branches([built])
+            mock_ls_remote.assert_not_called()
+
+    def test_ls_remote(self):
+        pack_path = join(self.test_dir, 'test_app')
+        repo = Repo.init(pack_path)
+        repo.index.add(['enot_config.json'])
+        head = repo.index.commit('First commit').hexsha
+        self.assertEqual(head, LocalCache.ls_remote('file://' + pack_path, 'master'))
+        self.assertEqual(None, LocalCache.ls_remote('file://' + pack_path, 'missing'))
+        self.assertEqual(None, LocalCache.ls_remote('file://' + join(self.test_dir, 'missing'), 'master'))
+
+    # Only build paths are checked out. Paths from dep's config are added.
+    def test_sparse_checkout(self):
+        pack_path = join(self.test_dir, 'test_app')
+        ensure_dir(join(pack_path, 'test', 'data'))
+        write_file(join(pack_path, 'test', 'data', 'big_fixture'), 'not needed for build')
+        repo = Repo.init(pack_path)
+        repo.config_writer().set_value('uploadpack', 'allowFilter', True).release()
+        repo.index.add(['enot_config.json', 'src', 'test'])
+        repo.index.commit('First commit')
+        repo.create_tag('1.0.0')
+        modify_config(pack_path, {'sparse_paths': ['test']})
+        repo.index.add(['enot_config.json'])
+        repo.index.commit('Second commit')
+        repo.create_tag('1.1.0')
+        local_cache = LocalCache(self.tmp_dir, '20', {'name': 'local_cache',
+                                                      'url': 'file://' + self.cache_dir,
+                                                      'sparse_checkout': True})
+        url = 'file://' + pack_path
+        dep = Package.from_dep('test_app', Dep(url, None, tag='1.0.0'))
+        local_cache.fetch_package(dep)
+        fetched = join(self.tmp_dir, 'test_app')
+        self.assertEqual(True, os.path.isfile(join(fetched, 'src', 'test_app_app.erl')))
+        self.assertEqual(False, os.path.exists(join(fetched, 'test')))
+        dep = Package.from_dep('test_app', Dep(url, None, tag='1.1.0'))
+        local_cache.fetch_package(dep)
+        self.assertEqual(True, os.path.isfile(join(fetched, 'test', 'data', 'big_fixture')))
+
+    # Tagged deps are downloaded as archives from configured hosts. Git is used only if there is no archive.
+    @patch.object(LocalCache, 'fetch')
+    def test_fetch_archive(self, mock_fetch):
+        archives_dir = join(self.test_dir, 'archives')
+        ensure_dir(archives_dir)
+        with tarfile.open(join(archives_dir, 'test_app-1.0.0.tar.gz'), 'w:gz') as archive:
+            archive.add(join(self.test_dir, 'test_app'), arcname='test_app-1.0.0')
+        handler = partial(SimpleHTTPRequestHandler, directory=archives_dir)
+        server = HTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            template = 'http://127.0.0.1:' + str(server.server_port) + '/{{ name }}-{{ tag }}.tar.gz'
+            local_cache = LocalCache(self.tmp_dir, '20', {'name': 'local_cache',
+                                                          'url': 'file://' + self.cache_dir,
+                                                          'archives': {'github.com': template}})
+            dep = Package.from_dep('test_app', Dep('https://github.com/comtihon/test_app', None, tag='1.0.0'))
+            local_cache.fetch_package(dep)
+            mock_fetch.assert_not_called()
+            fetched = join(self.tmp_dir, 'test_app')
+            self.assertEqual(fetched, dep.path)
+            self.assertEqual(True, os.path.isfile(join(fetched, 'src', 'test_app_app.erl')))
+            self.assertEqual('comtihon/test_app', dep.fullname)
+            mock_fetch.side_effect = lambda _url, _rev, path: shutil.copytree(join(self.test_dir, 'test_app'), path)
+            missing = Package.from_dep('test_app', Dep('https://github.com/comtihon/test_app', None, tag='2.0.0'))
+            local_cache.fetch_package(missing)  # no archive - fetched with git
+            mock_fetch.assert_called_once_with('https://github.com/comtihon/test_app', '2.0.0', fetched)
+            self.assertEqual(fetched, missing.path)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    # Archive members, pointing outside of destination, are not extracted
+    def test_unsafe_archive(self):
+        archives_dir = join(self.test_dir, 'archives')
+        ensure_dir(archives_dir)
+        dst = join(self.tmp_dir, 'unpacked')
+        for name, kind, link in [('top/../../evil', tarfile.REGTYPE, ''),
+                                 ('top/evil', tarfile.SYMTYPE, '../../evil'),
+                                 ('top/src/evil', tarfile.SYMTYPE, '/tmp'),
+                                 ('top/evil', tarfile.FIFOTYPE, '')]:
+            path = join(archives_dir, 'unsafe.tar')
+            with tarfile.open(path, 'w') as archive:
+                member = tarfile.TarInfo(name)
+                member.type = kind
+                member.linkname = link
+                archive.addfile(member, io.BytesIO(b''))
+            with self.assertRaises(RuntimeError):
+                download_archive('file://' + path, dst)
+            self.assertEqual([], os.listdir(dst))
+
+    # Hex deps are fetched as tarballs from hex repo and verified against hex registry's checksum.
+    # Broken or replaced tarball is fetched with git. Hex only dep (without GitHub url) is never fetched with git.
+    @patch('enot.pac_cache.local_cache.get_hex_checksums')
+    @patch.object(LocalCache, 'fetch')
+    def test_fetch_hex(self, mock_fetch, mock_checksums):
+        tarballs = join(self.test_dir, 'hex', 'tarballs')
+        ensure_dir(tarballs)
+        contents = io.BytesIO()
+        with tarfile.open(fileobj=contents, mode='w:gz') as archive:
+            for file in os.listdir(join(self.test_dir, 'test_app')):
+                archive.add(join(self.test_dir, 'test_app', file), arcname=file)
+        files = {'VERSION': b'3', 'metadata.config': b'{<<"name">>,<<"test_app">>}.',
+                 'contents.tar.gz': contents.getvalue()}
+        files['CHECKSUM'] = hashlib.sha256(b''.join(files.values())).hexdigest().upper().encode()
+        replaced = dict(files, **{'metadata.config': b'{<<"name">>,<<"other">>}.'})
+        replaced['CHECKSUM'] = hashlib.sha256(b''.join(replaced.values())).hexdigest().upper().encode()
+        for vsn, tarball_files in [('1.0.0', files), ('2.0.0', dict(files, CHECKSUM=b'0' * 64)), ('3.0.0', replaced)]:
+            with tarfile.open(join(tarballs, 'test_app-' + vsn + '.tar'), 'w') as tarball:
+                for name, data in tarball_files.items():
+                    info = tarfile.TarInfo(name)
+                    info.size = len(data)
+                    tarball.addfile(info, io.BytesIO(data))
+        mock_checksums.return_value = {'checksum': files['CHECKSUM'].decode().lower()}  # as published by registry
+        local_cache = LocalCache(self.tmp_dir, '20', {'name': 'local_cache',
+                                                      'url': 'file://' + self.cache_dir,
+                                                      'hex_repo': 'file://' + join(self.test_dir, 'hex')})
+        dep = Package.from_dep('test_app', Dep('https://github.com/comtihon/test_app', None, tag='1.0.0', hex=True))
+        local_cache.fetch_package(dep)
+        mock_fetch.assert_not_called()
+        fetched = join(self.tmp_dir, 'test_app')
+        self.assertEqual(fetched, dep.path)
+        self.assertEqual(True, os.path.isfile(join(fetched, 'src', 'test_app_app.erl')))
+        self.assertEqual(True, dep.config.hex)
+        mock_fetch.side_effect = lambda _url, _rev, path: shutil.copytree(join(self.test_dir, 'test_app'), path)
+        broken = Package.from_dep('test_app', Dep('https://github.com/comtihon/test_app', None, tag='2.0.0', hex=True))
+        local_cache.fetch_package(broken)  # checksum mismatch - fetched with git
+        mock_fetch.assert_called_once_with('https://github.com/comtihon/test_app', '2.0.0', fetched)
+        remove_dir(fetched)
+        other = Package.from_dep('test_app', Dep('https://github.com/comtihon/test_app', None, tag='3.0.0', hex=True))
+        local_cache.fetch_package(other)  # consistent, but differs from registry - fetched with git
+        mock_fetch.assert_called_with('https://github.com/comtihon/test_app', '3.0.0', fetched)
+        mock_checksums.assert_called_with('test_app', '3.0.0')
+        hex_only = Package.from_dep('test_app', Dep(HEX_PACKAGES + 'test_app', None, tag='1.0.0', hex=True))
+        self.assertEqual(True, hex_only.config.hex_only)
+        local_cache.fetch_package(hex_only)
+        self.assertEqual(True, os.path.isfile(join(fetched, 'src', 'test_app_app.erl')))
+        calls = mock_fetch.call_count
+        broken = Package.from_dep('test_app', Dep(HEX_PACKAGES + 'test_app', None, tag='2.0.0', hex=True))
+        with self.assertRaisesRegex(RuntimeError, 'Can\'t fetch test_app \\(2.0.0\\) from hex repo'):
+            local_cache.fetch_package(broken)
+        self.assertEqual(calls, mock_fetch.call_count)
+
+
 if __name__ == '__main__':
     unittest.main()
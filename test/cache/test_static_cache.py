@@ -0,0 +1,103 @@
+import json
+import os
+import unittest
+from os.path import join
+
+from mock import patch
+
+from enot.pac_cache.remote_cache_exception import RemoteCacheException
+from enot.pac_cache.static_cache import StaticCache
+from enot.packages.dep import Dep
+from enot.packages.package import Package
+from enot.utils.file_utils import ensure_dir
+from test.abs_test_class import TestClass, add_static_package
+
+
+class StaticCacheTests(TestClass):
+    def __init__(self, method_name):
+        super().__init__('static_cache_tests', method_name)
+
+    @property
+    def static_dir(self):
+        return join(self.test_dir, 'static')
+
+    @property
+    def conf(self):
+        return {
+            'name': 'static',
+            'type': 'static',
+            'url': 'file://' + self.static_dir
+        }
+
+    def setUp(self):
+        super().setUp()
+        ensure_dir(self.tmp_dir)
+
+    # Index lists all packages with their versions and erlang versions
+    def test_generate_index(self):
+        add_static_package(self.static_dir, '19', 'comtihon/test_app', '1.0.0')
+        add_static_package(self.static_dir, '20', 'comtihon/test_app', '1.0.0')
+        add_static_package(self.static_dir, '20', 'comtihon/test_app', '1.1.0')
+        add_static_package(self.static_dir, '20', 'comtihon/other_app', '0.1.0')
+        ensure_dir(join(self.static_dir, 'comtihon', 'empty_app', '1.0.0', '20'))
+        index = StaticCache.generate_index(self.static_dir)
+        self.assertEqual({'comtihon/test_app': {'1.0.0': ['19', '20'], '1.1.0': ['20']},
+                          'comtihon/other_app': {'0.1.0': ['20']}}, index)
+        with open(join(self.static_dir, 'index.json'), 'r') as file:
+            self.assertEqual(index, json.load(file))
+
+    def test_versions(self):
+        cache = StaticCache(self.tmp_dir, '20', self.conf)
+        add_static_package(self.static_dir, cache.erlang_version, 'comtihon/test_app', '1.0.0')
+        add_static_package(self.static_dir, cache.erlang_version, 'comtihon/test_app', '1.1.0')
+        StaticCache.generate_index(self.static_dir)
+        self.assertEqual(['1.0.0', '1.1.0'], sorted(cache.get_versions('comtihon/test_app')))
+        self.assertEqual([cache.erlang_version], cache.get_erl_versions('comtihon/test_app', '1.0.0'))
+        self.assertEqual([], cache.get_versions('comtihon/missing_app'))
+
+    # No index - no packages
+    def test_no_index(self):
+        cache = StaticCache(self.tmp_dir, '20', self.conf)
+        self.assertEqual([], cache.get_versions('comtihon/test_app'))
+
+    def test_fetch_package(self):
+        cache = StaticCache(self.tmp_dir, '20', self.conf)
+        add_static_package(self.static_dir, cache.erlang_version, 'comtihon/test_app', '1.0.0')
+        StaticCache.generate_index(self.static_dir)
+        dep = Package.from_dep('test_app', Dep('https://github.com/comtihon/test_app', None, tag='1.0.0'))
+        missing = Package.from_dep('test_app', Dep('https://github.com/comtihon/test_app', None, tag='2.0.0'))
+        self.assertEqual(True, cache.exists(dep))
+        self.assertEqual(False, cache.exists(missing))
+        cache.fetch_package(dep)
+        self.assertEqual(True, os.path.isfile(join(self.tmp_dir, 'test_app.ep')))
+        self.assertEqual('1.0.0', dep.vsn)
+        self.assertEqual('comtihon/test_app', dep.fullname)
+        with self.assertRaises(RemoteCacheException):
+            cache.fetch_package(missing)
+
+    def test_fetch_version(self):
+        cache = StaticCache(self.tmp_dir, '20', self.conf)
+        add_static_package(self.static_dir, cache.erlang_version, 'comtihon/test_app', '1.0.0')
+        StaticCache.generate_index(self.static_dir)
+        package = cache.fetch_version('comtihon/test_app', '1.0.0')
+        self.assertEqual('test_app', package.name)
+        self.assertEqual('1.0.0', package.vsn)
+
+    # Urls of http cache are built with '/' on any platform
+    @patch('enot.pac_cache.static_cache.download_url')
+    @patch('enot.pac_cache.static_cache.read_url')
+    def test_http_urls(self, mock_read, mock_download):
+        mock_read.return_value = json.dumps({'comtihon/test_app': {'1.0.0': ['20']}}).encode('utf-8')
+        mock_download.side_effect = RemoteCacheException('stop after url is built')
+        cache = StaticCache(self.tmp_dir, '20', dict(self.conf, url='http://cache.local/static/'))
+        with patch.object(StaticCache, 'erlang_version', '20'):
+            self.assertEqual(['1.0.0'], cache.get_versions('comtihon/test_app'))
+            with self.assertRaises(RemoteCacheException):
+                cache.fetch_version('comtihon/test_app', '1.0.0')
+        mock_read.assert_called_once_with('http://cache.local/static/index.json')
+        self.assertEqual('http://cache.local/static/comtihon/test_app/1.0.0/20/test_app.ep',
+                         mock_download.call_args[0][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
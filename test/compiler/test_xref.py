@@ -0,0 +1,103 @@
+import gzip
+import os
+import struct
+import unittest
+from os.path import join
+
+from enot.compiler.xref import Xref
+from enot.utils.beam_utils import read_beam
+from enot.utils.file_utils import ensure_dir, write_file
+from test.abs_test_class import TestClass
+
+
+def chunk(chunk_id: bytes, data: bytes) -> bytes:
+    return chunk_id + struct.pack('>I', len(data)) + data + b'\0' * (-len(data) % 4)
+
+
+# Minimal beam file with atoms and code chunks
+def make_beam(atoms: list, code=b'code', compact=False) -> bytes:
+    if compact:
+        encoded = [bytes([len(atom.encode()) << 4]) + atom.encode() for atom in atoms]
+        count = -len(atoms)
+    else:
+        encoded = [bytes([len(atom.encode())]) + atom.encode() for atom in atoms]
+        count = len(atoms)
+    chunks = chunk(b'AtU8', struct.pack('>i', count) + b''.join(encoded)) + chunk(b'Code', code) + \
+             chunk(b'CInf', os.urandom(8))
+    return b'FOR1' + struct.pack('>I', len(chunks) + 4) + b'BEAM' + chunks
+
+
+class XrefTests(TestClass):
+    def __init__(self, method_name):
+        super().__init__('xref_tests', method_name)
+
+    def write_beam(self, directory: str, atoms: list, code=b'code'):
+        ensure_dir(directory)
+        write_file(join(directory, atoms[0] + '.beam'), make_beam(atoms, code), binary=True)
+
+    # Atoms are read from any beam format. Compile info doesn't change hash.
+    def test_read_beam(self):
+        ensure_dir(self.test_dir)
+        path = join(self.test_dir, 'mod.beam')
+        write_file(path, make_beam(['mod', 'lists', 'other']), binary=True)
+        md5, atoms = read_beam(path)
+        self.assertEqual(['mod', 'lists', 'other'], atoms)
+        write_file(path, make_beam(['mod', 'lists', 'other'], compact=True), binary=True)
+        self.assertEqual(atoms, read_beam(path)[1])
+        write_file(path, gzip.compress(make_beam(['mod', 'lists', 'other'])), binary=True)
+        self.assertEqual((md5, atoms), read_beam(path))
+        write_file(path, make_beam(['mod', 'lists', 'other'], code=b'changed'), binary=True)
+        self.assertNotEqual(md5, read_beam(path)[0])
+
+    # Only tests, which reach changed modules, are affected. Passed tests are kept per test kind.
+    def test_affected(self):
+        ebin = join(self.test_dir, 'ebin')
+        test_ebin = join(self.test_dir, 'test_ebin')
+        self.write_beam(ebin, ['api', 'storage', 'io'])
+        self.write_beam(ebin, ['storage', 'ets'])
+        self.write_beam(ebin, ['utils', 'lists'])
+        self.write_beam(test_ebin, ['api_tests', 'api', 'eunit'])
+        self.write_beam(test_ebin, ['utils_tests', 'utils', 'eunit'])
+        tests = ['api_tests', 'utils_tests']
+        xref = Xref(self.test_dir)
+        xref.scan([ebin, test_ebin])
+        self.assertEqual(tests, xref.affected('eunit', tests))  # never passed
+        xref.passed('eunit', tests)
+        self.assertEqual([], xref.affected('eunit', tests))
+        self.write_beam(ebin, ['storage', 'ets'], code=b'changed')  # api_tests reaches storage through api
+        xref = Xref(self.test_dir)
+        xref.scan([ebin, test_ebin])
+        self.assertEqual(['api_tests'], xref.affected('eunit', tests))
+        self.assertEqual(tests, xref.affected('ct', tests))
+        os.remove(join(ebin, 'utils.beam'))  # removed module affects tests which used it
+        xref.scan([ebin, test_ebin])
+        xref.passed('eunit', tests)
+        self.write_beam(ebin, ['utils', 'lists'])
+        xref.scan([ebin, test_ebin])
+        self.assertEqual(['utils_tests'], xref.affected('eunit', tests))
+
+    # Running only some of affected tests doesn't mark others as passed.
+    def test_affected_partial_run(self):
+        ebin = join(self.test_dir, 'ebin')
+        test_ebin = join(self.test_dir, 'test_ebin')
+        self.write_beam(ebin, ['api', 'utils'])
+        self.write_beam(ebin, ['utils', 'lists'])
+        self.write_beam(test_ebin, ['api_tests', 'api', 'eunit'])
+        self.write_beam(test_ebin, ['utils_tests', 'utils', 'eunit'])
+        tests = ['api_tests', 'utils_tests']
+        xref = Xref(self.test_dir)
+        xref.scan([ebin, test_ebin])
+        xref.passed('eunit', tests)
+        self.write_beam(ebin, ['utils', 'lists'], code=b'changed')
+        xref.scan([ebin, test_ebin])
+        self.assertEqual(tests, xref.affected('eunit', tests))
+        xref.passed('eunit', ['utils_tests'])  # enot test-run utils_tests --changed
+        xref = Xref(self.test_dir)
+        xref.scan([ebin, test_ebin])
+        self.assertEqual(['api_tests'], xref.affected('eunit', tests))
+        xref.passed('eunit', ['api_tests'])
+        self.assertEqual([], xref.affected('eunit', tests))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import json
+import os
+import unittest
+from os.path import join
+
+from mock import patch
+
+import test
+from enot.__main__ import create
+from enot.pac_cache.local_cache import LocalCache
+from enot.packages.package import Package
+from enot.packages.package_builder import Builder
+from enot.packages.resolver import Resolver
+from enot.utils.file_utils import ensure_dir
+from test.abs_test_class import TestClass, set_deps
+
+resolve = Resolver.resolve
+
+
+def mock_fetch_package(dep: Package):
+    test_dir = test.get_test_dir('lock_tests')
+    tmp_path = join(os.getcwd(), test_dir, 'tmp', dep.name)
+    ensure_dir(join(tmp_path, 'ebin'))
+    dep.update_from_cache(tmp_path)
+
+
+class LockTests(TestClass):
+    def __init__(self, method_name):
+        super().__init__('lock_tests', method_name)
+
+    def setUp(self):
+        super().setUp()
+        create(self.test_dir, {'<name>': 'test_app'})
+        create(self.tmp_dir, {'<name>': 'dep_a'})
+        create(self.tmp_dir, {'<name>': 'dep_b'})
+        set_deps(join(self.tmp_dir, 'dep_a'),
+                 [
+                     {'name': 'dep_b',
+                      'url': 'https://github.com/comtihon/dep_b',
+                      'tag': '1.0.0'}
+                 ])
+        set_deps(join(self.test_dir, 'test_app'),
+                 [
+                     {'name': 'dep_a',
+                      'url': 'https://github.com/comtihon/dep_a',
+                      'tag': '1.0.0'}
+                 ])
+
+    # populate and add all deps to local cache, as build does
+    def populate_to_cache(self, pack_path: str, include_test_deps=False) -> Builder:
+        builder = Builder.init_from_path(pack_path)
+        builder.populate(include_test_deps)
+        for package in builder.packages.values():
+            builder.system_config.cache.add_package_local(package)
+        builder.deps()  # links deps and updates the lock
+        return builder
+
+    # Every package is locked with its version, commit, content hash and deps
+    @patch.object(LocalCache, 'fetch_package', side_effect=mock_fetch_package)
+    @patch('enot.global_properties.ensure_conf_file')
+    def test_lock_all_packages(self, mock_conf, _):
+        mock_conf.return_value = self.conf_file
+        pack_path = join(self.test_dir, 'test_app')
+        self.populate_to_cache(pack_path)
+        with open(join(pack_path, 'enot_locks.json'), 'r') as file:
+            locks = json.load(file)
+        self.assertEqual(['dep_a', 'dep_b'], sorted(locks['packages'].keys()))
+        dep_a = locks['packages']['dep_a']
+        self.assertEqual('comtihon/dep_a', dep_a['fullname'])
+        self.assertEqual('1.0.0', dep_a['ref'])
+        self.assertEqual(['dep_b'], dep_a['deps'])
+        self.assertNotEqual(None, dep_a['content_hash'])
+        self.assertEqual([], locks['packages']['dep_b']['deps'])
+        self.assertNotEqual(None, locks['config_hash'])
+
+    # When lock matches project's config - packages are taken from lock and local cache without resolution
+    @patch.object(LocalCache, 'fetch_package', side_effect=mock_fetch_package)
+    @patch('enot.global_properties.ensure_conf_file')
+    def test_locked_fast_path(self, mock_conf, mock_fetch):
+        mock_conf.return_value = self.conf_file
+        pack_path = join(self.test_dir, 'test_app')
+        self.populate_to_cache(pack_path)
+        self.assertEqual(2, mock_fetch.call_count)
+        with patch.object(Resolver, 'resolve', autospec=True, side_effect=resolve) as mock_resolve:
+            builder = Builder.init_from_path(pack_path)
+            builder.populate()
+            self.assertEqual(0, mock_resolve.call_count)
+        self.assertEqual(2, mock_fetch.call_count)
+        erl = builder.system_config.cache.local_cache.erlang_version
+        self.assertEqual(join(self.cache_dir, 'comtihon', 'dep_a', '1.0.0', erl), builder.packages['dep_a'].path)
+        [dep_a] = builder.project.deps
+        self.assertEqual(builder.packages['dep_a'].path, dep_a.path)
+        [dep_b] = builder.packages['dep_a'].deps
+        self.assertEqual(join(self.cache_dir, 'comtihon', 'dep_b', '1.0.0', erl), dep_b.path)
+
+    # Changed deps declaration or changed package content in local cache invalidate the lock
+    @patch.object(LocalCache, 'fetch_package', side_effect=mock_fetch_package)
+    @patch('enot.global_properties.ensure_conf_file')
+    def test_lock_invalidated(self, mock_conf, _):
+        mock_conf.return_value = self.conf_file
+        pack_path = join(self.test_dir, 'test_app')
+        erl = self.populate_to_cache(pack_path).system_config.cache.local_cache.erlang_version
+        with open(join(self.cache_dir, 'comtihon', 'dep_b', '1.0.0', erl, 'dep_b.ep'), 'ab') as file:
+            file.write(b'changed')
+        with patch.object(Resolver, 'resolve', autospec=True, side_effect=resolve) as mock_resolve:
+            Builder.init_from_path(pack_path).populate()
+            self.assertEqual(1, mock_resolve.call_count)
+        set_deps(pack_path,
+                 [
+                     {'name': 'dep_b',
+                      'url': 'https://github.com/comtihon/dep_b',
+                      'tag': '1.0.0'}
+                 ])
+        with patch.object(Resolver, 'resolve', autospec=True, side_effect=resolve) as mock_resolve:
+            builder = Builder.init_from_path(pack_path)
+            builder.populate()
+            self.assertEqual(1, mock_resolve.call_count)
+        self.assertEqual(['dep_b'], list(builder.packages.keys()))
+
+    # Build and tests share the lock: locked test deps are kept by build, unchanged lock is not rewritten
+    @patch.object(LocalCache, 'fetch_package', side_effect=mock_fetch_package)
+    @patch('enot.global_properties.ensure_conf_file')
+    def test_lock_with_test_deps(self, mock_conf, _):
+        mock_conf.return_value = self.conf_file
+        pack_path = join(self.test_dir, 'test_app')
+        set_deps(pack_path,
+                 [
+                     {'name': 'dep_b',
+                      'url': 'https://github.com/comtihon/dep_b',
+                      'tag': '1.0.0'}
+                 ], 'test_deps')
+        self.populate_to_cache(pack_path, include_test_deps=True)
+        locks_file = join(pack_path, 'enot_locks.json')
+        with open(locks_file, 'r') as file:
+            locks = json.load(file)
+        self.assertNotEqual(None, locks['test_config_hash'])
+        os.utime(locks_file, ns=(0, 0))
+        for include_test_deps in [False, True]:
+            with patch.object(Resolver, 'resolve', autospec=True, side_effect=resolve) as mock_resolve:
+                builder = Builder.init_from_path(pack_path)
+                builder.populate(include_test_deps)
+                builder.deps()
+                self.assertEqual(0, mock_resolve.call_count)
+        self.assertEqual(0, os.stat(locks_file).st_mtime_ns)
+
+
+if __name__ == '__main__':
+    unittest.main()
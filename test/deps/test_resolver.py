@@ -0,0 +1,158 @@
+import os
+import unittest
+from os.path import join
+
+from mock import patch
+
+import test
+from enot.__main__ import create
+from enot.pac_cache.local_cache import LocalCache
+from enot.packages import semver
+from enot.packages.config import config_factory
+from enot.packages.package import Package
+from enot.packages.package_builder import Builder
+from enot.packages.semver import Constraint
+from test.abs_test_class import TestClass, set_deps
+
+
+# Prepare dep's version sources in tmp dir, return their path
+def mock_dep_version(dep: Package) -> str:
+    test_dir = test.get_test_dir('resolver_tests')
+    tmp_path = join(os.getcwd(), test_dir, 'tmp')
+    if dep.name == 'dep_a' and dep.git_vsn == '1.0.0':
+        set_deps(join(tmp_path, dep.name),
+                 [
+                     {'name': 'dep_c',
+                      'url': 'https://github.com/comtihon/dep_c',
+                      'tag': '1.0.0'}
+                 ])
+    if dep.name == 'dep_a' and dep.git_vsn == '1.1.0':
+        set_deps(join(tmp_path, dep.name), [])
+    return join(tmp_path, dep.name)
+
+
+def mock_fetch_package(dep: Package):
+    dep.update_from_cache(mock_dep_version(dep))
+
+
+# Config of dep's version, read from git mirror
+def mock_read_config(dep: Package):
+    return config_factory.read_project(mock_dep_version(dep), url=dep.url)
+
+
+class ResolverTests(TestClass):
+    def __init__(self, method_name):
+        super().__init__('resolver_tests', method_name)
+
+    def setUp(self):
+        super().setUp()
+        create(self.test_dir, {'<name>': 'test_app'})
+
+    def test_semver(self):
+        self.assertEqual(True, semver.parse('1.10.0') > semver.parse('1.9.0'))
+        self.assertEqual(True, semver.parse('v2.0') == semver.parse('2.0.0'))
+        self.assertEqual(True, semver.parse('1.0.0-rc1') < semver.parse('1.0.0'))
+        self.assertEqual(False, semver.is_version('master'))
+        self.assertEqual(True, semver.compatible('1.0.1', '1.2.0'))
+        self.assertEqual(False, semver.compatible('1.2.0', '1.0.1'))
+        self.assertEqual(False, semver.compatible('1.0.0', '2.0.0'))
+        self.assertEqual(True, Constraint('~> 1.2').allows('1.9.0'))
+        self.assertEqual(False, Constraint('~> 1.2').allows('2.0.0'))
+        self.assertEqual(False, Constraint('~> 1.2.3').allows('1.3.0'))
+        self.assertEqual(True, Constraint('>= 1.0.0 and < 1.5.0').allows('v1.4.9'))
+        self.assertEqual(True, Constraint('1.0.0 or 2.0.0').allows('2.0.0'))
+        self.assertEqual(True, Constraint('1\\.0\\..*').allows('1.0.7'))  # rebar's version regex
+        self.assertEqual(False, Constraint('1\\.0\\..*').allows('1.1.0'))
+        self.assertEqual(True, Constraint('').allows('3.2.0'))  # {dep, "", {git, Url, {tag, Tag}}}
+        self.assertEqual(True, Constraint('.*').allows('master'))
+        self.assertRaises(ValueError, Constraint, '1.0.(')
+
+    # Newer dep_a is selected. Superseded dep_a version and it's deps (dep_c) are never fetched.
+    @patch.object(LocalCache, 'read_config')
+    @patch.object(LocalCache, 'fetch_package')
+    @patch('enot.global_properties.ensure_conf_file')
+    def test_superseded_deps_not_fetched(self, mock_conf, mock_fetch, mock_read):
+        mock_conf.return_value = self.conf_file
+        fetched = []
+
+        def fetch(dep: Package):  # package objects are updated later, remember version on fetch
+            fetched.append((dep.name, dep.git_vsn))
+            mock_fetch_package(dep)
+
+        mock_fetch.side_effect = fetch
+        mock_read.side_effect = mock_read_config
+        pack_path = join(self.test_dir, 'test_app')
+        set_deps(pack_path,
+                 [
+                     {'name': 'dep_a',
+                      'url': 'https://github.com/comtihon/dep_a',
+                      'tag': '1.0.0'},  # requires dep_c
+                     {'name': 'dep_b',
+                      'url': 'https://github.com/comtihon/dep_b',
+                      'tag': '1.0.0'}
+                 ])
+        create(self.tmp_dir, {'<name>': 'dep_a'})
+        create(self.tmp_dir, {'<name>': 'dep_b'})
+        set_deps(join(self.tmp_dir, 'dep_b'),
+                 [
+                     {'name': 'dep_a',
+                      'url': 'https://github.com/comtihon/dep_a',
+                      'tag': '1.1.0'}  # doesn't require dep_c
+                 ])
+        create(self.tmp_dir, {'<name>': 'dep_c'})
+        builder = Builder.init_from_path(pack_path)
+        builder.populate()
+        self.assertEqual([('dep_a', '1.1.0'), ('dep_b', '1.0.0')], sorted(fetched))  # only selected versions
+        self.assertEqual(['dep_a', 'dep_b'], sorted(builder.packages.keys()))
+        self.assertEqual('1.1.0', builder.packages['dep_a'].git_vsn)
+        [root_dep_a, _] = builder.project.deps
+        self.assertEqual('1.1.0', root_dep_a.git_vsn)  # all requirements point to the selected version
+
+    # Version range is resolved to the newest matching tag, only it is fetched
+    @patch.object(LocalCache, 'ls_remote_tags', return_value=['1.0.0', '1.2.0', 'v1.10.0', '2.0.0', 'master'])
+    @patch.object(LocalCache, 'fetch_package')
+    @patch('enot.global_properties.ensure_conf_file')
+    def test_version_range(self, mock_conf, mock_fetch, _):
+        mock_conf.return_value = self.conf_file
+        mock_fetch.side_effect = mock_fetch_package
+        pack_path = join(self.test_dir, 'test_app')
+        set_deps(pack_path,
+                 [
+                     {'name': 'dep_b',
+                      'url': 'https://github.com/comtihon/dep_b',
+                      'vsn': '~> 1.0'}
+                 ])
+        create(self.tmp_dir, {'<name>': 'dep_b'})
+        builder = Builder.init_from_path(pack_path)
+        builder.populate()
+        self.assertEqual(1, mock_fetch.call_count)
+        self.assertEqual('v1.10.0', builder.packages['dep_b'].git_vsn)
+
+    # Hex dep's version range is resolved with hex versions. Selected version is still fetched from hex.
+    @patch.object(LocalCache, 'ls_remote_tags', return_value=[])
+    @patch('enot.packages.config.config.request_hex_info')
+    @patch.object(LocalCache, 'fetch_package')
+    @patch('enot.global_properties.ensure_conf_file')
+    def test_hex_version_range(self, mock_conf, mock_fetch, mock_hex, _):
+        mock_conf.return_value = self.conf_file
+        fetched = []
+
+        def fetch(dep: Package):
+            fetched.append((dep.name, dep.git_vsn, dep.config.hex))
+            mock_fetch_package(dep)
+
+        mock_fetch.side_effect = fetch
+        mock_hex.return_value = {'name': 'hex_dep',
+                                 'meta': {'links': {}},  # no GitHub link
+                                 'releases': [{'version': '1.0.0'}, {'version': '1.2.0'}, {'version': '2.0.0'}]}
+        pack_path = join(self.test_dir, 'test_app')
+        set_deps(pack_path, [{'name': 'hex_dep', 'vsn': '~> 1.0'}])
+        create(self.tmp_dir, {'<name>': 'hex_dep'})
+        builder = Builder.init_from_path(pack_path)
+        builder.populate()
+        self.assertEqual([('hex_dep', '1.2.0', True)], fetched)
+        self.assertEqual(True, builder.packages['hex_dep'].config.hex)
+
+
+if __name__ == '__main__':
+    unittest.main()
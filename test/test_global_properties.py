@@ -0,0 +1,46 @@
+import json
+import os
+import unittest
+
+from mock import patch
+
+from enot.global_properties import global_properties, set_global_properties, GlobalProperties
+from enot.packages.package_builder import Builder
+from enot.packages.package_controller import Controller
+from test.abs_test_class import TestClass
+
+
+class GlobalPropertiesTests(TestClass):
+    def __init__(self, method_name):
+        super().__init__('global_properties_tests', method_name)
+
+    # Builders and controllers share one global config. It is read again only if changed.
+    @patch('enot.global_properties.ensure_conf_file')
+    def test_shared(self, mock_conf):
+        mock_conf.return_value = self.conf_file
+        properties = global_properties()
+        self.assertIs(properties, Builder(self.test_dir, None).system_config)
+        self.assertIs(properties, Controller().system_config)
+        self.assertEqual(self.tmp_dir, properties.temp_dir)
+        conf = self.global_config
+        conf['temp_dir'] = os.path.join(self.test_dir, 'other_tmp')
+        with open(self.conf_file, 'w') as outfile:
+            json.dump(conf, outfile, sort_keys=True, indent=4)
+        changed = global_properties()
+        self.assertIsNot(properties, changed)
+        self.assertEqual(conf['temp_dir'], changed.temp_dir)
+
+    # Injected properties are used instead of global config, which is not even read
+    @patch('enot.global_properties.ensure_conf_file')
+    def test_injected(self, mock_conf):
+        mock_conf.return_value = self.conf_file
+        properties = GlobalProperties(self.test_dir)
+        set_global_properties(properties)
+        self.assertIs(properties, Builder(self.test_dir, None).system_config)
+        self.assertIs(properties, Controller().system_config)
+        mock_conf.assert_not_called()
+        self.assertEqual(self.tmp_dir, properties.temp_dir)  # read on first access
+
+
+if __name__ == '__main__':
+    unittest.main()
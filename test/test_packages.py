@@ -1,13 +1,19 @@
+import os
 import unittest
 from os.path import join
 
+from git import Repo
 from mock import patch
 
 from enot.__main__ import create
+from enot.packages.application_config import AppConfig
 from enot.packages.package import Package
 from enot.packages.package_builder import Builder
 from enot.packages.dep import Dep
-from test.abs_test_class import TestClass, set_git_url, set_git_tag
+from enot.utils.file_utils import write_file, ensure_dir
+from enot.utils.git_utils import get_tags
+from enot.utils.parse_cache import parse_cache
+from test.abs_test_class import TestClass, set_git_url, set_git_tag, set_deps
 
 
 class PackageTests(TestClass):
@@ -27,6 +33,85 @@ class PackageTests(TestClass):
         self.assertEqual('master', pack.git_branch)
         self.assertEqual([], pack.deps)
 
+    # Only tags, pointing to the head are used. Tags added later are noticed.
+    def test_git_tag_from_path(self):
+        create(self.test_dir, {'<name>': 'test_app'})
+        pack_path = join(self.test_dir, 'test_app')
+        repo = Repo.init(pack_path)
+        repo.create_remote('origin', url='http://github/my_namespace/my_project')
+        repo.index.add(['enot_config.json'])
+        repo.index.commit('First commit')
+        repo.create_tag('0.9.0')
+        write_file(join(pack_path, 'README.md'), 'second commit')
+        repo.index.add(['README.md'])
+        repo.index.commit('Second commit')
+        set_git_tag(pack_path, '1.0.0')  # annotated tag
+        self.assertEqual('1.0.0', Package.from_path(pack_path).git_tag)
+        repo.create_tag('1.0.1')  # lightweight tag
+        self.assertEqual('1.0.1', Package.from_path(pack_path).git_tag)
+        repo.create_tag('release/0.9')
+        self.assertIn('refs/tags/release/0.9', get_tags(repo)[repo.head.commit.hexsha])
+        repo.create_tag('release/1.0')  # nested tags dir is changed, refs/tags is not
+        self.assertIn('refs/tags/release/1.0', get_tags(repo)[repo.head.commit.hexsha])
+
+    # Configs are parsed only once, while their files are not changed. Every package gets its own copy.
+    def test_parse_cache(self):
+        create(self.test_dir, {'<name>': 'test_app'})
+        pack_path = join(self.test_dir, 'test_app')
+        first = Package.from_path(pack_path)
+        with patch('enot.packages.config.config_factory.parse_project') as mock_parse, \
+                patch.object(AppConfig, 'parse_path') as mock_parse_app:
+            second = Package.from_path(pack_path)
+            parse_cache.path = parse_cache.path  # forget results in memory, load from disk
+            Package.from_path(pack_path)
+            mock_parse.assert_not_called()
+            mock_parse_app.assert_not_called()
+        self.assertEqual('test_app', second.name)
+        self.assertEqual('0.0.1', second.vsn)
+        second.config.git_tag = '2.0.0'
+        self.assertNotEqual('2.0.0', first.git_tag)
+        set_deps(pack_path, [{'name': 'dep', 'url': 'https://github.com/comtihon/dep', 'tag': '1.0.0'}])
+        self.assertEqual(['dep'], [dep.name for dep in Package.from_path(pack_path).deps])
+
+    # New result of changed config replaces the old one. Expired results are removed.
+    def test_parse_cache_pruned(self):
+        create(self.test_dir, {'<name>': 'test_app'})
+        pack_path = join(self.test_dir, 'test_app')
+        Package.from_path(pack_path)
+        saved = sorted(os.listdir(parse_cache.path))
+        set_deps(pack_path, [{'name': 'dep', 'url': 'https://github.com/comtihon/dep', 'tag': '1.0.0'}])
+        Package.from_path(pack_path)
+        self.assertEqual(saved, sorted(os.listdir(parse_cache.path)))
+        write_file(join(parse_cache.path, 'expired'), '')
+        os.utime(join(parse_cache.path, 'expired'), (0, 0))
+        parse_cache.path = parse_cache.path  # new run
+        set_deps(pack_path, [])
+        Package.from_path(pack_path)
+        self.assertEqual(saved, sorted(os.listdir(parse_cache.path)))
+
+    # Package's files are scanned once and reused, till package is rescanned
+    def test_snapshot(self):
+        create(self.test_dir, {'<name>': 'test_app'})
+        pack_path = join(self.test_dir, 'test_app')
+        for directory in ['include', join('src', 'sub'), join('deps', 'dep', 'src')]:
+            ensure_dir(join(pack_path, directory))
+        write_file(join(pack_path, 'include', 'test_app.hrl'), '')
+        write_file(join(pack_path, 'src', 'sub', 'generated.erl'), '-module(generated).')
+        write_file(join(pack_path, 'deps', 'dep', 'src', 'dep.erl'), '-module(dep).')
+        package = Package.from_path(pack_path)
+        snapshot = package.snapshot
+        self.assertEqual(join(pack_path, 'src', 'sub'), snapshot.modules('src')['generated'])
+        self.assertEqual(False, 'dep' in snapshot.modules('src'))
+        self.assertEqual([join(pack_path, 'include', 'test_app.hrl')], snapshot.headers)
+        self.assertEqual([join(pack_path, 'src', 'test_app.app.src')], snapshot.app_files('src'))
+        self.assertEqual(True, 'enot_config.json' in snapshot.files)
+        self.assertEqual(False, snapshot.has_nifs)
+        self.assertNotEqual(None, snapshot.mtime(join(pack_path, 'src', 'sub', 'generated.erl')))
+        write_file(join(pack_path, 'src', 'new.erl'), '-module(new).')
+        self.assertEqual(False, 'new' in package.snapshot.modules('src'))
+        package.rescan()
+        self.assertEqual(True, 'new' in package.snapshot.modules('src'))
+
     # Package can be created from dep. Usually when populating main project deps.
     def test_init_from_dep(self):
         pack = Package.from_dep('test_app', Dep('http://github/my_namespace/test_app', 'master', tag='1.0.0'))
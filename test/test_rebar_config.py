@@ -1,10 +1,12 @@
 import unittest
 from os.path import join
+from urllib.error import URLError
 
 from mock import patch
 
 from enot.packages.config.rebar import RebarConfig
 from enot.packages.dep import Dep
+from enot.utils.hex_utils import hex_meta, HEX_META_EXPIRY
 from test.abs_test_class import TestClass
 
 
@@ -73,6 +75,51 @@ class RebarConfigTests(TestClass):
                             ]}.''')
         conf = RebarConfig(self.test_dir)
         self.assertEqual(Dep('https://github.com/comtihon/hex_dep', None, tag='1.0.0'), conf.deps['hex_dep'])
+        self.assertEqual(True, conf.deps['hex_dep'].hex)
+
+    # Hex dep without GitHub link is fetched only from hex repo
+    @patch('enot.packages.config.config.request_hex_info')
+    def test_hex_dep_no_github(self, mock_hex):
+        mock_hex.return_value = {'name': 'hex_dep', 'meta': {'links': {}, 'description': 'Just test'}}
+        with open(join(self.test_dir, 'rebar.config'), 'w') as config:
+            config.write('''{deps, [
+                                {hex_dep, "1.0.0"}
+                            ]}.''')
+        conf = RebarConfig(self.test_dir)
+        self.assertEqual(Dep('https://hex.pm/packages/hex_dep', None, tag='1.0.0'), conf.deps['hex_dep'])
+        self.assertEqual(True, conf.deps['hex_dep'].hex)
+
+
+    # Hex metadata is requested once for all hex deps and reused from file till it expires.
+    # Expired metadata is used if hex is unreachable.
+    @patch('enot.packages.config.config.request_hex_info')
+    def test_hex_meta_cached(self, mock_hex):
+        mock_hex.side_effect = lambda name: {'name': name,
+                                             'meta': {'links': {'GitHub': 'https://github.com/comtihon/' + name}},
+                                             'releases': [{'version': '1.0.0'}]}
+        with open(join(self.test_dir, 'rebar.config'), 'w') as config:
+            config.write('''{deps, [
+                                {hex_dep, "1.0.0"},
+                                {other_dep, "1.0.0"}
+                            ]}.''')
+        RebarConfig(self.test_dir)
+        self.assertEqual(2, mock_hex.call_count)
+        hex_meta.path = hex_meta.path  # forget metadata in memory, load from file
+        conf = RebarConfig(self.test_dir)
+        self.assertEqual(2, mock_hex.call_count)
+        self.assertEqual(Dep('https://github.com/comtihon/other_dep', None, tag='1.0.0'), conf.deps['other_dep'])
+        hex_meta.expiry = 0
+        mock_hex.side_effect = URLError('hex is down')
+        conf = RebarConfig(self.test_dir)
+        self.assertEqual(4, mock_hex.call_count)
+        self.assertEqual(Dep('https://github.com/comtihon/hex_dep', None, tag='1.0.0'), conf.deps['hex_dep'])
+        hex_meta.offline = True
+        with open(join(self.test_dir, 'rebar.config'), 'w') as config:
+            config.write('''{deps, [{unknown_dep, "1.0.0"}]}.''')
+        with self.assertRaises(RuntimeError):
+            RebarConfig(self.test_dir)
+        self.assertEqual(4, mock_hex.call_count)
+        hex_meta.expiry = HEX_META_EXPIRY
 
 
 if __name__ == '__main__':
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+from os.path import join
+
+from enot.utils.file_utils import ensure_dir, write_file
+from test.abs_test_class import TestClass
+
+HEAVY_MODULES = ['git', 'jinja2', 'requests', 'pkg_resources', 'tinydb', 'erl_terms']
+
+
+class StartupTests(TestClass):
+    def __init__(self, method_name):
+        super().__init__('startup_tests', method_name)
+
+    # Heavy dependencies are imported by commands, which need them, not on startup
+    def test_no_heavy_imports(self):
+        code = 'import sys, enot.__main__; print(" ".join(sys.modules))'
+        modules = subprocess.check_output([sys.executable, '-c', code]).decode().split()
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, modules)
+
+    # Version is read from configs without builder and caches
+    def test_version(self):
+        ensure_dir(join(self.test_dir, 'src'))
+        write_file(join(self.test_dir, 'enot_config.json'), '{"name": "startup"}')
+        write_file(join(self.test_dir, 'src', 'startup.app.src'),
+                   '{application, startup, [{vsn, "1.2.3"}, {applications, [kernel, stdlib]}]}.')
+        code = 'import sys, enot.__main__; from enot.utils.parse_cache import parse_cache; ' \
+               'parse_cache.path = sys.argv[2]; enot.__main__.version(sys.argv[1]); print(" ".join(sys.modules))'
+        args = [sys.executable, '-c', code, self.test_dir, join(self.test_dir, 'parsed')]
+        [vsn, modules] = subprocess.check_output(args).decode().splitlines()
+        self.assertEqual('1.2.3', vsn)
+        for module in ['git', 'enot.packages.package_builder', 'enot.global_properties']:
+            self.assertNotIn(module, modules.split())
+
+    # Installed packages are listed without system config and caches
+    def test_installed(self):
+        conf_dir = join(self.test_dir, 'conf')
+        code = 'import sys; from enot.packages.package_controller import Controller; ' \
+               'print(Controller(sys.argv[1]).installed()); print(" ".join(sys.modules))'
+        [installed, modules] = subprocess.check_output([sys.executable, '-c', code, conf_dir]).decode().splitlines()
+        self.assertEqual('[]', installed)
+        self.assertNotIn('enot.global_properties', modules.split())
+        self.assertEqual(False, os.path.exists(conf_dir))
@@ -1,10 +1,19 @@
+import os
+import stat
+import subprocess
 import unittest
 from os.path import join
+from unittest.mock import patch
 
 from enot.__main__ import create
 from enot.compiler.enot import EnotCompiler
+from enot.compiler.surefire_report import SurefireReport
+from enot.compiler.run_history import RunHistory
+from enot.compiler.staleness import Staleness
+from enot.compiler.warm_node import ShellServer, WarmNode, request_run, socket_path, ensure_socket_dir, \
+    SOCKET_PATH_MAX
 from enot.packages.package import Package
-from enot.utils.file_utils import ensure_dir
+from enot.utils.file_utils import ensure_dir, write_file
 from test.abs_test_class import TestClass, set_deps
 
 
@@ -184,6 +193,43 @@ class TestingTests(TestClass):
         compiler = EnotCompiler(package)
         self.assertEqual(False, compiler.common('test/logs'))
 
+    # Suite's data_dir is found, though suite is compiled to test_ebin
+    def test_common_data_dir(self):
+        test_dir = join(self.test_dir, 'test_app', 'test')
+        ensure_dir(join(test_dir, 'common_SUITE_data'))
+        write_file(join(test_dir, 'common_SUITE_data', 'file.txt'), 'data')
+        with open(join(test_dir, 'common_SUITE.erl'), 'w') as test:
+            test.write('''
+            -module(common_SUITE).
+            -include_lib("common_test/include/ct.hrl").
+            -export([all/0]).
+            -export([test/1]).
+
+            all() -> [test].
+
+            test(Config) ->
+                {ok, <<"data">>} = file:read_file(filename:join(?config(data_dir, Config), "file.txt")).''')
+        package = Package.from_path(join(self.test_dir, 'test_app'))
+        compiler = EnotCompiler(package)
+        self.assertEqual(True, compiler.common('test/logs'))
+
+    # Suites' data dirs are linked to test_ebin, beams in test dirs from previous builds are removed
+    def test_test_output_prepared(self):
+        app_dir = join(self.test_dir, 'test_app')
+        test_dir = join(app_dir, 'test', 'sub')
+        output = join(app_dir, 'test_ebin')
+        ensure_dir(join(test_dir, 'data_SUITE_data'))
+        ensure_dir(output)
+        write_file(join(test_dir, 'data_SUITE.erl'), '-module(data_SUITE).')
+        write_file(join(test_dir, 'data_SUITE.beam'), '')
+        os.symlink(join(test_dir, 'removed_SUITE_data'), join(output, 'removed_SUITE_data'))
+        package = Package.from_path(app_dir)
+        compiler = EnotCompiler(package)
+        compiler._EnotCompiler__prepare_test_output({'data_SUITE': test_dir})
+        self.assertEqual(join(test_dir, 'data_SUITE_data'), os.readlink(join(output, 'data_SUITE_data')))
+        self.assertEqual(False, os.path.lexists(join(output, 'removed_SUITE_data')))
+        self.assertEqual(False, os.path.exists(join(test_dir, 'data_SUITE.beam')))
+
     # Test if common test uses deps code
     def test_common_test_with_deps(self):
         app_dir = join(self.test_dir, 'test_app')
@@ -258,5 +304,217 @@ class TestingTests(TestClass):
         compiler = EnotCompiler(package)
         self.assertEqual(True, compiler.unit())
 
+    # Test if tests in parallel nodes fail, if one of them fails. Durations are recorded.
+    def test_unit_parallel_fail(self):
+        test_dir = join(self.test_dir, 'test_app', 'test')
+        ensure_dir(test_dir)
+        for name, assertion in [('first', '?_assert(true)'), ('second', '?assertEqual(true, false)')]:
+            with open(join(test_dir, name + '.erl'), 'w') as test:
+                test.write('''
+                -module(''' + name + ''').
+                -include_lib("eunit/include/eunit.hrl").
+
+                run_test() ->
+                   ''' + assertion + '.')
+        package = Package.from_path(join(self.test_dir, 'test_app'))
+        compiler = EnotCompiler(package)
+        self.assertEqual(False, compiler.unit(jobs=2))
+        self.assertEqual(['first', 'second'], sorted(RunHistory(package.path).durations))
+
+    # If one of parallel nodes can't be started - already started ones are stopped, run fails
+    def test_parallel_start_fail(self):
+        package = Package.from_path(join(self.test_dir, 'test_app'))
+        compiler = EnotCompiler(package)
+        runs = []
+        for i, cmd in enumerate([['sleep', '60'], ['enot_no_such_command']]):
+            report_dir = join(self.test_dir, 'reports', str(i))
+            ensure_dir(report_dir)
+            runs.append((cmd, report_dir, join(self.test_dir, 'reports', str(i) + '.log')))
+        started = []
+        popen = subprocess.Popen
+
+        def start(*args, **kwargs):
+            started.append(popen(*args, **kwargs))
+            return started[-1]
+
+        with patch('subprocess.Popen', side_effect=start):
+            report = compiler._EnotCompiler__run_parallel(runs)
+        self.assertEqual(False, report.ok)
+        self.assertEqual(1, len(started))
+        self.assertIsNotNone(started[0].returncode)  # killed and waited
+
+    # Test if common tests in parallel nodes fail, if one of suites fails. Every node has own logs.
+    def test_common_parallel_fail(self):
+        test_dir = join(self.test_dir, 'test_app', 'test')
+        ensure_dir(test_dir)
+        for name, check in [('first_SUITE', '1 = 1'), ('second_SUITE', '1 = 2')]:
+            with open(join(test_dir, name + '.erl'), 'w') as test:
+                test.write('''
+                -module(''' + name + ''').
+                -include_lib("common_test/include/ct.hrl").
+                -export([all/0]).
+                -export([test/1]).
+
+                all() -> [test].
+
+                test(_Config) ->
+                    ''' + check + '.')
+        package = Package.from_path(join(self.test_dir, 'test_app'))
+        compiler = EnotCompiler(package)
+        self.assertEqual(False, compiler.common('test/logs', jobs=2))
+        logs = join(self.test_dir, 'test_app', 'test', 'logs')
+        self.assertEqual(True, os.path.isdir(join(logs, 'shard_0')))
+        self.assertEqual(True, os.path.isdir(join(logs, 'shard_1')))
+        self.assertEqual(['first_SUITE', 'second_SUITE'], sorted(RunHistory(package.path).durations))
+
+    # Common test hook writes all suites to one report. Failures have only message.
+    def test_ct_report(self):
+        write_file(join(self.test_dir, 'report.xml'), '''<?xml version="1.0" encoding="UTF-8" ?>
+            <testsuites>
+              <testsuite tests="1" failures="0" errors="0" skipped="0" time="2.0" name="first_SUITE">
+                <testcase name="test" time="2.0"/>
+              </testsuite>
+              <testsuite tests="1" failures="1" errors="0" skipped="0" time="1.0" name="second_SUITE">
+                <testcase name="test" time="1.0"><failure message="{badmatch,2}" type="error"/></testcase>
+              </testsuite>
+            </testsuites>''')
+        report = SurefireReport()
+        report.add_run(self.test_dir, 1, '')
+        self.assertEqual(2, report.tests)
+        self.assertEqual(0, report.errors)
+        self.assertEqual({'first_SUITE': 2.0, 'second_SUITE': 1.0}, report.durations)
+        self.assertEqual(['second_SUITE: test\n{badmatch,2}'], report.failed)
+
+    # Only tests without beams or with changed sources, headers or parse transforms are compiled again
+    def test_stale_tests(self):
+        app_dir = join(self.test_dir, 'test_app')
+        test_dir = join(app_dir, 'test')
+        output = join(app_dir, 'test_ebin')
+        ensure_dir(test_dir)
+        ensure_dir(output)
+        ensure_dir(join(app_dir, 'include'))
+        write_file(join(app_dir, 'include', 'records.hrl'), '-record(state, {}).')
+        write_file(join(app_dir, 'src', 'transform.erl'), '-module(transform).')
+        write_file(join(test_dir, 'plain.erl'), '-module(plain).')
+        write_file(join(test_dir, 'with_header.erl'), '-module(with_header).\n-include("test.hrl").')
+        write_file(join(test_dir, 'test.hrl'), '-include_lib("test_app/include/records.hrl").')
+        write_file(join(test_dir, 'with_transform.erl'),
+                   '-module(with_transform).\n-compile([{parse_transform, transform}]).')
+        tests = {'plain': test_dir, 'with_header': test_dir, 'with_transform': test_dir}
+        headers = [join(app_dir, 'include', 'records.hrl'), join(test_dir, 'test.hrl')]
+        sources = {'transform': join(app_dir, 'src', 'transform.erl')}
+        self.assertEqual(tests, Staleness(output, headers, sources).stale(tests, ['erlc']))  # nothing compiled
+        for name in tests:
+            write_file(join(output, name + '.beam'), '')
+        Staleness(output, headers, sources).compiled(tests, ['erlc'])
+        self.assertEqual({}, Staleness(output, headers, sources).stale(tests, ['erlc']))
+        self.assertEqual(tests, Staleness(output, headers, sources).stale(tests, ['erlc', '-DTEST']))
+        past = os.stat(join(output, 'plain.beam')).st_mtime_ns - 10 ** 9
+        os.utime(join(app_dir, 'include', 'records.hrl'), ns=(past, past + 2 * 10 ** 9))  # header is changed
+        self.assertEqual({'with_header': test_dir}, Staleness(output, headers, sources).stale(tests, ['erlc']))
+        os.utime(join(app_dir, 'include', 'records.hrl'), ns=(past, past))
+        os.utime(join(app_dir, 'src', 'transform.erl'), ns=(past, past + 2 * 10 ** 9))  # transform is changed
+        self.assertEqual({'with_transform': test_dir}, Staleness(output, headers, sources).stale(tests, ['erlc']))
+        del tests['plain']  # removed test's beam is removed
+        Staleness(output, headers, sources).compiled(tests, ['erlc'])
+        self.assertEqual(False, os.path.exists(join(output, 'plain.beam')))
+
+    # Test shell keeps it's node between runs, changed modules are recompiled and hot loaded
+    def test_shell_rerun(self):
+        test_dir = join(self.test_dir, 'test_app', 'test')
+        ensure_dir(test_dir)
+        write_file(join(test_dir, 'simple.erl'), '''
+            -module(simple).
+            -include_lib("eunit/include/eunit.hrl").
+
+           run_test() ->
+               ?_assert(true).''')
+        package = Package.from_path(join(self.test_dir, 'test_app'))
+        server = ShellServer(EnotCompiler(package))
+        output = []
+        try:
+            self.assertEqual(True, server.run('eunit', [], False, 'test/logs', output.append))
+            write_file(join(test_dir, 'simple.erl'), '''
+            -module(simple).
+            -include_lib("eunit/include/eunit.hrl").
+
+           run_test() ->
+               ?assertEqual(true, false).''')
+            self.assertEqual(False, server.run('eunit', ['simple'], False, 'test/logs', output.append))
+            self.assertEqual(False, server.run('eunit', ['unknown'], False, 'test/logs', output.append))
+            self.assertEqual('Unknown tests: unknown', output[-1])
+        finally:
+            server.stop()
+
+    # test-run fails if no test shell is running for the project
+    def test_run_without_shell(self):
+        request = {'kind': 'eunit', 'tests': [], 'changed': False, 'log_dir': 'test/logs'}
+        self.assertEqual(False, request_run(join(self.test_dir, 'test_app'), request))
+
+    # Shell's socket is in a dir, accessible only by current user. Shell doesn't start if the dir is not user's own.
+    def test_shell_socket_dir(self):
+        path = socket_path(join(self.test_dir, 'test_app'))
+        self.assertLessEqual(len(path), SOCKET_PATH_MAX)
+        sockets = join(self.test_dir, 'sockets')
+        os.makedirs(sockets, mode=0o777)
+        os.chmod(sockets, 0o777)
+        ensure_socket_dir(sockets)
+        self.assertEqual(0o700, stat.S_IMODE(os.stat(sockets).st_mode))
+        foreign = join(self.test_dir, 'foreign')
+        os.symlink(sockets, foreign)
+        self.assertRaises(OSError, ensure_socket_dir, foreign)
+        package = Package.from_path(join(self.test_dir, 'test_app'))
+        with patch('enot.compiler.warm_node.socket_path', return_value=join(foreign, 'shell.sock')):
+            server = ShellServer(EnotCompiler(package))
+            with patch.object(WarmNode, 'start') as mock_start:
+                self.assertEqual(False, server.serve())
+                mock_start.assert_not_called()
+            request = {'kind': 'eunit', 'tests': [], 'changed': False, 'log_dir': 'test/logs'}
+            self.assertEqual(False, request_run(join(self.test_dir, 'test_app'), request))
+
+    # Longest tests are spread between shards first. Unknown tests are expected to be average.
+    def test_shards_balanced(self):
+        history = RunHistory(self.test_dir)
+        history.update({'a': 10, 'b': 6, 'c': 5, 'd': 4, 'e': 1})
+        self.assertEqual([['a', 'e'], ['b', 'd'], ['new', 'c']],
+                         RunHistory(self.test_dir).shard(['a', 'b', 'c', 'd', 'e', 'new'], 3))
+        self.assertEqual([['a']], history.shard(['a'], 4))
+
+    # Reports of all runs are merged. Run, which failed without failed tests, is an error.
+    def test_eunit_report(self):
+        ensure_dir(join(self.test_dir, 'first'))
+        write_file(join(self.test_dir, 'first', 'TEST-first.xml'), '''<?xml version="1.0" encoding="UTF-8" ?>
+            <testsuite tests="2" failures="1" errors="0" skipped="0" time="0.500" name="module 'first'">
+              <testcase time="0.400" name="first:run_test/0_test_" description="">
+                <failure type="assertEqual">expected true, got false</failure>
+              </testcase>
+              <testcase time="0.100" name="first:other_test/0_test_" description=""/>
+            </testsuite>''')
+        ensure_dir(join(self.test_dir, 'second'))
+        report = SurefireReport()
+        report.add_run(join(self.test_dir, 'first'), 1, '')
+        self.assertEqual(1, report.failures)
+        self.assertEqual(0, report.errors)
+        report.add_run(join(self.test_dir, 'second'), 1, 'crash dump')
+        self.assertEqual(False, report.ok)
+        self.assertEqual(2, report.tests)
+        self.assertEqual(1, report.errors)
+        self.assertEqual({'first': 0.5}, report.durations)
+        self.assertEqual(2, len(report.failed))
+
+    # Serial runs go longest first. Slowest tests are shown after the run.
+    def test_slowest_first(self):
+        history = RunHistory(self.test_dir)
+        history.update({'a': 1, 'b': 7, 'c': 3})
+        self.assertEqual(['b', 'new', 'c', 'a'], RunHistory(self.test_dir).longest_first(['a', 'b', 'c', 'new']))
+        report = SurefireReport()
+        report.durations.update({'m{0}'.format(i): float(i) for i in range(8)})
+        with patch('enot.compiler.surefire_report.info') as info:
+            report.log_slowest()
+        lines = info.call_args[0][0].split('\n')
+        self.assertEqual('Slowest tests:', lines[0])
+        self.assertEqual(['m7', 'm6', 'm5', 'm4', 'm3'], [line.split()[1] for line in lines[1:]])
+
+
 if __name__ == '__main__':
     unittest.main()
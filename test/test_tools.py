@@ -8,7 +8,8 @@ from mock import patch
 import enot.__main__
 from enot.compiler.rebar import RebarCompiler
 from enot.packages.package_builder import Builder
-from enot.utils.file_utils import ensure_dir
+from enot.utils import file_utils
+from enot.utils.file_utils import ensure_dir, write_file, ensure_executable
 from test.abs_test_class import TestClass
 
 
@@ -68,6 +69,21 @@ class ToolsTests(TestClass):
         self.assertEqual(True, os.path.islink(join(project_dir, 'rebar')))  # linked to current project
         self.assertEqual(True, builder.system_config.cache.local_cache.tool_exists('rebar'))  # and available in cache
 
+    # Tool is found in PATH without running it. Result is memoized.
+    def test_find_without_run(self):
+        bin_dir = join(self.test_dir, 'bin')
+        ensure_dir(bin_dir)
+        marker = join(self.test_dir, 'was_run')
+        tool = join(bin_dir, 'enot_test_tool')
+        write_file(tool, '#!/bin/sh\ntouch ' + marker + '\n')
+        ensure_executable(tool)
+        with patch.dict(os.environ, {'PATH': bin_dir}):
+            self.assertEqual(tool, file_utils.find_programm('enot_test_tool'))
+            os.remove(tool)
+            self.assertEqual(True, file_utils.ensure_programm('enot_test_tool'))  # memoized
+            self.assertEqual(False, file_utils.ensure_programm('enot_missing_tool'))
+        self.assertEqual(False, os.path.exists(marker))
+
 
 if __name__ == '__main__':
     unittest.main()